@@ -0,0 +1,162 @@
+# benchmark.py - Mesures de performance du service de feuilles de temps
+#
+# Usage:
+#   python3 benchmark.py --entrees 100000 --sortie bench.json
+#   python3 benchmark.py --entrees 100000 --sortie bench.json --reference ancien.json
+
+import argparse
+import io
+import json
+import random
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from models import Employee, TypeContrat, StatutEntree
+from services import TimesheetService, ValidationService
+from notifications import NotificationService, ApprobationWorkflow
+
+# Repartition des contrats et taux horaires de main.py
+CONTRATS = [(TypeContrat.CDI, 35.0), (TypeContrat.CDD, 28.0), (TypeContrat.STAGE, 15.0)]
+# Une entree par jour ouvre et par employe; autant de projets que d'employes, comme dans main.py
+ENTREES_PAR_EMPLOYE = 220
+PROJETS_PAR_EMPLOYE = 1
+DESCRIPTIONS = ["Developpement", "Tests unitaires", "Revue de code", "Maquettes", "Analyse", "Migration"]
+
+
+class NotificationsMuettes(NotificationService):
+    """Notifications sans affichage, pour ne mesurer que le workflow"""
+
+    def _envoyer(self, destinataire, message):
+        self.notifications_envoyees.append(message)
+
+    def _alerter(self, destinataire, message):
+        pass
+
+
+def generer_donnees(nb_entrees, graine=42, debut=date(2024, 1, 1), nb_jours=365):
+    """Genere un jeu de donnees deterministe: (employes, projets, lignes d'entrees).
+    Les heures respectent le maximum journalier du contrat de chaque employe."""
+    alea = random.Random(graine)
+    nb_employes = max(3, nb_entrees // ENTREES_PAR_EMPLOYE)
+    nb_projets = max(3, round(nb_employes * PROJETS_PAR_EMPLOYE))
+
+    employes = []
+    for emp_id in range(1, nb_employes + 1):
+        contrat, taux = CONTRATS[(emp_id - 1) % len(CONTRATS)]
+        employes.append(Employee(emp_id, f"Nom{emp_id}", f"Prenom{emp_id}", "0600000000",
+                                 f"emp{emp_id}@example.com", "01/01/2023", contrat, taux))
+    projets = [(proj_id, f"Projet {proj_id}", f"P{proj_id:05d}", alea.randint(100, 5000))
+               for proj_id in range(1, nb_projets + 1)]
+
+    max_heures = ValidationService.MAX_HEURES_PAR_CONTRAT
+    lignes = []
+    for _ in range(nb_entrees):
+        emp = employes[alea.randrange(nb_employes)]
+        jour = debut + timedelta(days=alea.randrange(nb_jours))
+        heures = alea.randint(1, int(max_heures[emp.type_contrat] * 2)) / 2
+        lignes.append((emp.id, alea.randint(1, nb_projets), f"{jour.day:02d}/{jour.month:02d}/{jour.year}",
+                       heures, alea.choice(DESCRIPTIONS)))
+    return employes, projets, lignes
+
+
+def mesurer(nom, fonction, nb_operations=1, tracer_memoire=True):
+    """Execute fonction une fois et renvoie la mesure: duree, duree par operation et
+    pic memoire alloue pendant l'appel (tracemalloc ralentit l'execution, d'ou l'option)"""
+    if tracer_memoire:
+        tracemalloc.start()
+    debut = time.perf_counter()
+    fonction()
+    duree = time.perf_counter() - debut
+    pic = None
+    if tracer_memoire:
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {"nom": nom, "operations": nb_operations, "duree_s": duree,
+            "duree_par_operation_s": duree / nb_operations, "pic_memoire_octets": pic}
+
+
+def executer(nb_entrees, graine=42, tracer_memoire=True):
+    """Execute la suite sur un jeu de nb_entrees entrees et renvoie les resultats"""
+    employes, projets, lignes = generer_donnees(nb_entrees, graine)
+    service = TimesheetService()
+
+    def mesure(nom, fonction, nb_operations=1):
+        return mesurer(nom, fonction, nb_operations, tracer_memoire)
+
+    mesures = [
+        mesure("ajouter_employe_projet", lambda: [service.ajouter_employe(e) for e in employes]
+               + [service.ajouter_projet(*p) for p in projets], len(employes) + len(projets)),
+        mesure("saisir_entree", lambda: [service.saisir_entree(*ligne) for ligne in lignes], len(lignes)),
+    ]
+
+    alea = random.Random(graine)
+    echantillon = [alea.choice(employes).id for _ in range(100)]
+    projets_echantillon = [alea.choice(projets)[0] for _ in range(100)]
+    mois = [(alea.randint(1, 12), 2024) for _ in range(100)]
+    mesures.append(mesure("generer_rapport_mensuel", lambda: [
+        service.generer_rapport_mensuel(emp_id, m, a) for emp_id, (m, a) in zip(echantillon, mois)], 100))
+    mesures.append(mesure("calculer_cout_projet", lambda: [
+        service.calculer_cout_projet(proj_id, m, a) for proj_id, (m, a) in zip(projets_echantillon, mois)], 100))
+    mesures.append(mesure("exporter_csv", lambda: [
+        service.exporter_csv(emp_id, m, a) for emp_id, (m, a) in zip(echantillon, mois)], 100))
+    mesures.append(mesure("exporter_csv_flux", lambda: service.exporter_csv_flux(io.StringIO()), len(lignes)))
+    a_valider = lignes[:10000]
+    mesures.append(mesure("valider_entree", lambda: [
+        service.valider_entree(*ligne) for ligne in a_valider], len(a_valider)))
+
+    workflow = ApprobationWorkflow(service, NotificationsMuettes())
+    a_soumettre = service.entrees[:10000]
+    mesures.append(mesure("soumettre", lambda: [workflow.soumettre(e) for e in a_soumettre], len(a_soumettre)))
+    mesures.append(mesure("approuver_lot", lambda: workflow.approuver_lot(
+        service.selectionner_entrees(statuts={StatutEntree.SOUMIS}), "Manager"), len(a_soumettre)))
+
+    return {"entrees": nb_entrees, "graine": graine, "python": sys.version.split()[0],
+            "memoire_tracee": tracer_memoire, "mesures": mesures}
+
+
+def comparer(resultats, reference, seuil=0.10):
+    """Renvoie les regressions: mesures plus lentes que la reference de plus de seuil"""
+    references = {mesure["nom"]: mesure for mesure in reference["mesures"]}
+    regressions = []
+    for mesure in resultats["mesures"]:
+        ancienne = references.get(mesure["nom"])
+        if ancienne is None or ancienne["duree_par_operation_s"] == 0:
+            continue
+        ratio = mesure["duree_par_operation_s"] / ancienne["duree_par_operation_s"]
+        if ratio > 1 + seuil:
+            regressions.append(f"{mesure['nom']}: x{ratio:.2f} ({ancienne['duree_par_operation_s']:.3g}s -> "
+                               f"{mesure['duree_par_operation_s']:.3g}s par operation)")
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmark du service de feuilles de temps")
+    parser.add_argument("--entrees", type=int, default=10000, help="nombre d'entrees generees (1k a 10M)")
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument("--sortie", default="bench_resultats.json", help="fichier JSON des resultats")
+    parser.add_argument("--reference", help="resultats JSON d'une execution precedente a comparer")
+    parser.add_argument("--seuil", type=float, default=0.10, help="ralentissement tolere (0.10 = 10%%)")
+    parser.add_argument("--sans-memoire", action="store_true", help="ne pas mesurer les pics memoire")
+    options = parser.parse_args(arguments)
+
+    resultats = executer(options.entrees, options.graine, not options.sans_memoire)
+    with open(options.sortie, "w", encoding="utf-8") as fichier:
+        json.dump(resultats, fichier, indent=2)
+    for mesure in resultats["mesures"]:
+        pic = mesure["pic_memoire_octets"]
+        memoire = f"  pic {pic / 1e6:>8.1f} Mo" if pic is not None else ""
+        print(f"{mesure['nom']:<26} {mesure['duree_s']:>10.4f}s{memoire}")
+
+    if options.reference:
+        with open(options.reference, encoding="utf-8") as fichier:
+            regressions = comparer(resultats, json.load(fichier), options.seuil)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,95 @@
+# cache.py - Cache LRU des rapports mensuels et exports CSV
+
+import threading
+from collections import OrderedDict
+
+
+class CacheRapports:
+    """Memorise les sorties texte par employe et par mois (rapport, export CSV).
+    Cle: (type, employee_id, mois, annee, configuration). Eviction LRU des que
+    le nombre d'elements ou la taille cumulee des textes depasse sa limite.
+    Les ecritures invalident uniquement les cles du mois de l'employe concerne.
+    Les operations sont protegees par un verrou (service partage entre threads)."""
+
+    def __init__(self, taille_max=10000, octets_max=64 * 1024 * 1024):
+        self.taille_max = taille_max
+        self.octets_max = octets_max
+        self.succes = 0
+        self.echecs = 0
+        self._valeurs = OrderedDict()
+        self._cles_employe = {}         # employee_id -> {(annee, mois): {cles}}
+        self._octets = 0
+        self._verrou = threading.Lock()
+
+    def obtenir(self, type_sortie, employee_id, mois, annee, config, calculer, a_jour=None):
+        """Renvoie la sortie memorisee, ou la calcule avec calculer() et la memorise.
+        Si a_jour est donne, la valeur calculee n'est memorisee que si a_jour() est
+        vrai au moment de l'insertion (aucune ecriture depuis la lecture)."""
+        cle = (type_sortie, employee_id, mois, annee,
+               (config.format_date, config.separateur_csv, config.devise))
+        with self._verrou:
+            valeur = self._valeurs.get(cle)
+            if valeur is not None:
+                self._valeurs.move_to_end(cle)
+                self.succes += 1
+                return valeur
+            self.echecs += 1
+
+        valeur = calculer()
+        with self._verrou:
+            if a_jour is not None and not a_jour():
+                return valeur
+            if cle in self._valeurs:
+                self._retirer(cle)
+            self._valeurs[cle] = valeur
+            self._octets += len(valeur)
+            self._cles_employe.setdefault(employee_id, {}).setdefault((annee, mois), set()).add(cle)
+            while self._valeurs and (len(self._valeurs) > self.taille_max or self._octets > self.octets_max):
+                self._retirer(next(iter(self._valeurs)))
+        return valeur
+
+    def invalider(self, employee_id, mois, annee):
+        """Oublie les sorties d'un employe pour un mois"""
+        with self._verrou:
+            mois_employe = self._cles_employe.get(employee_id)
+            if mois_employe is None:
+                return
+            for cle in mois_employe.pop((annee, mois), ()):
+                self._retirer(cle, indexee=False)
+            if not mois_employe:
+                del self._cles_employe[employee_id]
+
+    def invalider_employe(self, employee_id):
+        """Oublie toutes les sorties d'un employe"""
+        with self._verrou:
+            for cles in self._cles_employe.pop(employee_id, {}).values():
+                for cle in cles:
+                    self._retirer(cle, indexee=False)
+
+    def vider(self):
+        with self._verrou:
+            self._valeurs.clear()
+            self._cles_employe.clear()
+            self._octets = 0
+
+    def statistiques(self):
+        with self._verrou:
+            return {"succes": self.succes, "echecs": self.echecs,
+                    "elements": len(self._valeurs), "octets": self._octets}
+
+    def __len__(self):
+        return len(self._valeurs)
+
+    def _retirer(self, cle, indexee=True):
+        valeur = self._valeurs.pop(cle, None)
+        if valeur is None:
+            return
+        self._octets -= len(valeur)
+        if indexee:
+            _, employee_id, mois, annee, _ = cle
+            mois_employe = self._cles_employe[employee_id]
+            mois_employe[(annee, mois)].discard(cle)
+            if not mois_employe[(annee, mois)]:
+                del mois_employe[(annee, mois)]
+                if not mois_employe:
+                    del self._cles_employe[employee_id]
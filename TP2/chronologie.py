@@ -0,0 +1,103 @@
+# chronologie.py - Index trie par date et cumuls par periode
+
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from itertools import accumulate
+
+GRANULARITES = ("semaine", "mois", "trimestre", "annee")
+
+
+def debut_periode(jour, granularite):
+    """Premier jour de la periode (semaine ISO, mois, trimestre, annee) contenant jour"""
+    if granularite == "semaine":
+        return jour - timedelta(days=jour.weekday())
+    if granularite == "mois":
+        return jour.replace(day=1)
+    if granularite == "trimestre":
+        return date(jour.year, (jour.month - 1) // 3 * 3 + 1, 1)
+    if granularite == "annee":
+        return date(jour.year, 1, 1)
+    raise ValueError(f"Granularite inconnue: {granularite} (attendu: {', '.join(GRANULARITES)})")
+
+
+def periode_suivante(debut, granularite):
+    if granularite == "semaine":
+        return debut + timedelta(days=7)
+    if granularite == "annee":
+        return date(debut.year + 1, 1, 1)
+    mois = debut.month + (3 if granularite == "trimestre" else 1)
+    return date(debut.year + (mois - 1) // 12, (mois - 1) % 12 + 1, 1)
+
+
+def cle_periode(debut, granularite):
+    """Cle d'une periode: (annee ISO, semaine), (annee, mois), (annee, trimestre) ou annee"""
+    if granularite == "semaine":
+        return tuple(debut.isocalendar())[:2]
+    if granularite == "mois":
+        return (debut.year, debut.month)
+    if granularite == "trimestre":
+        return (debut.year, (debut.month - 1) // 3 + 1)
+    return debut.year
+
+
+class IndexChronologique:
+    """Lignes d'un employe, d'un projet ou de toute la table, triees par jour,
+    avec les sommes cumulees des heures et des couts. Le total d'un intervalle
+    de dates coute deux recherches dichotomiques et une soustraction.
+    Les couts sont valorises au taux en vigueur a la date de chaque ligne."""
+
+    def __init__(self, table, lignes, taux):
+        jours = table.jour
+        ordre = sorted(lignes, key=jours.__getitem__)
+        self.table = table
+        self.taux = taux                    # HistoriqueTaux
+        self.jours = array("i", (jours[ligne] for ligne in ordre))
+        self.lignes = array("q", ordre)
+        self.cumul_heures = array("d", accumulate((table.heures[ligne] for ligne in ordre), initial=0.0))
+        self.cumul_couts = array("d", accumulate(taux.couts(table, ordre, triees=True), initial=0.0))
+
+    def ajouter(self, ligne):
+        """Ajoute une ligne en fin d'index si elle ne casse pas l'ordre des jours.
+        Renvoie False sinon: l'index doit alors etre reconstruit."""
+        jour = self.table.jour[ligne]
+        if self.jours and jour < self.jours[-1]:
+            return False
+        self.jours.append(jour)
+        self.lignes.append(ligne)
+        heures = self.table.heures[ligne]
+        self.cumul_heures.append(self.cumul_heures[-1] + heures)
+        self.cumul_couts.append(self.cumul_couts[-1] + heures * self.taux.taux_au(self.table.employee_id[ligne], jour))
+        return True
+
+    def bornes(self, debut=None, fin=None):
+        """Positions [bas, haut[ des lignes dont le jour est dans [debut, fin] (dates incluses)"""
+        bas = bisect_left(self.jours, debut.toordinal()) if debut is not None else 0
+        haut = bisect_right(self.jours, fin.toordinal()) if fin is not None else len(self.jours)
+        return bas, max(bas, haut)
+
+    def lignes_entre(self, debut=None, fin=None):
+        bas, haut = self.bornes(debut, fin)
+        return self.lignes[bas:haut]
+
+    def totaux(self, debut=None, fin=None):
+        """(heures, cout) des lignes dont le jour est dans [debut, fin]"""
+        bas, haut = self.bornes(debut, fin)
+        return (self.cumul_heures[haut] - self.cumul_heures[bas],
+                self.cumul_couts[haut] - self.cumul_couts[bas])
+
+    def cumuls(self, debut=None, fin=None, granularite="mois"):
+        """{cle de periode: (heures, cout)} pour chaque periode non vide entre debut et fin
+        (dates incluses), dans l'ordre chronologique. Une recherche dichotomique par periode."""
+        if granularite not in GRANULARITES:
+            raise ValueError(f"Granularite inconnue: {granularite} (attendu: {', '.join(GRANULARITES)})")
+        bas, haut = self.bornes(debut, fin)
+        jours = self.jours
+        resultat = {}
+        while bas < haut:
+            courant = debut_periode(date.fromordinal(jours[bas]), granularite)
+            suivant = bisect_left(jours, periode_suivante(courant, granularite).toordinal(), bas, haut)
+            resultat[cle_periode(courant, granularite)] = (self.cumul_heures[suivant] - self.cumul_heures[bas],
+                                                          self.cumul_couts[suivant] - self.cumul_couts[bas])
+            bas = suivant
+        return resultat
@@ -0,0 +1,263 @@
+# cliche.py - Cliche binaire de l'etat du service, charge par projection memoire (mmap)
+#
+# Format (ordre des octets natif, verifie au chargement):
+#   en-tete     "TSCLICHE", version (u32), ordre des octets (1 octet), nombre de sections (u32)
+#   repertoire  une ligne par section: nom (32 octets), position (u64), taille (u64)
+#   sections    alignees sur 8 octets:
+#     chaines.pos / chaines        table des chaines (positions q + textes UTF-8)
+#     employes / projets           enregistrements de largeur fixe (struct)
+#     col.<colonne>                colonnes de largeur fixe des entrees (q, i, H, d, b)
+#     col.prochain_id              identifiant de la prochaine entree saisie
+#     idx.<index>.{cles,debuts,lignes}   index du registre au format CSR
+#     tot.<totaux>.{cles,valeurs}  totaux courants (heures_par_projet en CSR:
+#                                  cles, debuts, projets, valeurs)
+#     taux.{cles,debuts,dates,valeurs}  historiques des taux horaires dates (CSR)
+#     mod.premiere / mod.<colonne> journal des modifications (premiere sequence, colonnes)
+#     res.{cles,heures,couts,nombres}  resumes des mois clos par (employe, projet, annee, mois)
+#     res.{mois,archives}          mois clos et chemin de leur archive (indice de chaine)
+#
+# VERSION change a chaque modification du format: toutes les sections ci-dessus sont
+# obligatoires et un cliche d'une autre version est refuse (a regenerer).
+
+import mmap
+import struct
+import sys
+from array import array
+
+from colonnes import COLONNES, TableEntrees
+from models import Employee, Projet, TypeContrat
+from modifications import COLONNES_JOURNAL
+from registre import RegistreEntrees
+from services import TimesheetService
+
+MAGIQUE = b"TSCLICHE"
+VERSION = 3
+EN_TETE = struct.Struct("<8sIcI")
+SECTION = struct.Struct("<32sQQ")
+EMPLOYE = struct.Struct("<i6id")        # id, 6 chaines, taux horaire
+PROJET = struct.Struct("<iiid?")        # id, nom, code, budget, budget entier
+ORDRE = b"<" if sys.byteorder == "little" else b">"
+
+# index du registre -> nombre d'entiers par cle
+INDEX = {"employe": 1, "projet": 1, "mois": 2, "employe_mois": 3, "projet_mois": 3}
+# totaux courants a une valeur par cle -> nombre d'entiers par cle
+TOTAUX = {"heures_employe_mois": 3, "heures_projet_mois": 3, "cout_projet_mois": 3, "heures_consommees": 1,
+          "heures_par_jour": 2, "heures_par_semaine": 2}
+
+
+class DescriptionsCliche:
+    """Colonne des descriptions d'un cliche: un indice par ligne dans la table des chaines"""
+
+    __slots__ = ("chaines", "indices")
+
+    def __init__(self, chaines, indices):
+        self.chaines = chaines
+        self.indices = indices
+
+    def __getitem__(self, ligne):
+        return self.chaines[self.indices[ligne]]
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        chaines = self.chaines
+        return (chaines[indice] for indice in self.indices)
+
+
+class TableChaines:
+    def __init__(self):
+        self.positions = {}
+        self.chaines = []
+
+    def indice(self, texte):
+        position = self.positions.get(texte)
+        if position is None:
+            position = self.positions[texte] = len(self.chaines)
+            self.chaines.append(texte)
+        return position
+
+
+def _aplatir(cles, largeur):
+    """Cles (entiers ou tuples de largeur entiers) mises bout a bout"""
+    if largeur == 1:
+        return array("i", cles)
+    return array("i", (valeur for cle in cles for valeur in cle))
+
+
+def _cles(plates, largeur):
+    """Inverse de _aplatir, sans boucle Python: zip des colonnes de la vue"""
+    if largeur == 1:
+        return plates
+    return zip(*(plates[i::largeur] for i in range(largeur)))
+
+
+def _tranches(valeurs, debuts):
+    """valeurs[debuts[i]:debuts[i + 1]] pour chaque i (format CSR)"""
+    return map(valeurs.__getitem__, map(slice, debuts[:-1], debuts[1:]))
+
+
+def _debuts(groupes):
+    debuts = array("q", [0])
+    for groupe in groupes:
+        debuts.append(debuts[-1] + len(groupe))
+    return debuts
+
+
+def ecrire_cliche(service, chemin):
+    """Ecrit l'etat complet du service (employes, projets, entrees, index et totaux)"""
+    with service.verrous.ecriture_tous(), service.verrous.commun():
+        _ecrire_cliche(service, chemin)
+
+
+def _ecrire_cliche(service, chemin):
+    chaines = TableChaines()
+    table = service.entrees.table
+    sections = []
+
+    employes = bytearray()
+    for emp in service.employees:
+        employes += EMPLOYE.pack(emp.id, *(chaines.indice(texte) for texte in (
+            emp.nom, emp.prenom, emp.telephone, emp.email, emp.date_embauche, emp.type_contrat.value)),
+            emp.taux_horaire)
+    projets = bytearray()
+    for projet in service.projets:
+        projets += PROJET.pack(projet.id, chaines.indice(projet.nom), chaines.indice(projet.code),
+                               projet.budget_heures, isinstance(projet.budget_heures, int))
+    sections += [("employes", employes), ("projets", projets)]
+
+    for nom, _ in COLONNES:
+        sections.append((f"col.{nom}", getattr(table, nom)))
+    sections.append(("col.description", array("i", (chaines.indice(texte) for texte in table.description))))
+    sections.append(("col.prochain_id", array("q", [table.prochain_id])))
+
+    for nom, largeur in INDEX.items():
+        index = getattr(service.entrees, f"_par_{nom}")
+        sections += [(f"idx.{nom}.cles", _aplatir(index, largeur)),
+                     (f"idx.{nom}.debuts", _debuts(index.values())),
+                     (f"idx.{nom}.lignes", array("i", (ligne for lignes in index.values() for ligne in lignes)))]
+
+    totaux = service.totaux
+    for nom, largeur in TOTAUX.items():
+        valeurs = getattr(totaux, nom)
+        sections += [(f"tot.{nom}.cles", _aplatir(valeurs, largeur)), (f"tot.{nom}.valeurs", array("d", valeurs.values()))]
+    par_projet = totaux.heures_par_projet
+    sections += [("tot.heures_par_projet.cles", _aplatir(par_projet, 3)),
+                 ("tot.heures_par_projet.debuts", _debuts(par_projet.values())),
+                 ("tot.heures_par_projet.projets", array("i", (p for h in par_projet.values() for p in h))),
+                 ("tot.heures_par_projet.valeurs", array("d", (v for h in par_projet.values() for v in h.values())))]
+
+    historiques = service.taux.historiques()
+    sections += [("taux.cles", array("i", historiques)),
+                 ("taux.debuts", _debuts(historiques.values())),
+                 ("taux.dates", array("i", (debut for periodes in historiques.values() for debut, _ in periodes))),
+                 ("taux.valeurs", array("d", (taux for periodes in historiques.values() for _, taux in periodes)))]
+
+    journal = service.modifications
+    sections += [("mod.premiere", array("q", [journal.premiere]))]
+    sections += [(f"mod.{nom}", getattr(journal, nom)) for nom, _ in COLONNES_JOURNAL]
+
+    resumes = service.resumes
+    sections += [("res.cles", _aplatir(resumes.resumes, 4)),
+                 ("res.heures", array("d", (resume[0] for resume in resumes.resumes.values()))),
+                 ("res.couts", array("d", (resume[1] for resume in resumes.resumes.values()))),
+                 ("res.nombres", array("q", (resume[2] for resume in resumes.resumes.values()))),
+                 ("res.mois", _aplatir(resumes.archives, 2)),
+                 ("res.archives", array("i", (chaines.indice(chemin) for chemin in resumes.archives.values())))]
+
+    textes = [texte.encode("utf-8") for texte in chaines.chaines]
+    positions = array("q", [0])
+    for texte in textes:
+        positions.append(positions[-1] + len(texte))
+    sections = [("chaines.pos", positions), ("chaines", b"".join(textes))] + sections
+
+    position = EN_TETE.size + SECTION.size * len(sections)
+    repertoire = []
+    for nom, donnees in sections:
+        position += -position % 8
+        taille = memoryview(donnees).nbytes
+        if len(nom) > 32:
+            raise ValueError(f"Nom de section trop long pour le repertoire: {nom}")
+        repertoire.append(SECTION.pack(nom.encode("ascii"), position, taille))
+        position += taille
+
+    with open(chemin, "wb") as fichier:
+        fichier.write(EN_TETE.pack(MAGIQUE, VERSION, ORDRE, len(sections)))
+        fichier.write(b"".join(repertoire))
+        for nom, donnees in sections:
+            fichier.write(b"\0" * (-fichier.tell() % 8))
+            fichier.write(donnees)
+
+
+def charger_cliche(chemin, config=None):
+    """Renvoie un TimesheetService (stockage en memoire) dont les entrees et les index
+    sont des vues directes sur le fichier projete en memoire, en lecture seule: les
+    processus qui chargent le meme cliche partagent ses pages. Une colonne ou une
+    liste d'index n'est copiee qu'a la premiere ecriture qui la modifie."""
+    with open(chemin, "rb") as fichier:
+        projection = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+    octets = memoryview(projection)
+    magique, version, ordre, nb_sections = EN_TETE.unpack_from(octets)
+    if magique != MAGIQUE:
+        raise ValueError(f"Cliche invalide: {chemin}")
+    if version != VERSION:
+        raise ValueError(f"Version de cliche non prise en charge: {version} (attendu: {VERSION})")
+    if ordre != ORDRE:
+        raise ValueError("Cliche ecrit avec un autre ordre des octets")
+    sections = {}
+    for i in range(nb_sections):
+        nom, position, taille = SECTION.unpack_from(octets, EN_TETE.size + i * SECTION.size)
+        sections[nom.rstrip(b"\0").decode("ascii")] = octets[position:position + taille]
+
+    def colonne(nom, code):
+        return sections[nom].cast(code)
+
+    positions, textes = colonne("chaines.pos", "q"), sections["chaines"]
+    chaines = [str(textes[positions[i]:positions[i + 1]], "utf-8") for i in range(len(positions) - 1)]
+
+    service = TimesheetService(config=config)
+    for id, *indices, taux in EMPLOYE.iter_unpack(sections["employes"]):
+        nom, prenom, telephone, email, date_embauche, contrat = (chaines[i] for i in indices)
+        service._indexer_employe(Employee(id, nom, prenom, telephone, email, date_embauche,
+                                          TypeContrat(contrat), taux))
+    for id, nom, code, budget, entier in PROJET.iter_unpack(sections["projets"]):
+        service._indexer_projet(Projet(id, chaines[nom], chaines[code], int(budget) if entier else budget))
+
+    registre = RegistreEntrees()
+    registre.table = TableEntrees.depuis_colonnes(
+        {nom: colonne(f"col.{nom}", code) for nom, code in COLONNES},
+        DescriptionsCliche(chaines, colonne("col.description", "i")), chaines)
+    registre.table.prochain_id = colonne("col.prochain_id", "q")[0]
+    for nom, largeur in INDEX.items():
+        getattr(registre, f"_par_{nom}").update(zip(
+            _cles(colonne(f"idx.{nom}.cles", "i"), largeur),
+            _tranches(colonne(f"idx.{nom}.lignes", "i"), colonne(f"idx.{nom}.debuts", "q"))))
+    service._adopter_registre(registre)
+
+    totaux = service.totaux
+    for nom, largeur in TOTAUX.items():
+        getattr(totaux, nom).update(zip(_cles(colonne(f"tot.{nom}.cles", "i"), largeur),
+                                        colonne(f"tot.{nom}.valeurs", "d")))
+    debuts = colonne("tot.heures_par_projet.debuts", "q")
+    totaux.heures_par_projet.update(zip(
+        _cles(colonne("tot.heures_par_projet.cles", "i"), 3),
+        map(dict, map(zip, _tranches(colonne("tot.heures_par_projet.projets", "i"), debuts),
+                      _tranches(colonne("tot.heures_par_projet.valeurs", "d"), debuts)))))
+
+    debuts = colonne("taux.debuts", "q")     # employes dont le taux a change au cours du temps
+    for employee_id, dates, taux in zip(colonne("taux.cles", "i"), _tranches(colonne("taux.dates", "i"), debuts),
+                                        _tranches(colonne("taux.valeurs", "d"), debuts)):
+        service.taux.remplacer(employee_id, list(zip(dates, taux)))
+
+    journal = service.modifications
+    journal.premiere = colonne("mod.premiere", "q")[0]
+    for nom, code in COLONNES_JOURNAL:
+        getattr(journal, nom).frombytes(sections[f"mod.{nom}"])
+
+    resumes = service.resumes
+    for (annee, mois), chemin in zip(_cles(colonne("res.mois", "i"), 2), colonne("res.archives", "i")):
+        resumes.clore(annee, mois, chaines[chemin])
+    for cle, heures, cout, nombre in zip(_cles(colonne("res.cles", "i"), 4), colonne("res.heures", "d"),
+                                         colonne("res.couts", "d"), colonne("res.nombres", "q")):
+        resumes.ajouter(*cle, heures, cout, nombre)
+    return service
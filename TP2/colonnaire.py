@@ -0,0 +1,137 @@
+# colonnaire.py - Export binaire columnaire des entrees et de leurs couts
+#
+# Format TSCOL (ordre des octets natif, verifie a la lecture):
+#   "TSCOL001"                  magique et version
+#   groupes de lignes           pour chaque groupe, chaque colonne du schema: tableau brut
+#                               (array) aligne sur 8 octets
+#   pied                        JSON UTF-8: ordre des octets, schema, dictionnaires, et pour
+#                               chaque groupe son nombre de lignes et la (position, taille)
+#                               de chaque colonne
+#   taille du pied (u64), "TSCOL001"
+# Les colonnes dictionnaires (employe, projet, statut, description) contiennent l'indice
+# de leur valeur dans le dictionnaire du pied (-1: valeur absente). date est le nombre de
+# jours depuis le 01/01/1970; id est l'identifiant stable de l'entree. Le lecteur ne lit
+# que les plages des colonnes demandees.
+#
+# Si pyarrow est installe, le meme contenu peut etre ecrit au format Arrow IPC (fichier),
+# un lot d'enregistrements par groupe de lignes.
+
+import json
+import mmap
+import struct
+import sys
+from array import array
+from datetime import date
+from itertools import islice
+
+MAGIQUE = b"TSCOL001"
+MAGIQUE_ARROW = b"ARROW1"
+TAILLE_PIED = struct.Struct("<Q")
+EPOQUE = date(1970, 1, 1).toordinal()
+
+# Colonnes exportees et leur type array
+SCHEMA = (("id", "q"), ("employee_id", "i"), ("project_id", "i"), ("date", "i"), ("heures", "d"), ("cout", "d"),
+          ("statut", "b"), ("employe", "i"), ("projet", "i"), ("description", "i"))
+TYPES = dict(SCHEMA)
+DICTIONNAIRES = ("statut", "employe", "projet", "description")
+
+
+def ecrire_colonnaire(fichier, groupes, dictionnaires):
+    """Ecrit les groupes de lignes ({colonne: array}) dans un fichier binaire ouvert en
+    ecriture, puis le pied. Les dictionnaires ({colonne: valeurs dans l'ordre des indices})
+    ne sont lus qu'apres le dernier groupe: ils peuvent grandir pendant l'export.
+    Renvoie le nombre de lignes ecrites."""
+    fichier.write(MAGIQUE)
+    position = len(MAGIQUE)
+    pied_groupes = []
+    nb_lignes = 0
+    for colonnes in groupes:
+        plages = {}
+        for nom, _ in SCHEMA:
+            marge = -position % 8
+            octets = memoryview(colonnes[nom]).cast("B")
+            fichier.write(b"\0" * marge)
+            fichier.write(octets)
+            plages[nom] = (position + marge, octets.nbytes)
+            position += marge + octets.nbytes
+        taille = len(colonnes["employee_id"])
+        pied_groupes.append({"lignes": taille, "colonnes": plages})
+        nb_lignes += taille
+    pied = json.dumps({"ordre": sys.byteorder, "schema": SCHEMA,
+                       "dictionnaires": {nom: list(dictionnaires[nom]) for nom in DICTIONNAIRES},
+                       "groupes": pied_groupes}).encode("utf-8")
+    fichier.write(pied)
+    fichier.write(TAILLE_PIED.pack(len(pied)))
+    fichier.write(MAGIQUE)
+    return nb_lignes
+
+
+def ecrire_arrow(fichier, groupes, dictionnaires):
+    """Meme contenu au format Arrow IPC (necessite pyarrow): employe, projet et statut en
+    colonnes dictionnaires, date en date32, un lot d'enregistrements par groupe. Les
+    descriptions sont ecrites en texte: leur dictionnaire grandit pendant l'export, et un
+    fichier Arrow ne peut pas remplacer un dictionnaire d'un lot a l'autre."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("L'export Arrow necessite pyarrow") from None
+    fixes = {nom: pa.array(list(dictionnaires[nom]), pa.string()) for nom in ("statut", "employe", "projet")}
+    schema = pa.schema([("id", pa.int64()), ("employee_id", pa.int32()), ("project_id", pa.int32()), ("date", pa.date32()),
+                        ("heures", pa.float64()), ("cout", pa.float64())]
+                       + [(nom, pa.dictionary(pa.int32(), pa.string())) for nom in fixes]
+                       + [("description", pa.string())])
+    nb_lignes = 0
+    descriptions = []       # textes dans l'ordre des indices, completes au fil des groupes
+    with pa.ipc.new_file(fichier, schema) as ecrivain:
+        for colonnes in groupes:
+            descriptions.extend(islice(dictionnaires["description"], len(descriptions), None))
+            valeurs = [pa.array(colonnes["id"], pa.int64()), pa.array(colonnes["employee_id"], pa.int32()), pa.array(colonnes["project_id"], pa.int32()),
+                       pa.array(colonnes["date"], pa.int32()).cast(pa.date32()),
+                       pa.array(colonnes["heures"], pa.float64()), pa.array(colonnes["cout"], pa.float64())]
+            for nom, dictionnaire in fixes.items():
+                indices = pa.array([code if code >= 0 else None for code in colonnes[nom]], pa.int32())
+                valeurs.append(pa.DictionaryArray.from_arrays(indices, dictionnaire))
+            valeurs.append(pa.array([descriptions[code] for code in colonnes["description"]], pa.string()))
+            ecrivain.write_batch(pa.record_batch(valeurs, schema=schema))
+            nb_lignes += len(colonnes["employee_id"])
+    return nb_lignes
+
+
+def lire_colonnaire(chemin, colonnes=None, decoder=True):
+    """Relit les colonnes demandees (toutes par defaut) d'un fichier TSCOL: {nom: array}.
+    Les colonnes dictionnaires sont decodees en listes de textes (None si absent), ou
+    renvoyees en (indices, dictionnaire) si decoder est faux. Un fichier Arrow est relu
+    avec pyarrow et renvoye en pyarrow.Table."""
+    with open(chemin, "rb") as fichier:
+        if fichier.read(len(MAGIQUE_ARROW)) == MAGIQUE_ARROW:
+            import pyarrow as pa
+            table = pa.ipc.open_file(pa.memory_map(chemin)).read_all()
+            return table.select(list(colonnes)) if colonnes is not None else table
+        projection = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+    with projection:
+        fin = len(projection) - len(MAGIQUE)
+        if projection[:len(MAGIQUE)] != MAGIQUE or projection[fin:] != MAGIQUE:
+            raise ValueError(f"Fichier columnaire invalide: {chemin}")
+        (taille,) = TAILLE_PIED.unpack_from(projection, fin - TAILLE_PIED.size)
+        pied = json.loads(projection[fin - TAILLE_PIED.size - taille:fin - TAILLE_PIED.size])
+        if pied["ordre"] != sys.byteorder:
+            raise ValueError("Fichier columnaire ecrit avec un autre ordre des octets")
+        noms = [nom for nom, _ in SCHEMA] if colonnes is None else list(colonnes)
+        resultat = {}
+        presentes = {nom for nom, _ in pied["schema"]}
+        for nom in noms:
+            if nom not in TYPES:
+                raise KeyError(f"Colonne inconnue: {nom}")
+            if nom not in presentes:
+                raise KeyError(f"Colonne absente du fichier: {nom}")
+            valeurs = array(TYPES[nom])
+            for groupe in pied["groupes"]:
+                position, taille = groupe["colonnes"][nom]
+                valeurs.frombytes(projection[position:position + taille])
+            if nom in DICTIONNAIRES:
+                dictionnaire = pied["dictionnaires"][nom]
+                resultat[nom] = ([dictionnaire[code] if code >= 0 else None for code in valeurs]
+                                 if decoder else (valeurs, dictionnaire))
+            else:
+                resultat[nom] = valeurs
+    return resultat
@@ -0,0 +1,236 @@
+# colonnes.py - Table columnaire des entrees de temps et agregations groupees
+
+from array import array
+from bisect import bisect_left
+from datetime import date
+
+from models import StatutEntree
+from dates import formater_date
+
+# Colonnes numeriques de TableEntrees et leur type array
+COLONNES = (("id", "q"), ("employee_id", "i"), ("project_id", "i"), ("jour", "i"),
+            ("periode", "H"), ("heures", "d"), ("statut", "b"))
+
+# Code compact d'un statut = sa position dans l'enum
+STATUTS = list(StatutEntree)
+CODE_STATUT = {statut: code for code, statut in enumerate(STATUTS)}
+
+
+def periode(annee, mois):
+    """Numero de mois absolu, utilise comme cle de regroupement"""
+    return annee * 12 + mois - 1
+
+
+def annee_mois(periode):
+    """Inverse de periode(): renvoie (annee, mois)"""
+    return periode // 12, periode % 12 + 1
+
+
+class TableEntrees:
+    """Entrees de temps stockees en colonnes paralleles (une ligne par entree).
+    Les identifiants employe/projet doivent etre des entiers 32 bits. Chaque entree
+    recoit un identifiant stable, croissant dans l'ordre des lignes, qui survit a la
+    compaction (contrairement au numero de ligne).
+
+    Occupation memoire de la table par entree: 8 (identifiant) + 4 (employe)
+    + 4 (projet) + 4 (jour) + 2 (periode) + 8 (heures) + 1 (statut) + 8 (reference
+    de description) = 39 octets, hors marge de croissance des tableaux. Les descriptions
+    identiques sont partagees et ne sont stockees qu'une fois.
+
+    Ce n'est pas le cout total d'une entree: les cinq index du RegistreEntrees
+    ajoutent 5 x 4 octets de numeros de ligne plus leurs cles (~56 octets par
+    entree mesures pour 200 employes et 30 projets sur un an), et les totaux par
+    jour et par semaine de TotauxCourants, un dict par (employe, jour), dominent
+    au niveau du service (~210 octets par entree au total sur le meme jeu)."""
+
+    def __init__(self):
+        self.id = array("q")
+        self.prochain_id = 0            # identifiant de la prochaine entree saisie
+        self.employee_id = array("i")
+        self.project_id = array("i")
+        self.jour = array("i")          # date.toordinal()
+        self.periode = array("H")       # annee * 12 + mois - 1
+        self.heures = array("d")
+        self.statut = array("b")        # CODE_STATUT
+        self.description = []
+        self._descriptions = {}         # partage des descriptions identiques
+        self._lecture_seule = False
+        self.proprietaire = None        # TimesheetService qui tient la table, une fois adoptee
+
+    @classmethod
+    def depuis_colonnes(cls, colonnes, description, descriptions_uniques=()):
+        """Table dont les colonnes sont des vues en lecture seule (memoryview sur un
+        cliche projete en memoire, par exemple). Elles ne sont copiees dans des
+        array qu'a la premiere ecriture."""
+        table = cls()
+        for nom, _ in COLONNES:
+            setattr(table, nom, colonnes[nom])
+        table.description = description
+        table._descriptions = {texte: texte for texte in descriptions_uniques}
+        table._lecture_seule = True
+        return table
+
+    def _rendre_modifiable(self):
+        for nom, code in COLONNES:
+            colonne = array(code)
+            colonne.frombytes(memoryview(getattr(self, nom)).cast("B"))
+            setattr(self, nom, colonne)
+        self.description = list(self.description)
+        self._lecture_seule = False
+
+    def ajouter(self, employee_id, project_id, jour, heures, statut, description):
+        """Ajoute une ligne a partir d'une datetime.date et renvoie son numero"""
+        return self.ajouter_ligne(employee_id, project_id, jour.toordinal(), periode(jour.year, jour.month),
+                                  heures, CODE_STATUT[statut], description)
+
+    def ajouter_ligne(self, employee_id, project_id, jour, periode, heures, code_statut, description, id=None):
+        """Ajoute une ligne deja encodee (ordinal, periode, code statut) et renvoie son numero.
+        id est l'identifiant d'une entree rechargee; il doit depasser celui de la ligne precedente."""
+        if self._lecture_seule:
+            self._rendre_modifiable()
+        ligne = len(self.description)
+        if id is None:
+            id = self.prochain_id
+        self.prochain_id = max(self.prochain_id, id + 1)
+        self.id.append(id)
+        self.employee_id.append(employee_id)
+        self.project_id.append(project_id)
+        self.jour.append(jour)
+        self.periode.append(periode)
+        self.heures.append(heures)
+        self.statut.append(code_statut)
+        self.description.append(self._descriptions.setdefault(description, description))
+        return ligne
+
+    def definir_statut(self, ligne, statut):
+        if self._lecture_seule:
+            self._rendre_modifiable()
+        self.statut[ligne] = CODE_STATUT[statut]
+
+    def definir_heures(self, ligne, heures):
+        if self._lecture_seule:
+            self._rendre_modifiable()
+        self.heures[ligne] = heures
+
+    def definir_description(self, ligne, description):
+        if self._lecture_seule:
+            self._rendre_modifiable()
+        self.description[ligne] = self._descriptions.setdefault(description, description)
+
+    def __len__(self):
+        # description est remplie en dernier: une ligne comptee est complete
+        return len(self.description)
+
+    def ligne_de(self, id):
+        """Numero de la ligne de l'entree d'identifiant id, None si elle n'est pas dans la table"""
+        ligne = bisect_left(self.id, id, 0, len(self))
+        return ligne if ligne < len(self) and self.id[ligne] == id else None
+
+    def somme_heures(self, lignes):
+        heures = self.heures
+        return sum(heures[i] for i in lignes)
+
+    def heures_par(self, colonne, lignes):
+        """Somme des heures groupees par la valeur d'une colonne, dans l'ordre d'apparition"""
+        heures = self.heures
+        totaux = {}
+        for i in lignes:
+            cle = colonne[i]
+            totaux[cle] = totaux.get(cle, 0) + heures[i]
+        return totaux
+
+    def matrice_heures(self, lignes=None):
+        """Heures par (employe, projet, annee, mois) en une seule passe"""
+        return self._matrice(self.heures if lignes is None else (self.heures[i] for i in lignes), lignes)
+
+    def matrice_couts(self, couts, lignes=None):
+        """Couts par (employe, projet, annee, mois); couts donne le cout de chaque ligne
+        de lignes (de toute la table par defaut), dans le meme ordre"""
+        return self._matrice(couts, lignes)
+
+    def _matrice(self, valeurs, lignes):
+        if lignes is None:
+            groupes = zip(self.employee_id, self.project_id, self.periode)
+        else:
+            groupes = ((self.employee_id[i], self.project_id[i], self.periode[i]) for i in lignes)
+        totaux = {}
+        for cle, valeur in zip(groupes, valeurs):
+            totaux[cle] = totaux.get(cle, 0) + valeur
+        return {(emp, proj) + annee_mois(p): v for (emp, proj, p), v in totaux.items()}
+
+
+class VueEntree:
+    """Vue poids-mouche sur une ligne de TableEntrees. Expose les memes
+    attributs qu'une TimeEntry, lus directement dans les colonnes. Une fois la
+    table adoptee par un service, les affectations passent par ce service
+    (modifier_entree, changer_statut) pour tenir totaux, stockage et journal."""
+
+    __slots__ = ("table", "ligne")
+
+    def __init__(self, table, ligne):
+        self.table = table
+        self.ligne = ligne
+
+    @property
+    def id(self):
+        """Identifiant stable de l'entree (journal des modifications, stockage)"""
+        return self.table.id[self.ligne]
+
+    @property
+    def employee_id(self):
+        return self.table.employee_id[self.ligne]
+
+    @property
+    def project_id(self):
+        return self.table.project_id[self.ligne]
+
+    @property
+    def jour(self):
+        return date.fromordinal(self.table.jour[self.ligne])
+
+    @property
+    def date(self):
+        """Date au format de saisie "JJ/MM/AAAA" """
+        return formater_date(self.jour)
+
+    @property
+    def heures(self):
+        return self.table.heures[self.ligne]
+
+    @heures.setter
+    def heures(self, heures):
+        if self.table.proprietaire is None:
+            self.table.definir_heures(self.ligne, heures)
+        else:
+            self.table.proprietaire.modifier_entree(self, heures=heures)
+
+    @property
+    def description(self):
+        return self.table.description[self.ligne]
+
+    @description.setter
+    def description(self, description):
+        if self.table.proprietaire is None:
+            self.table.definir_description(self.ligne, description)
+        else:
+            self.table.proprietaire.modifier_entree(self, description=description)
+
+    @property
+    def statut(self):
+        return STATUTS[self.table.statut[self.ligne]]
+
+    @statut.setter
+    def statut(self, statut):
+        if self.table.proprietaire is None:
+            self.table.definir_statut(self.ligne, statut)
+        else:
+            self.table.proprietaire.changer_statut(self, statut)
+
+    def __eq__(self, autre):
+        return isinstance(autre, VueEntree) and autre.table is self.table and autre.ligne == self.ligne
+
+    def __hash__(self):
+        return hash((id(self.table), self.ligne))
+
+    def __repr__(self):
+        return f"VueEntree(ligne={self.ligne}, employe={self.employee_id}, projet={self.project_id}, date={self.date})"
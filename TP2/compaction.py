@@ -0,0 +1,135 @@
+# compaction.py - Resumes des mois clos et archive de leurs entrees
+#
+# La compaction clot les mois dont toutes les entrees sont approuvees: leurs entrees
+# brutes sont ecrites dans une archive sur disque (un fichier TSCOL par mois, voir
+# colonnaire.py), resumees par (employe, projet, mois) puis retirees de la table.
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+
+from chronologie import cle_periode, debut_periode
+from colonnaire import EPOQUE, lire_colonnaire
+from colonnes import CODE_STATUT, annee_mois, periode
+from models import StatutEntree
+from registre import RegistreEntrees
+
+# Colonnes de l'archive relues pour reconstruire les entrees d'un mois clos
+COLONNES_ARCHIVE = ("id", "employee_id", "project_id", "date", "heures", "statut", "description")
+
+
+def periode_limite(avant=None):
+    """Periode (voir colonnes.periode) du mois de la date avant, du mois courant par defaut:
+    seuls les mois anterieurs peuvent etre clos"""
+    jour = avant if avant is not None else date.today()
+    return periode(jour.year, jour.month)
+
+
+def cle_mois(annee, mois, granularite):
+    """Cle de la periode (mois, trimestre ou annee) qui contient un mois"""
+    return cle_periode(debut_periode(date(annee, mois, 1), granularite), granularite)
+
+
+class ResumesMensuels:
+    """Resumes des mois clos: heures, cout et nombre d'entrees par (employe, projet,
+    mois), et chemin de l'archive de chaque mois clos. Les heures et les couts d'un
+    resume sont sommes dans l'ordre des lignes, comme les agregations sur la table:
+    un rapport ou une matrice servis par les resumes sont identiques a ceux calcules
+    sur les entrees brutes."""
+
+    def __init__(self):
+        self.resumes = {}               # (employee_id, project_id, annee, mois) -> [heures, cout, nombre]
+        self.archives = {}              # (annee, mois) -> chemin de l'archive
+        self._periodes = []             # periodes des mois clos, triees
+        self._par_employe_mois = {}     # (employee_id, annee, mois) -> {project_id: resume}
+        self._par_projet_mois = {}      # (project_id, annee, mois) -> {employee_id: resume}
+        self._par_mois = {}             # (annee, mois) -> {(employee_id, project_id): resume}
+        self._projets = set()
+
+    def __len__(self):
+        return len(self.resumes)
+
+    def clore(self, annee, mois, chemin):
+        """Enregistre un mois clos et le chemin de son archive"""
+        if (annee, mois) not in self.archives:
+            insort(self._periodes, periode(annee, mois))
+        self.archives[(annee, mois)] = chemin
+
+    def est_clos(self, annee, mois):
+        return (annee, mois) in self.archives
+
+    def ajouter(self, employee_id, project_id, annee, mois, heures, cout, nombre):
+        resume = [heures, cout, nombre]
+        self.resumes[(employee_id, project_id, annee, mois)] = resume
+        self._par_employe_mois.setdefault((employee_id, annee, mois), {})[project_id] = resume
+        self._par_projet_mois.setdefault((project_id, annee, mois), {})[employee_id] = resume
+        self._par_mois.setdefault((annee, mois), {})[(employee_id, project_id)] = resume
+        self._projets.add(project_id)
+
+    def concerne_projet(self, project_id):
+        return project_id in self._projets
+
+    def mois_entre(self, debut=None, fin=None):
+        """(annee, mois) des mois clos qui chevauchent [debut, fin] (dates incluses), dans l'ordre"""
+        bas = bisect_left(self._periodes, periode(debut.year, debut.month)) if debut is not None else 0
+        haut = (bisect_right(self._periodes, periode(fin.year, fin.month)) if fin is not None
+                else len(self._periodes))
+        return [annee_mois(valeur) for valeur in self._periodes[bas:haut]]
+
+    def concerne(self, annee, mois, employee_ids=None, project_ids=None):
+        """Vrai si le mois clos a des entrees d'un des employes et d'un des projets
+        (ensembles optionnels)"""
+        cellules = self._par_mois.get((annee, mois), {})
+        if employee_ids is None and project_ids is None:
+            return bool(cellules)
+        return any((employee_ids is None or employee_id in employee_ids)
+                   and (project_ids is None or project_id in project_ids)
+                   for employee_id, project_id in cellules)
+
+    def mois_employe(self, employee_id):
+        """(annee, mois) des mois clos ou l'employe a des entrees"""
+        return [(annee, mois) for annee, mois in self.mois_entre()
+                if (employee_id, annee, mois) in self._par_employe_mois]
+
+    def employe_mois(self, employee_id, annee, mois):
+        """{project_id: [heures, cout, nombre]} d'un employe sur un mois clos"""
+        return self._par_employe_mois.get((employee_id, annee, mois), {})
+
+    def cellules(self, annee=None, mois=None):
+        """((employee_id, project_id, annee, mois), resume) de tous les mois clos, ou d'un seul"""
+        if annee is None or mois is None:
+            return self.resumes.items()
+        return (((employee_id, project_id, annee, mois), resume)
+                for (employee_id, project_id), resume in self._par_mois.get((annee, mois), {}).items())
+
+    def totaux(self, type_cle, id, annee, mois):
+        """(heures, cout, nombre d'entrees) d'un employe, d'un projet ou de toute
+        l'entreprise ("tout") sur un mois clos"""
+        if type_cle == "employe":
+            resumes = self._par_employe_mois.get((id, annee, mois), {}).values()
+        elif type_cle == "projet":
+            resumes = self._par_projet_mois.get((id, annee, mois), {}).values()
+        else:
+            resumes = self._par_mois.get((annee, mois), {}).values()
+        heures = cout = 0.0
+        nombre = 0
+        for resume in resumes:
+            heures += resume[0]
+            cout += resume[1]
+            nombre += resume[2]
+        return heures, cout, nombre
+
+    def lire_archive(self, annee, mois):
+        """RegistreEntrees des entrees archivees d'un mois clos, relu depuis le disque
+        (lignes dans l'ordre de saisie, avec leur identifiant stable)"""
+        colonnes = lire_colonnaire(self.archives[(annee, mois)], COLONNES_ARCHIVE, decoder=False)
+        statuts, valeurs = colonnes["statut"]
+        codes = [CODE_STATUT[StatutEntree(valeur)] for valeur in valeurs]
+        indices, descriptions = colonnes["description"]
+        valeur_periode = periode(annee, mois)
+        registre = RegistreEntrees()
+        for id, employee_id, project_id, jour, heures, statut, description in zip(
+                colonnes["id"], colonnes["employee_id"], colonnes["project_id"], colonnes["date"],
+                colonnes["heures"], statuts, indices):
+            registre.charger_ligne(employee_id, project_id, jour + EPOQUE, valeur_periode, heures,
+                                   codes[statut], descriptions[description], id)
+        return registre
@@ -0,0 +1,147 @@
+# concurrence.py - Verrous d'ecriture par employe et lectures coherentes sans verrou
+
+import threading
+from contextlib import contextmanager, ExitStack
+
+
+class _Section:
+    """Verrou reentrant et compteur de version (seqlock): impair pendant une
+    ecriture, pair sinon. Seul le titulaire du verrou modifie le compteur."""
+
+    __slots__ = ("verrou", "version", "profondeur")
+
+    def __init__(self):
+        self.verrou = threading.RLock()
+        self.version = 0
+        self.profondeur = 0
+
+    @contextmanager
+    def ecriture(self):
+        with self.verrou:
+            self.profondeur += 1
+            if self.profondeur == 1:
+                self.version += 1
+            try:
+                yield
+            finally:
+                if self.profondeur == 1:
+                    self.version += 1
+                self.profondeur -= 1
+
+    def lire(self, fonction, essais):
+        """Execute fonction sans verrou et renvoie (resultat, version) si aucune
+        ecriture ne l'a chevauchee; apres essais tentatives, lit sous le verrou"""
+        for _ in range(essais):
+            version = self.version
+            if version % 2:
+                continue
+            try:
+                resultat = fonction()
+            except Exception:
+                if self.version == version:
+                    raise
+                continue            # lecture concurrente d'un etat en cours d'ecriture
+            if self.version == version:
+                return resultat, version
+        with self.verrou:
+            return fonction(), self.version
+
+
+class VerrousEmployes:
+    """Concurrence des ecritures: chaque employe appartient a un shard (verrou
+    + version). Une ecriture prend le shard de l'employe, puis la section commune
+    le seul temps de modifier les structures partagees (table, index, totaux par
+    projet, journal, stockage); les totaux propres a l'employe sont tenus sous son
+    shard, hors section commune.
+    Les lectures d'un employe (rapport, CSV) s'executent sans verrou et sont
+    recommencees si une ecriture du meme shard les a chevauchees; celles de toute
+    la table (matrices, intervalles de dates) le sont si une ecriture de la
+    section commune les a chevauchees.
+    Ordre d'acquisition: shards par numero croissant, puis section commune."""
+
+    actif = True
+
+    def __init__(self, nb_shards=64, essais_lecture=16):
+        self.shards = [_Section() for _ in range(nb_shards)]
+        self.section_commune = _Section()
+        self.essais_lecture = essais_lecture
+
+    def _shard(self, employee_id):
+        return self.shards[hash(employee_id) % len(self.shards)]
+
+    def ecriture(self, employee_id):
+        return self._shard(employee_id).ecriture()
+
+    def ecriture_employes(self, employee_ids):
+        """Prend les shards de plusieurs employes, dans un ordre fixe (pas d'interblocage)"""
+        numeros = sorted({hash(employee_id) % len(self.shards) for employee_id in employee_ids})
+        return self._ecriture_shards(numeros)
+
+    def ecriture_tous(self):
+        return self._ecriture_shards(range(len(self.shards)))
+
+    @contextmanager
+    def _ecriture_shards(self, numeros):
+        with ExitStack() as pile:
+            for numero in numeros:
+                pile.enter_context(self.shards[numero].ecriture())
+            yield
+
+    def commun(self):
+        return self.section_commune.ecriture()
+
+    def version(self, employee_id):
+        return self._shard(employee_id).version
+
+    def lire(self, employee_id, fonction):
+        """(resultat, version) de fonction, coherent pour les donnees de l'employe"""
+        return self._shard(employee_id).lire(fonction, self.essais_lecture)
+
+    def lire_commun(self, fonction):
+        return self.section_commune.lire(fonction, self.essais_lecture)[0]
+
+
+class _SansVerrou:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class VerrousInactifs:
+    """Meme interface que VerrousEmployes, sans synchronisation (mode mono-thread)"""
+
+    actif = False
+    _SANS_VERROU = _SansVerrou()
+
+    def ecriture(self, employee_id):
+        return self._SANS_VERROU
+
+    def ecriture_employes(self, employee_ids):
+        return self._SANS_VERROU
+
+    def ecriture_tous(self):
+        return self._SANS_VERROU
+
+    def commun(self):
+        return self._SANS_VERROU
+
+    def version(self, employee_id):
+        return 0
+
+    def lire(self, employee_id, fonction):
+        return fonction(), 0
+
+    def lire_commun(self, fonction):
+        return fonction()
+
+
+VERROUS_INACTIFS = VerrousInactifs()
+
+
+def creer_verrous(config):
+    """Verrous par employe si config.concurrence, sinon l'objet inactif partage"""
+    return VerrousEmployes() if config.concurrence else VERROUS_INACTIFS
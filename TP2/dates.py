@@ -0,0 +1,40 @@
+# dates.py - Analyse et formatage des dates de saisie
+
+from datetime import date
+
+# format -> (separateur, positions (jour, mois, annee), libelle attendu)
+FORMATS_DATE = {
+    "FR": ("/", (0, 1, 2), "JJ/MM/AAAA"),
+    "US": ("/", (1, 0, 2), "MM/DD/YYYY"),
+    "ISO": ("-", (2, 1, 0), "AAAA-MM-JJ"),
+}
+
+
+def parser_date(valeur, format_date="FR"):
+    """Convertit une date texte (ou deja typee) en datetime.date"""
+    if isinstance(valeur, date):
+        return valeur
+    separateur, (i_jour, i_mois, i_annee), attendu = FORMATS_DATE[format_date]
+    parties = valeur.split(separateur)
+    if len(parties) != 3:
+        raise ValueError(f"Format de date invalide (attendu: {attendu})")
+    try:
+        return date(int(parties[i_annee]), int(parties[i_mois]), int(parties[i_jour]))
+    except ValueError:
+        raise ValueError(f"Format de date invalide (attendu: {attendu})") from None
+
+
+def formater_date(jour, format_date="FR"):
+    """Formate une datetime.date selon le format demande (FR par defaut)"""
+    if format_date == "US":
+        return f"{jour.month:02d}/{jour.day:02d}/{jour.year}"
+    if format_date == "ISO":
+        return f"{jour.year}-{jour.month:02d}-{jour.day:02d}"
+    return f"{jour.day:02d}/{jour.month:02d}/{jour.year}"
+
+
+def bornes_mois(mois, annee):
+    """Ordinaux du premier et du dernier jour d'un mois"""
+    debut = date(annee, mois, 1).toordinal()
+    suivant = date(annee + mois // 12, mois % 12 + 1, 1).toordinal()
+    return debut, suivant - 1
@@ -0,0 +1,204 @@
+# instrumentation.py - Compteurs, histogrammes de latence et profilage echantillonne
+
+import json
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class Histogramme:
+    """Histogramme de latences a seaux logarithmiques (puissances de 2 a partir de 1 us)"""
+
+    BORNES = [1e-6 * 2 ** i for i in range(28)]     # 1 us .. ~134 s
+
+    def __init__(self):
+        self.seaux = [0] * (len(self.BORNES) + 1)
+        self.nombre = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observer(self, valeur):
+        self.nombre += 1
+        self.total += valeur
+        if valeur > self.maximum:
+            self.maximum = valeur
+        index = 0 if valeur <= 1e-6 else min(int(valeur / 1e-6).bit_length(), len(self.BORNES))
+        self.seaux[index] += 1
+
+    def quantile(self, q):
+        """Borne superieure du seau contenant le quantile q (0 < q <= 1)"""
+        if not self.nombre:
+            return 0.0
+        rang = q * self.nombre
+        cumul = 0
+        for index, compte in enumerate(self.seaux):
+            cumul += compte
+            if cumul >= rang:
+                return min(self.BORNES[index], self.maximum) if index < len(self.BORNES) else self.maximum
+        return self.maximum
+
+    def instantane(self):
+        return {"nombre": self.nombre, "total_s": self.total, "max_s": self.maximum,
+                "moyenne_s": self.total / self.nombre if self.nombre else 0.0,
+                "p50_s": self.quantile(0.5), "p95_s": self.quantile(0.95), "p99_s": self.quantile(0.99)}
+
+
+class _Chrono:
+    """Mesure la duree d'un bloc with et l'ajoute a l'histogramme de l'operation"""
+
+    __slots__ = ("metriques", "nom", "debut")
+
+    def __init__(self, metriques, nom):
+        self.metriques = metriques
+        self.nom = nom
+
+    def __enter__(self):
+        self.debut = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metriques.observer(self.nom, time.perf_counter() - self.debut)
+        return False
+
+
+class ProfileurEchantillonne:
+    """Releve a intervalle regulier la fonction en cours d'un thread (par defaut
+    celui qui demarre le profileur) et compte les occurrences par fonction"""
+
+    def __init__(self, intervalle=0.005):
+        self.intervalle = intervalle
+        self.echantillons = Counter()
+        self._cible = None
+        self._arret = threading.Event()
+        self._thread = None
+
+    def demarrer(self, thread_id=None):
+        self._cible = thread_id if thread_id is not None else threading.get_ident()
+        self._arret.clear()
+        self._thread = threading.Thread(target=self._echantillonner, name="profileur", daemon=True)
+        self._thread.start()
+
+    def arreter(self):
+        if self._thread is not None:
+            self._arret.set()
+            self._thread.join()
+            self._thread = None
+
+    def _echantillonner(self):
+        while not self._arret.wait(self.intervalle):
+            cadre = sys._current_frames().get(self._cible)
+            if cadre is not None:
+                code = cadre.f_code
+                self.echantillons[f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}"] += 1
+
+    def plus_frequents(self, nombre=20):
+        return dict(self.echantillons.most_common(nombre))
+
+
+class Metriques:
+    """Metriques des services: compteurs (entrees parcourues, recherches, echecs de
+    validation par raison, octets exportes...) et histogrammes de latence par operation"""
+
+    actif = True
+
+    def __init__(self):
+        self.compteurs = Counter()
+        self.histogrammes = {}
+        self.profileur = None
+        self._verrou = threading.Lock()
+
+    def incrementer(self, nom, valeur=1):
+        with self._verrou:
+            self.compteurs[nom] += valeur
+
+    def observer(self, nom, duree):
+        with self._verrou:
+            histogramme = self.histogrammes.get(nom)
+            if histogramme is None:
+                histogramme = self.histogrammes[nom] = Histogramme()
+            histogramme.observer(duree)
+
+    def chrono(self, nom):
+        """Contexte with qui mesure la latence de l'operation nom"""
+        return _Chrono(self, nom)
+
+    def demarrer_profilage(self, intervalle=0.005):
+        self.arreter_profilage()
+        self.profileur = ProfileurEchantillonne(intervalle)
+        self.profileur.demarrer()
+
+    def arreter_profilage(self):
+        if self.profileur is not None:
+            self.profileur.arreter()
+
+    def reinitialiser(self):
+        with self._verrou:
+            self.compteurs.clear()
+            self.histogrammes.clear()
+
+    def instantane(self):
+        """Copie des metriques sous forme de dict serialisable en JSON"""
+        with self._verrou:
+            resultat = {"compteurs": dict(self.compteurs),
+                        "latences": {nom: h.instantane() for nom, h in self.histogrammes.items()}}
+        if self.profileur is not None:
+            resultat["profil"] = self.profileur.plus_frequents()
+        return resultat
+
+    def json(self, indent=2):
+        return json.dumps(self.instantane(), indent=indent, sort_keys=True)
+
+
+class _ChronoInactif:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class MetriquesInactives:
+    """Meme interface que Metriques, sans rien enregistrer (instrumentation desactivee)"""
+
+    actif = False
+    _CHRONO = _ChronoInactif()
+
+    def incrementer(self, nom, valeur=1):
+        pass
+
+    def observer(self, nom, duree):
+        pass
+
+    def chrono(self, nom):
+        return self._CHRONO
+
+    def demarrer_profilage(self, intervalle=0.005):
+        pass
+
+    def arreter_profilage(self):
+        pass
+
+    def reinitialiser(self):
+        pass
+
+    def instantane(self):
+        return {"compteurs": {}, "latences": {}}
+
+    def json(self, indent=2):
+        return json.dumps(self.instantane(), indent=indent, sort_keys=True)
+
+
+METRIQUES_INACTIVES = MetriquesInactives()
+
+
+def creer_metriques(config):
+    """Metriques actives si config.instrumentation, sinon l'objet inactif partage"""
+    if not config.instrumentation:
+        return METRIQUES_INACTIVES
+    metriques = Metriques()
+    if config.profilage:
+        metriques.demarrer_profilage()
+    return metriques
@@ -2,6 +2,8 @@
 
 from enum import Enum
 
+from dates import parser_date, formater_date
+
 class TypeContrat(Enum):
     CDI = "CDI"
     CDD = "CDD"
@@ -19,6 +21,8 @@ class StatutEntree(Enum):
 class Projet:
     """Un projet sur lequel les employes peuvent saisir du temps"""
 
+    __slots__ = ("id", "nom", "code", "budget_heures")
+
     def __init__(self, id, nom, code, budget_heures):
         self.id = id
         self.nom = nom
@@ -29,6 +33,9 @@ class Projet:
 class Employee:
     """Stocke les informations d'un employe"""
 
+    __slots__ = ("id", "nom", "prenom", "telephone", "email", "date_embauche", "type_contrat",
+                 "_taux_horaire", "_changer_taux")
+
     def __init__(self, id, nom, prenom, telephone, email, date_embauche, type_contrat, taux_horaire):
         self.id = id
         self.nom = nom
@@ -37,16 +44,38 @@ class Employee:
         self.email = email
         self.date_embauche = date_embauche  # "2023-01-15"
         self.type_contrat = type_contrat    # "CDI", "CDD", "Stage", "Alternance"
-        self.taux_horaire = taux_horaire    # 35.0
+        self._taux_horaire = taux_horaire   # 35.0, dernier taux en vigueur (historique: HistoriqueTaux)
+        self._changer_taux = None           # TimesheetService.changer_taux_horaire, une fois ajoute
+
+    @property
+    def taux_horaire(self):
+        return self._taux_horaire
+
+    @taux_horaire.setter
+    def taux_horaire(self, taux):
+        """Une fois l'employe ajoute a un service, le nouveau taux passe par
+        changer_taux_horaire: il s'applique a toutes ses entrees, comme sans historique"""
+        if self._changer_taux is None:
+            self._taux_horaire = taux
+        else:
+            self._changer_taux(self.id, taux)
 
 
 class TimeEntry:
-    """Une entree de temps saisie par un employe"""
+    """Une entree de temps saisie par un employe. Une fois saisie, l'entree est
+    rangee dans la table columnaire et relue via une VueEntree."""
+
+    __slots__ = ("employee_id", "project_id", "jour", "heures", "description", "statut")
 
     def __init__(self, employee_id, project_id, date, heures, description, statut):
         self.employee_id = employee_id
         self.project_id = project_id
-        self.date = date                # "15/03/2024"
+        self.jour = parser_date(date)   # datetime.date(2024, 3, 15), analyse une seule fois
         self.heures = heures            # 8.0
         self.description = description
         self.statut = statut            # "brouillon", "soumis", "approuve", "rejete"
+
+    @property
+    def date(self):
+        """Date au format de saisie "JJ/MM/AAAA" """
+        return formater_date(self.jour)
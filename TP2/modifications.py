@@ -0,0 +1,82 @@
+# modifications.py - Journal sequence des modifications (flux de changements)
+
+from array import array
+
+# Codes compacts = position dans le tuple
+OBJETS = ("entree", "employe", "projet")
+OPERATIONS = ("insertion", "modification", "statut", "taux_horaire")
+CODE_OBJET = {objet: code for code, objet in enumerate(OBJETS)}
+CODE_OPERATION = {operation: code for code, operation in enumerate(OPERATIONS)}
+
+# Colonnes de JournalModifications et leur type array
+COLONNES_JOURNAL = (("objet", "b"), ("operation", "b"), ("identifiant", "q"), ("valeur", "b"))
+
+
+class PointDeRepriseExpire(ValueError):
+    """Les modifications posterieures au point de reprise ne sont plus toutes au journal"""
+
+
+class JournalModifications:
+    """Journal en ajout seul des insertions et changements d'entrees, d'employes et
+    de projets, en colonnes. Chaque modification recoit un numero de sequence
+    strictement croissant; un consommateur garde la derniere sequence lue comme
+    point de reprise. Une entree est identifiee par son identifiant stable (entree.id),
+    inchange par la compaction: une modification enregistree n'est jamais reecrite.
+    valeur porte le nouveau code statut d'une transition, -1 sinon."""
+
+    def __init__(self):
+        self.premiere = 1               # sequence de la premiere modification conservee
+        self.objet = array("b")
+        self.operation = array("b")
+        self.identifiant = array("q")
+        self.valeur = array("b")
+
+    def __len__(self):
+        return len(self.valeur)
+
+    @property
+    def derniere(self):
+        """Sequence de la derniere modification (0 si aucune n'a eu lieu)"""
+        return self.premiere + len(self.valeur) - 1
+
+    def ajouter(self, objet, operation, identifiant, valeur=-1):
+        """Enregistre une modification et renvoie sa sequence"""
+        self.objet.append(CODE_OBJET[objet])
+        self.operation.append(CODE_OPERATION[operation])
+        self.identifiant.append(identifiant)
+        self.valeur.append(valeur)
+        return self.derniere
+
+    def charger(self, lignes):
+        """Recharge des lignes (sequence, code objet, code operation, identifiant, valeur)
+        triees par sequence, depuis le stockage"""
+        for sequence, objet, operation, identifiant, valeur in lignes:
+            if not self.valeur:
+                self.premiere = sequence
+            elif sequence != self.derniere + 1:
+                raise ValueError(f"Journal des modifications discontinu a la sequence {sequence}")
+            self.objet.append(objet)
+            self.operation.append(operation)
+            self.identifiant.append(identifiant)
+            self.valeur.append(valeur)
+
+    def lignes(self):
+        """(sequence, code objet, code operation, identifiant, valeur) de chaque modification conservee"""
+        return zip(range(self.premiere, self.derniere + 1), self.objet, self.operation, self.identifiant, self.valeur)
+
+    def depuis(self, point, jusqu_a=None):
+        """Modifications de sequence > point (et <= jusqu_a), dans l'ordre:
+        (sequence, objet, operation, identifiant, valeur)"""
+        if point < self.premiere - 1:
+            raise PointDeRepriseExpire(f"Point de reprise {point} anterieur au journal (premiere sequence {self.premiere})")
+        fin = self.derniere if jusqu_a is None else min(jusqu_a, self.derniere)
+        for i in range(point + 1 - self.premiere, fin + 1 - self.premiere):
+            yield (self.premiere + i, OBJETS[self.objet[i]], OPERATIONS[self.operation[i]],
+                   self.identifiant[i], self.valeur[i])
+
+    def tronquer(self, jusqu_a):
+        """Oublie les modifications de sequence <= jusqu_a (deja lues par tous les consommateurs)"""
+        nombre = max(0, min(jusqu_a, self.derniere) + 1 - self.premiere)
+        for colonne in (self.objet, self.operation, self.identifiant, self.valeur):
+            del colonne[:nombre]
+        self.premiere += nombre
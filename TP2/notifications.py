@@ -1,68 +1,282 @@
 # notifications.py - Service de notifications et workflow d'approbation
 
+import asyncio
+import sys
+import threading
+from collections import deque
+
 from models import StatutEntree
+from dates import formater_date
 
 class NotificationService:
-    """Service de notification des employes et managers"""
+    """Service de notification des employes et managers.
+    Seules les taille_historique dernieres notifications sont conservees."""
 
-    def __init__(self):
-        self.notifications_envoyees = []
+    def __init__(self, taille_historique=1000):
+        self.notifications_envoyees = deque(maxlen=taille_historique)
 
     def notifier_soumission(self, employee_nom, manager_nom, projet_nom, heures, date_debut, date_fin):
         """Notifie la soumission d'une feuille de temps"""
         message = f"Soumission de {employee_nom} sur {projet_nom}: {heures:.1f}h ({date_debut} - {date_fin})"
-        self.notifications_envoyees.append(message)
-        print(message)
+        self._envoyer(manager_nom, message)
         if heures > 40:
             cout = heures * 35.0
-            print(f"  ALERTE: Depassement heures pour {employee_nom} - Cout estime: {cout:.2f} EUR")
+            self._alerter(manager_nom, f"  ALERTE: Depassement heures pour {employee_nom} - Cout estime: {cout:.2f} EUR")
 
     def notifier_approbation(self, employee_nom, manager_nom, projet_nom, heures, date_debut, date_fin):
         """Notifie l'approbation d'une feuille de temps"""
         message = f"Approbation par {manager_nom} pour {employee_nom} sur {projet_nom}: {heures:.1f}h ({date_debut} - {date_fin})"
-        self.notifications_envoyees.append(message)
-        print(message)
+        self._envoyer(employee_nom, message)
         if heures > 40:
             cout = heures * 35.0
-            print(f"  INFO: Heures supplementaires pour {employee_nom} - Cout: {cout:.2f} EUR")
+            self._alerter(employee_nom, f"  INFO: Heures supplementaires pour {employee_nom} - Cout: {cout:.2f} EUR")
 
     def notifier_rejet(self, employee_nom, manager_nom, projet_nom, heures, date_debut, date_fin, raison):
         """Notifie le rejet d'une feuille de temps"""
         message = f"Rejet par {manager_nom} pour {employee_nom} sur {projet_nom}: {heures:.1f}h - Raison: {raison}"
+        self._envoyer(employee_nom, message)
+
+    def _envoyer(self, destinataire, message):
         self.notifications_envoyees.append(message)
         print(message)
 
+    def _alerter(self, destinataire, message):
+        print(message)
+
+
+class TransportFichier:
+    """Transport local: ecrit chaque digest dans un fichier (la sortie standard par defaut)"""
+
+    def __init__(self, fichier=None):
+        self.fichier = fichier if fichier is not None else sys.stdout
+
+    async def envoyer(self, destinataire, messages):
+        if len(messages) == 1:
+            self.fichier.write(messages[0] + "\n")
+        else:
+            lignes = [f"Digest pour {destinataire} ({len(messages)} notifications):"]
+            lignes.extend(f"  - {message.strip()}" for message in messages)
+            self.fichier.write("\n".join(lignes) + "\n")
+        self.fichier.flush()
+
+
+class TransportMemoire:
+    """Transport factice en memoire, pour les tests"""
+
+    def __init__(self):
+        self.envois = []
+
+    async def envoyer(self, destinataire, messages):
+        self.envois.append((destinataire, list(messages)))
+
+
+class NotificationServiceAsync(NotificationService):
+    """Notifications asynchrones. Les messages passent par une file bornee
+    (taille_file) consommee par une boucle asyncio dans un thread dedie, qui
+    les regroupe par destinataire et envoie un digest par lot via le transport.
+    Les appels notifier_* rendent la main des que le message est en file; ils
+    ne bloquent que si la file est pleine."""
+
+    def __init__(self, transport, taille_file=1000, taille_lot=100, delai_lot=0.05, taille_historique=1000):
+        super().__init__(taille_historique)
+        self.transport = transport
+        self.taille_file = taille_file
+        self.taille_lot = taille_lot
+        self.delai_lot = delai_lot
+        self.echecs = 0
+        self._boucle = None
+        self._file = None
+        self._thread = None
+
+    def demarrer(self):
+        """Demarre la boucle de distribution en arriere-plan"""
+        pret = threading.Event()
+        self._boucle = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._executer, args=(pret,), daemon=True)
+        self._thread.start()
+        pret.wait()
+        return self
+
+    def arreter(self):
+        """Livre les messages encore en file puis arrete la boucle"""
+        if self._boucle is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._file.put(None), self._boucle).result()
+        self._thread.join()
+        self._boucle = None
+
+    def __enter__(self):
+        return self.demarrer()
+
+    def __exit__(self, *exc):
+        self.arreter()
+
+    def _envoyer(self, destinataire, message):
+        self.notifications_envoyees.append(message)
+        self._publier(destinataire, message)
+
+    def _alerter(self, destinataire, message):
+        self._publier(destinataire, message)
+
+    def _publier(self, destinataire, message):
+        if self._boucle is None:
+            self.demarrer()
+        asyncio.run_coroutine_threadsafe(self._file.put((destinataire, message)), self._boucle).result()
+
+    def _executer(self, pret):
+        asyncio.set_event_loop(self._boucle)
+        self._file = asyncio.Queue(self.taille_file)
+        pret.set()
+        self._boucle.run_until_complete(self._distribuer())
+        self._boucle.close()
+
+    async def _distribuer(self):
+        while True:
+            element = await self._file.get()
+            if element is None:
+                return
+            if self._file.qsize() < self.taille_lot:
+                await asyncio.sleep(self.delai_lot)  # laisse le lot se remplir
+            lot = [element]
+            fin = False
+            while len(lot) < self.taille_lot and not self._file.empty():
+                element = self._file.get_nowait()
+                if element is None:
+                    fin = True
+                    break
+                lot.append(element)
+            await self._livrer(lot)
+            if fin:
+                return
+
+    async def _livrer(self, lot):
+        par_destinataire = {}
+        for destinataire, message in lot:
+            par_destinataire.setdefault(destinataire, []).append(message)
+        for destinataire, messages in par_destinataire.items():
+            try:
+                await self.transport.envoyer(destinataire, messages)
+            except Exception:
+                self.echecs += 1
+
 
 class ApprobationWorkflow:
     """Gestion du workflow d'approbation des feuilles de temps"""
 
+    # statut cible -> statuts de depart autorises pour les traitements par lot
+    TRANSITIONS = {
+        StatutEntree.SOUMIS: {StatutEntree.BROUILLON, StatutEntree.REJETE},
+        StatutEntree.APPROUVE: {StatutEntree.SOUMIS},
+        StatutEntree.REJETE: {StatutEntree.BROUILLON, StatutEntree.SOUMIS},
+    }
+
     def __init__(self, timesheet_service, notification_service):
         self.timesheet_service = timesheet_service
         self.notification_service = notification_service
 
     def soumettre(self, entree):
         """Soumet une entree de temps pour approbation"""
-        entree.statut = StatutEntree.SOUMIS
-        emp_nom = self.timesheet_service._trouver_employe(entree.employee_id).nom
-        projet_nom = self.timesheet_service._trouver_projet(entree.project_id).nom
-        self.notification_service.notifier_soumission(
-            emp_nom, "Manager", projet_nom, entree.heures, entree.date, entree.date
-        )
+        with self.timesheet_service.metriques.chrono("workflow.soumettre"):
+            self.timesheet_service.changer_statut(entree, StatutEntree.SOUMIS)
+            emp_nom = self.timesheet_service._trouver_employe(entree.employee_id).nom
+            projet_nom = self.timesheet_service._trouver_projet(entree.project_id).nom
+            self.notification_service.notifier_soumission(
+                emp_nom, "Manager", projet_nom, entree.heures, entree.date, entree.date
+            )
 
     def approuver(self, entree, manager_nom):
         """Approuve une entree de temps"""
-        entree.statut = StatutEntree.APPROUVE
-        emp_nom = self.timesheet_service._trouver_employe(entree.employee_id).nom
-        projet_nom = self.timesheet_service._trouver_projet(entree.project_id).nom
-        self.notification_service.notifier_approbation(
-            emp_nom, manager_nom, projet_nom, entree.heures, entree.date, entree.date
-        )
+        with self.timesheet_service.metriques.chrono("workflow.approuver"):
+            self.timesheet_service.changer_statut(entree, StatutEntree.APPROUVE)
+            emp_nom = self.timesheet_service._trouver_employe(entree.employee_id).nom
+            projet_nom = self.timesheet_service._trouver_projet(entree.project_id).nom
+            self.notification_service.notifier_approbation(
+                emp_nom, manager_nom, projet_nom, entree.heures, entree.date, entree.date
+            )
 
     def rejeter(self, entree, manager_nom, raison):
         """Rejette une entree de temps"""
-        entree.statut = StatutEntree.REJETE
-        emp_nom = self.timesheet_service._trouver_employe(entree.employee_id).nom
-        projet_nom = self.timesheet_service._trouver_projet(entree.project_id).nom
-        self.notification_service.notifier_rejet(
-            emp_nom, manager_nom, projet_nom, entree.heures, entree.date, entree.date, raison
-        )
+        with self.timesheet_service.metriques.chrono("workflow.rejeter"):
+            self.timesheet_service.changer_statut(entree, StatutEntree.REJETE)
+            emp_nom = self.timesheet_service._trouver_employe(entree.employee_id).nom
+            projet_nom = self.timesheet_service._trouver_projet(entree.project_id).nom
+            self.notification_service.notifier_rejet(
+                emp_nom, manager_nom, projet_nom, entree.heures, entree.date, entree.date, raison
+            )
+
+    def soumettre_lot(self, entrees):
+        """Soumet un lot d'entrees (par exemple issu de selectionner_entrees).
+        Renvoie la liste des erreurs; si elle n'est pas vide, aucun statut n'a change."""
+        return self._traiter_lot(entrees, StatutEntree.SOUMIS, self._notifier_soumission_lot)
+
+    def approuver_lot(self, entrees, manager_nom):
+        """Approuve un lot d'entrees soumises, en tout ou rien"""
+        return self._traiter_lot(
+            entrees, StatutEntree.APPROUVE,
+            lambda emp_nom, projets, heures, debut, fin: self.notification_service.notifier_approbation(
+                emp_nom, manager_nom, projets, heures, debut, fin))
+
+    def rejeter_lot(self, entrees, manager_nom, raison):
+        """Rejette un lot d'entrees, en tout ou rien"""
+        return self._traiter_lot(
+            entrees, StatutEntree.REJETE,
+            lambda emp_nom, projets, heures, debut, fin: self.notification_service.notifier_rejet(
+                emp_nom, manager_nom, projets, heures, debut, fin, raison))
+
+    def _notifier_soumission_lot(self, emp_nom, projets, heures, debut, fin):
+        self.notification_service.notifier_soumission(emp_nom, "Manager", projets, heures, debut, fin)
+
+    def _traiter_lot(self, entrees, statut, notifier):
+        """Verifie les transitions de tout le lot, applique les statuts puis envoie
+        une notification agregee par employe (heures totales, periode couverte)"""
+        metriques = self.timesheet_service.metriques
+        with metriques.chrono("workflow.lot"):
+            erreurs = self._appliquer_lot(entrees, statut, notifier)
+        if erreurs:
+            metriques.incrementer("workflow.lots_refuses")
+            metriques.incrementer("workflow.transitions_refusees", len(erreurs))
+        return erreurs
+
+    def _appliquer_lot(self, entrees, statut, notifier):
+        service = self.timesheet_service
+        entrees = list({entree.id: entree for entree in entrees}.values())   # une entree citee deux fois ne compte qu'une fois
+        autorises = self.TRANSITIONS[statut]
+        employes = {}
+        projets = {}
+        erreurs = []
+        par_employe = {}    # employee_id -> [heures, premier jour, dernier jour, {project_id}]
+        # verification et application sans changement de statut concurrent sur ces employes
+        with service.verrous.ecriture_employes({entree.employee_id for entree in entrees}):
+            # vues obtenues avant une compaction: relues par identifiant dans la table courante
+            courantes = [service._entree_courante(entree) for entree in entrees]
+            for entree, courante in zip(entrees, courantes):
+                if entree.employee_id not in employes:
+                    employes[entree.employee_id] = service._trouver_employe(entree.employee_id)
+                if entree.project_id not in projets:
+                    projets[entree.project_id] = service._trouver_projet(entree.project_id)
+                if employes[entree.employee_id] is None or projets[entree.project_id] is None:
+                    erreurs.append(f"Entree du {entree.date}: employe ou projet inexistant")
+                elif courante is None:
+                    erreurs.append(f"Entree du {entree.date}: mois clos")
+                elif courante.statut not in autorises:
+                    erreurs.append(f"Entree du {entree.date}: transition {courante.statut.value} -> {statut.value} interdite")
+            if erreurs:
+                return erreurs
+
+            for entree in courantes:
+                service.changer_statut(entree, statut)
+                jour = entree.jour
+                cumul = par_employe.get(entree.employee_id)
+                if cumul is None:
+                    par_employe[entree.employee_id] = [entree.heures, jour, jour, {entree.project_id: None}]
+                else:
+                    cumul[0] += entree.heures
+                    cumul[1] = min(cumul[1], jour)
+                    cumul[2] = max(cumul[2], jour)
+                    cumul[3][entree.project_id] = None
+        service.valider()
+
+        for employee_id, (heures, debut, fin, projets_lot) in par_employe.items():
+            projets_noms = ", ".join(projets[project_id].nom for project_id in projets_lot)
+            notifier(employes[employee_id].nom, projets_noms, heures, formater_date(debut), formater_date(fin))
+        return []
@@ -0,0 +1,120 @@
+# registre.py - Stockage indexe des entrees de temps
+
+from array import array
+
+from colonnes import TableEntrees, VueEntree, annee_mois
+
+
+class RegistreEntrees:
+    """Stocke les entrees de temps avec des index par employe, projet et mois.
+    Les recherches coutent un temps proportionnel a la taille du resultat.
+    Les entrees ne sont conservees que dans la table columnaire: les index
+    contiennent des numeros de ligne (array "i", 4 octets par ligne et par index)
+    et l'acces renvoie des VueEntree."""
+
+    def __init__(self):
+        self.table = TableEntrees()
+        self._par_employe = {}
+        self._par_projet = {}
+        self._par_mois = {}
+        self._par_employe_mois = {}
+        self._par_projet_mois = {}
+
+    def ajouter(self, entree):
+        """Ajoute une TimeEntry et renvoie la VueEntree de sa ligne"""
+        ligne = self.ajouter_valeurs(entree.employee_id, entree.project_id, entree.jour,
+                                     entree.heures, entree.statut, entree.description)
+        return VueEntree(self.table, ligne)
+
+    def ajouter_valeurs(self, employee_id, project_id, jour, heures, statut, description):
+        """Ajoute une entree donnee champ par champ et renvoie son numero de ligne"""
+        ligne = self.table.ajouter(employee_id, project_id, jour, heures, statut, description)
+        self._indexer_ligne(ligne, employee_id, project_id, jour.year, jour.month)
+        return ligne
+
+    def charger_ligne(self, employee_id, project_id, jour, periode, heures, code_statut, description, id=None):
+        """Ajoute une ligne deja encodee (ordinal, periode, code statut), avec l'identifiant
+        stable de l'entree rechargee"""
+        ligne = self.table.ajouter_ligne(employee_id, project_id, jour, periode, heures, code_statut,
+                                         description, id)
+        annee, mois = annee_mois(periode)
+        self._indexer_ligne(ligne, employee_id, project_id, annee, mois)
+        return ligne
+
+    def par_id(self, id):
+        """VueEntree de l'entree d'identifiant stable id, None si elle n'est plus dans la table"""
+        ligne = self.table.ligne_de(id)
+        return VueEntree(self.table, ligne) if ligne is not None else None
+
+    def lignes_employe(self, employee_id):
+        return self._par_employe.get(employee_id, [])
+
+    def lignes_projet(self, project_id):
+        return self._par_projet.get(project_id, [])
+
+    def lignes_employe_mois(self, employee_id, mois, annee):
+        return self._par_employe_mois.get((employee_id, annee, mois), [])
+
+    def lignes_projet_mois(self, project_id, mois, annee):
+        return self._par_projet_mois.get((project_id, annee, mois), [])
+
+    def lignes_mois(self, mois, annee):
+        return self._par_mois.get((annee, mois), [])
+
+    def mois(self):
+        """(annee, mois) des mois ayant au moins une entree"""
+        return list(self._par_mois)
+
+    def par_employe(self, employee_id):
+        return self._entrees_de(self.lignes_employe(employee_id))
+
+    def par_projet(self, project_id):
+        return self._entrees_de(self.lignes_projet(project_id))
+
+    def par_mois(self, mois, annee):
+        return self._entrees_de(self.lignes_mois(mois, annee))
+
+    def par_employe_mois(self, employee_id, mois, annee):
+        return self._entrees_de(self.lignes_employe_mois(employee_id, mois, annee))
+
+    def par_projet_mois(self, project_id, mois, annee):
+        return self._entrees_de(self.lignes_projet_mois(project_id, mois, annee))
+
+    def __len__(self):
+        return len(self.table)
+
+    def __iter__(self):
+        table = self.table
+        for ligne in range(len(table)):
+            yield VueEntree(table, ligne)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._entrees_de(range(*index.indices(len(self.table))))
+        if index < 0:
+            index += len(self.table)
+        if not 0 <= index < len(self.table):
+            raise IndexError("index d'entree hors limites")
+        return VueEntree(self.table, index)
+
+    def _entrees_de(self, lignes):
+        table = self.table
+        return [VueEntree(table, ligne) for ligne in lignes]
+
+    def _indexer_ligne(self, ligne, employee_id, project_id, annee, mois):
+        self._indexer(self._par_employe, employee_id, ligne)
+        self._indexer(self._par_projet, project_id, ligne)
+        self._indexer(self._par_mois, (annee, mois), ligne)
+        self._indexer(self._par_employe_mois, (employee_id, annee, mois), ligne)
+        self._indexer(self._par_projet_mois, (project_id, annee, mois), ligne)
+
+    @staticmethod
+    def _indexer(index, cle, ligne):
+        lignes = index.get(cle)
+        if lignes is None:
+            index[cle] = array("i", (ligne,))
+        elif type(lignes) is array:
+            lignes.append(ligne)
+        else:
+            lignes = index[cle] = array("i", lignes)   # vue en lecture seule d'un cliche
+            lignes.append(ligne)
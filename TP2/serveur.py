@@ -0,0 +1,256 @@
+# serveur.py - Frontal asyncio du service de feuilles de temps
+#
+# Protocole: une requete JSON par ligne, une reponse JSON par ligne.
+#   {"id": 1, "methode": "calculer_cout_projet", "params": {"project_id": 1, "mois": 3, "annee": 2024}}
+#   {"id": 1, "resultat": 385.0}            ou    {"id": 1, "erreur": "..."}
+# Les reponses peuvent arriver dans le desordre: le client les associe par id.
+#
+# Usage:
+#   python3 serveur.py --cliche donnees.cliche --port 8765
+#   python3 serveur.py --sqlite donnees.db --stdio
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from instrumentation import Histogramme
+
+# methode -> (parametres dans l'ordre d'appel, execution dans l'executeur)
+METHODES = {
+    "generer_rapport_mensuel": (("employee_id", "mois", "annee"), True),
+    "exporter_csv": (("employee_id", "mois", "annee"), True),
+    "calculer_heures_employe": (("employee_id", "mois", "annee"), False),
+    "calculer_cout_projet": (("project_id", "mois", "annee"), False),
+    "cumuls_employe": (("employee_id", "debut", "fin", "granularite"), True),
+    "cumuls_projet": (("project_id", "debut", "fin", "granularite"), True),
+    "matrice_couts": (("mois", "annee"), True),
+}
+
+
+class RequeteInvalide(ValueError):
+    pass
+
+
+def _json(valeur):
+    """Cles de dict non textuelles (tuples de periode, de matrice) converties en texte"""
+    if isinstance(valeur, dict):
+        return {k if isinstance(k, str) else json.dumps(k if not isinstance(k, tuple) else list(k)): _json(v)
+                for k, v in valeur.items()}
+    if isinstance(valeur, tuple):
+        return [_json(v) for v in valeur]
+    return valeur
+
+
+class ServeurTimesheet:
+    """Sert les requetes de lecture d'un TimesheetService. Les requetes identiques
+    en cours sont fusionnees: une seule execution, le meme resultat pour tous.
+    Les agregations couteuses s'executent dans un pool de threads pour ne pas
+    bloquer la boucle; les lectures en temps constant restent dans la boucle."""
+
+    def __init__(self, service, workers=4):
+        self.service = service
+        self.executeur = ThreadPoolExecutor(workers, thread_name_prefix="serveur")
+        self.en_cours = {}              # (methode, arguments) -> Future partagee
+        self.latences = {}              # methode -> Histogramme
+        self.requetes = 0
+        self.fusionnees = 0
+        self.erreurs = 0
+        self.profondeur_max = 0
+        self._serveur = None
+
+    async def traiter(self, methode, params=None):
+        """Execute une requete (ou rejoint une requete identique en cours)"""
+        debut = time.perf_counter()
+        self.requetes += 1
+        try:
+            noms, lourde = METHODES[methode]
+        except KeyError:
+            raise RequeteInvalide(f"Methode inconnue: {methode}") from None
+        params = params or {}
+        inconnus = set(params) - set(noms)
+        if inconnus:
+            raise RequeteInvalide(f"Parametres inconnus pour {methode}: {', '.join(sorted(inconnus))}")
+        arguments = tuple(params.get(nom) for nom in noms)
+        cle = (methode, arguments)
+
+        futur = self.en_cours.get(cle)
+        if futur is not None:
+            self.fusionnees += 1
+        else:
+            futur = self.en_cours[cle] = asyncio.ensure_future(self._executer(methode, arguments, lourde))
+            futur.add_done_callback(lambda _: self.en_cours.pop(cle, None))
+            self.profondeur_max = max(self.profondeur_max, len(self.en_cours))
+        try:
+            return await asyncio.shield(futur)
+        finally:
+            histogramme = self.latences.get(methode)
+            if histogramme is None:
+                histogramme = self.latences[methode] = Histogramme()
+            histogramme.observer(time.perf_counter() - debut)
+
+    async def _executer(self, methode, arguments, lourde):
+        fonction = getattr(self.service, methode)
+        if methode in ("cumuls_employe", "cumuls_projet") and arguments[-1] is None:
+            arguments = arguments[:-1]      # granularite par defaut
+        if lourde:
+            return await asyncio.get_running_loop().run_in_executor(self.executeur, fonction, *arguments)
+        return fonction(*arguments)
+
+    def statistiques(self):
+        return {"requetes": self.requetes, "fusionnees": self.fusionnees, "erreurs": self.erreurs,
+                "en_cours": len(self.en_cours), "profondeur_max": self.profondeur_max,
+                "latences": {methode: h.instantane() for methode, h in self.latences.items()}}
+
+    async def servir_flux(self, lecteur, ecrivain):
+        """Traite les requetes d'une connexion; chaque requete est une tache, les
+        reponses sont ecrites des qu'elles sont pretes"""
+        taches = set()
+        try:
+            while True:
+                ligne = await lecteur.readline()
+                if not ligne:
+                    break
+                if ligne.strip():
+                    tache = asyncio.ensure_future(self._repondre(ligne, ecrivain))
+                    taches.add(tache)
+                    tache.add_done_callback(taches.discard)
+            if taches:
+                await asyncio.gather(*taches)
+        finally:
+            ecrivain.close()
+
+    async def _repondre(self, ligne, ecrivain):
+        identifiant = None
+        try:
+            requete = json.loads(ligne)
+            identifiant = requete.get("id")
+            if requete.get("methode") == "statistiques":
+                reponse = {"id": identifiant, "resultat": self.statistiques()}
+            else:
+                reponse = {"id": identifiant, "resultat": _json(
+                    await self.traiter(requete.get("methode"), requete.get("params")))}
+        except Exception as erreur:     # l'erreur est renvoyee au client, le serveur continue
+            self.erreurs += 1
+            reponse = {"id": identifiant, "erreur": str(erreur) or type(erreur).__name__}
+        ecrivain.write(json.dumps(reponse).encode("utf-8") + b"\n")
+        await ecrivain.drain()
+
+    async def demarrer(self, hote="127.0.0.1", port=0):
+        """Ecoute sur un socket TCP local; renvoie le port effectif"""
+        self._serveur = await asyncio.start_server(self.servir_flux, hote, port)
+        return self._serveur.sockets[0].getsockname()[1]
+
+    async def arreter(self):
+        if self._serveur is not None:
+            self._serveur.close()
+            await self._serveur.wait_closed()
+            self._serveur = None
+        self.executeur.shutdown(wait=True)
+
+
+class ClientTimesheet:
+    """Client asyncio du serveur: plusieurs requetes peuvent etre en vol sur la
+    meme connexion"""
+
+    def __init__(self, lecteur, ecrivain):
+        self._lecteur = lecteur
+        self._ecrivain = ecrivain
+        self._attentes = {}
+        self._prochain_id = 0
+        self._reception = asyncio.ensure_future(self._recevoir())
+
+    @classmethod
+    async def connecter(cls, hote="127.0.0.1", port=8765):
+        return cls(*await asyncio.open_connection(hote, port))
+
+    async def appeler(self, methode, **params):
+        """Envoie une requete et renvoie son resultat; leve RuntimeError si le serveur repond une erreur"""
+        self._prochain_id += 1
+        identifiant = self._prochain_id
+        futur = self._attentes[identifiant] = asyncio.get_running_loop().create_future()
+        self._ecrivain.write(json.dumps({"id": identifiant, "methode": methode, "params": params}).encode("utf-8") + b"\n")
+        await self._ecrivain.drain()
+        reponse = await futur
+        if "erreur" in reponse:
+            raise RuntimeError(reponse["erreur"])
+        return reponse["resultat"]
+
+    async def _recevoir(self):
+        while True:
+            ligne = await self._lecteur.readline()
+            if not ligne:
+                break
+            reponse = json.loads(ligne)
+            futur = self._attentes.pop(reponse.get("id"), None)
+            if futur is not None and not futur.done():
+                futur.set_result(reponse)
+        for futur in self._attentes.values():
+            if not futur.done():
+                futur.set_exception(ConnectionError("Connexion fermee par le serveur"))
+
+    async def fermer(self):
+        self._ecrivain.close()
+        await self._ecrivain.wait_closed()
+        await self._reception
+
+
+class _SortieStandard:
+    """Ecrivain minimal sur la sortie standard (qui peut etre un fichier, pas un tube)"""
+
+    def write(self, donnees):
+        sys.stdout.buffer.write(donnees)
+
+    async def drain(self):
+        sys.stdout.buffer.flush()
+
+    def close(self):
+        sys.stdout.buffer.flush()
+
+
+async def _servir_stdio(serveur):
+    lecteur = asyncio.StreamReader()
+    await asyncio.get_running_loop().connect_read_pipe(lambda: asyncio.StreamReaderProtocol(lecteur), sys.stdin)
+    await serveur.servir_flux(lecteur, _SortieStandard())
+
+
+async def _servir(service, options):
+    serveur = ServeurTimesheet(service, options.workers)
+    if options.stdio:
+        await _servir_stdio(serveur)
+    else:
+        port = await serveur.demarrer(options.hote, options.port)
+        print(f"Serveur en ecoute sur {options.hote}:{port}", file=sys.stderr)
+        await asyncio.Event().wait()
+    await serveur.arreter()
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Frontal asyncio du service de feuilles de temps")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--cliche", help="cliche binaire (voir cliche.py)")
+    source.add_argument("--sqlite", help="base SQLite (voir stockage.py)")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--stdio", action="store_true", help="requetes sur l'entree standard")
+    parser.add_argument("--workers", type=int, default=4)
+    options = parser.parse_args(arguments)
+
+    if options.cliche:
+        from cliche import charger_cliche
+        service = charger_cliche(options.cliche)
+    else:
+        from services import TimesheetService
+        from stockage import StockageSQLite
+        service = TimesheetService(StockageSQLite(options.sqlite))
+    try:
+        asyncio.run(_servir(service, options))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
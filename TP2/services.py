@@ -1,140 +1,716 @@
 # services.py - Service principal de gestion des feuilles de temps
 
+import json
+import multiprocessing
+import os
+import threading
+from array import array
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+from itertools import islice, repeat
+
 from models import Employee, TimeEntry, Projet, TypeContrat, StatutEntree
+from registre import RegistreEntrees
+from totaux import TotauxCourants
+from stockage import StockageMemoire
+from colonnes import STATUTS, CODE_STATUT, annee_mois, periode
+from modifications import JournalModifications
+from taux import HistoriqueTaux
+from colonnaire import EPOQUE, ecrire_colonnaire, ecrire_arrow
+from compaction import ResumesMensuels, periode_limite, cle_mois
+from cache import CacheRapports
+from chronologie import IndexChronologique
+from concurrence import creer_verrous
+from instrumentation import creer_metriques, METRIQUES_INACTIVES
+from dates import FORMATS_DATE, parser_date, formater_date, bornes_mois
 
 class Config:
-    """Configuration centralisee de l'application"""
+    """Configuration centralisee de l'application.
+    instrumentation active les metriques des services, profilage y ajoute
+    le profileur echantillonne. concurrence permet de partager le service
+    entre threads (verrous d'ecriture par employe). plafonds_cumules fait
+    verifier par la validation les heures cumulees du jour et de la semaine."""
 
-    def __init__(self, format_date="FR", separateur_csv=";", devise="EUR"):
+    def __init__(self, format_date="FR", separateur_csv=";", devise="EUR",
+                 instrumentation=False, profilage=False, concurrence=False, plafonds_cumules=False):
         self.format_date = format_date
         self.separateur_csv = separateur_csv
         self.devise = devise
+        self.instrumentation = instrumentation
+        self.profilage = profilage
+        self.concurrence = concurrence
+        self.plafonds_cumules = plafonds_cumules
+
+# Service herite par les processus du pool de rapports (fork), jamais serialise
+_service_partage = None
+
+
+def _partager_service(service):
+    global _service_partage
+    _service_partage = service
+
+
+def _rapports_service_partage(employee_ids, mois, annee):
+    return _service_partage._rapports_lot(employee_ids, mois, annee)
+
 
 class TimesheetService:
     """Service de gestion des feuilles de temps.
     Gere les employes, projets, entrees de temps, rapports, export CSV,
     validation et notifications."""
 
-    def __init__(self):
+    FORFAIT_MENSUEL = {
+        TypeContrat.CDI: 151.67,
+        TypeContrat.CDD: 140,
+        TypeContrat.STAGE: 120,
+    }
+
+    def __init__(self, stockage=None, config=None):
+        self.stockage = stockage if stockage is not None else StockageMemoire()
         self.employees = []
         self.projets = []
-        self.entrees = []
+        self._adopter_registre(RegistreEntrees())
+        self.totaux = TotauxCourants()
+        self.cache = CacheRapports()
+        self.modifications = JournalModifications()
+        self.taux = HistoriqueTaux()
+        self.resumes = ResumesMensuels()
+        self._chronologies = {}     # ("employe"|"projet", id) ou ("tout", None) -> IndexChronologique
+        self._employes_par_id = {}
+        self._projets_par_id = {}
         self.notifications = []
-        self.log = []
-        self.config = Config()
-        self.validation_service = ValidationService(self.config)
-        self.export_service = ExportService(self.config)
+        self.log = self.stockage.journal
+        self.config = config if config is not None else Config()
+        self.metriques = creer_metriques(self.config)
+        self.verrous = creer_verrous(self.config)
+        self.validation_service = ValidationService(self.config, self.metriques, self.totaux, self.resumes)
+        self.export_service = ExportService(self.config, self.metriques)
+        self.stockage.charger(self)
 
     def ajouter_employe(self, employe):
         """Ajoute un employe au systeme"""
-        self.employees.append(employe)
-        self.log.append(f"Employe ajoute: {employe.nom} {employe.prenom}")
+        with self.verrous.ecriture(employe.id), self.verrous.commun():
+            anciennes_periodes = self.taux.periodes(employe.id)
+            self._indexer_employe(employe)
+            self.cache.invalider_employe(employe.id)
+            if not anciennes_periodes and (self.entrees.lignes_employe(employe.id)
+                                           or self.resumes.mois_employe(employe.id)):
+                # entrees saisies avant l'employe: couts enregistres au taux 0
+                self._revaloriser_employe(employe.id, anciennes_periodes)
+            self.stockage.enregistrer_employe(employe)
+            self._noter("employe", "insertion", employe.id)
+            self.log.append(f"Employe ajoute: {employe.nom} {employe.prenom}")
         return employe
 
     def ajouter_projet(self, id, nom, code, budget_heures):
         """Ajoute un projet au systeme"""
         projet = Projet(id, nom, code, budget_heures)
-        self.projets.append(projet)
-        self.log.append(f"Projet ajoute: {nom}")
+        with self.verrous.commun():
+            # decide sous le verrou: une saisie concurrente sur ce projet prend aussi commun()
+            deja_saisi = bool(self.entrees.lignes_projet(id)) or self.resumes.concerne_projet(id)
+            if not deja_saisi:
+                self._inscrire_projet(projet)
+        if deja_saisi:
+            # les sorties memorisees affichaient ce projet comme "Inconnu": tous les employes
+            # sont concernes (les verrous des employes se prennent avant la section commune)
+            with self.verrous.ecriture_tous():
+                with self.verrous.commun():
+                    self._inscrire_projet(projet)
+                    self.cache.vider()
         return projet
 
+    def _inscrire_projet(self, projet):
+        self._indexer_projet(projet)
+        self.stockage.enregistrer_projet(projet)
+        self._noter("projet", "insertion", projet.id)
+        self.log.append(f"Projet ajoute: {projet.nom}")
+
+    def _indexer_employe(self, employe):
+        self.employees.append(employe)
+        if self._employes_par_id.setdefault(employe.id, employe) is employe:
+            employe._changer_taux = self.changer_taux_horaire
+        self.taux.initialiser(employe.id, employe.taux_horaire)
+
+    def _indexer_projet(self, projet):
+        self.projets.append(projet)
+        self._projets_par_id.setdefault(projet.id, projet)
+
     def saisir_entree(self, employee_id, project_id, date, heures, description):
         """Saisit une entree de temps"""
-        entree = TimeEntry(employee_id, project_id, date, heures, description, StatutEntree.BROUILLON)
-        self.entrees.append(entree)
+        with self.metriques.chrono("saisir_entree"):
+            entree = TimeEntry(employee_id, project_id, date, heures, description, StatutEntree.BROUILLON)
+            return self._enregistrer(entree.employee_id, entree.project_id, entree.jour,
+                                     entree.heures, entree.description, entree.statut)
+
+    def saisir_entrees_batch(self, lot):
+        """Saisit un lot d'entrees de temps apres validation en une passe.
+        Le lot est un iterable de (employee_id, project_id, date, heures, description)
+        ou un dict de colonnes portant ces memes cles. Seules les lignes valides sont
+        inserees; renvoie {position dans le lot: [erreurs]} pour les lignes rejetees."""
+        if isinstance(lot, dict):
+            lot = zip(lot["employee_id"], lot["project_id"], lot["date"], lot["heures"], lot["description"])
+        with self.metriques.chrono("saisir_entrees_batch"):
+            valides, erreurs = self.validation_service.valider_lot(lot, self._employes_par_id, self._projets_par_id)
+            for employee_id, project_id, jour, heures, description in valides:
+                self._enregistrer(employee_id, project_id, jour, heures, description, StatutEntree.BROUILLON)
+            self.valider()
+        self.metriques.incrementer("saisir_entrees_batch.lignes", len(valides) + len(erreurs))
+        return erreurs
+
+    def _enregistrer(self, employee_id, project_id, jour, heures, description, statut):
+        """Ajoute une entree au registre, aux totaux courants et au stockage.
+        Renvoie la VueEntree de la ligne creee."""
+        with self.verrous.ecriture(employee_id):
+            self._verifier_mois_ouvert(jour)
+            ordinal = jour.toordinal()
+            taux = self.taux.taux_au(employee_id, ordinal)
+            with self.verrous.commun():
+                ligne = self.entrees.ajouter_valeurs(employee_id, project_id, jour, heures, statut, description)
+                self.totaux.cumuler_projet(project_id, jour.year, jour.month, heures, taux, statut)
+                self._indexer_chronologies(ligne, employee_id, project_id)
+                entree = self.entrees[ligne]
+                self.stockage.enregistrer_entree(entree)
+                self._noter("entree", "insertion", entree.id)
+            self.totaux.cumuler_employe(employee_id, project_id, jour.year, jour.month, heures, statut, ordinal)
+            self.cache.invalider(employee_id, jour.month, jour.year)
         return entree
 
+    def _charger_lignes(self, lignes, prochain_id=0):
+        """Recharge des lignes (id, employee_id, project_id, jour, periode, heures, statut,
+        description) triees par id depuis le stockage, directement dans la table columnaire.
+        prochain_id preserve les identifiants des dernieres entrees archivees."""
+        for id, employee_id, project_id, jour, periode, heures, code_statut, description in lignes:
+            self.entrees.charger_ligne(employee_id, project_id, jour, periode, heures, code_statut, description, id)
+            annee, mois = annee_mois(periode)
+            self.totaux.ajouter_valeurs(employee_id, project_id, annee, mois, heures,
+                                        self.taux.taux_au(employee_id, jour), STATUTS[code_statut], jour)
+        table = self.entrees.table
+        table.prochain_id = max(table.prochain_id, prochain_id)
+        self._chronologies.clear()
+
+    def _charger_resumes(self, mois_clos, resumes, semaines):
+        """Recharge depuis le stockage les mois clos (annee, mois, archive), leurs resumes
+        (employee_id, project_id, annee, mois, heures, cout, nombre) et les heures par
+        semaine de leurs entrees archivees (employee_id, semaine, heures), reportes dans
+        les totaux courants"""
+        for annee, mois, chemin in mois_clos:
+            self.resumes.clore(annee, mois, chemin)
+        for employee_id, project_id, annee, mois, heures, cout, nombre in resumes:
+            self.resumes.ajouter(employee_id, project_id, annee, mois, heures, cout, nombre)
+            self.totaux.ajouter_resume(employee_id, project_id, annee, mois, heures, cout)
+        self.totaux.heures_par_semaine.update(((employee_id, semaine), heures)
+                                              for employee_id, semaine, heures in semaines)
+
+    def valider(self):
+        """Applique les ecritures en attente dans le stockage"""
+        with self.verrous.commun():
+            self.stockage.valider()
+
+    def fermer(self):
+        self.metriques.arreter_profilage()
+        with self.verrous.commun():
+            self.stockage.fermer()
+
+    def instantane_metriques(self):
+        """Metriques des services et statistiques du cache, serialisables en JSON"""
+        instantane = self.metriques.instantane()
+        instantane["cache"] = self.cache.statistiques()
+        return instantane
+
+    def metriques_json(self, indent=2):
+        return json.dumps(self.instantane_metriques(), indent=indent, sort_keys=True)
+
+    def modifier_entree(self, entree, heures=None, description=None):
+        """Modifie les heures et/ou la description d'une entree deja saisie"""
+        employee_id, project_id, jour = entree.employee_id, entree.project_id, entree.jour
+        with self.verrous.ecriture(employee_id):
+            entree = self._entree_modifiable(entree)
+            ordinal = jour.toordinal()
+            taux = self.taux.taux_au(employee_id, ordinal)
+            ancien, statut = entree.heures, entree.statut
+            with self.verrous.commun():
+                if heures is not None:
+                    self.totaux.cumuler_projet(project_id, jour.year, jour.month, -ancien, taux, statut)
+                    entree.table.definir_heures(entree.ligne, heures)
+                    self.totaux.cumuler_projet(project_id, jour.year, jour.month, heures, taux, statut)
+                    self._oublier_chronologies(employee_id, project_id)
+                if description is not None:
+                    entree.table.definir_description(entree.ligne, description)
+                self.stockage.enregistrer_modification(entree)
+                self._noter("entree", "modification", entree.id)
+            if heures is not None:
+                self.totaux.cumuler_employe(employee_id, project_id, jour.year, jour.month, -ancien, statut, ordinal)
+                self.totaux.cumuler_employe(employee_id, project_id, jour.year, jour.month, heures, statut, ordinal)
+            self._invalider_cache(entree)
+        return entree
+
+    def changer_taux_horaire(self, employee_id, taux_horaire, date_effet=None):
+        """Change le taux horaire d'un employe a partir de date_effet (jusqu'a son
+        changement de taux suivant) et revalorise les couts deja saisis sur cette
+        periode. Sans date d'effet, le taux s'applique a toutes les entrees, y compris
+        celles des mois clos (relues depuis leur archive)."""
+        employe = self._trouver_employe(employee_id)
+        if employe is None:
+            raise ValueError("Employe inexistant")
+        depuis = parser_date(date_effet).toordinal() if date_effet is not None else None
+        with self.verrous.ecriture(employee_id):
+            with self.verrous.commun():
+                # l'historique est lu par les matrices de couts de toute l'entreprise
+                anciennes_periodes = self.taux.periodes(employee_id)
+                self.taux.definir(employee_id, taux_horaire, depuis)
+                self._revaloriser_employe(employee_id, anciennes_periodes)
+                employe._taux_horaire = self.taux.dernier(employee_id)
+                self.stockage.enregistrer_employe_modifie(employe)
+                self.stockage.enregistrer_taux_horaires(employee_id, self.taux.periodes(employee_id))
+                self._noter("employe", "taux_horaire", employee_id)
+            self.cache.invalider_employe(employee_id)
+        return employe
+
+    def _revaloriser_employe(self, employee_id, anciennes_periodes):
+        """Recalcule le cout des entrees de l'employe apres un changement de son
+        historique de taux (anciennes_periodes vide: aucun taux, cout nul)"""
+        anciens_taux = HistoriqueTaux()
+        if anciennes_periodes:
+            anciens_taux.remplacer(employee_id, anciennes_periodes)
+        table = self.entrees.table
+        lignes = self.entrees.lignes_employe(employee_id)
+        anciens = anciens_taux.couts(table, lignes)
+        nouveaux = self.taux.couts(table, lignes)
+        for ligne, ancien, nouveau in zip(lignes, anciens, nouveaux):
+            if ancien != nouveau:
+                annee, mois = annee_mois(table.periode[ligne])
+                self.totaux.revaloriser(table.project_id[ligne], annee, mois, ancien, nouveau)
+        self._revaloriser_mois_clos(employee_id, anciens_taux)
+        self._chronologies.clear()
+
+    def _revaloriser_mois_clos(self, employee_id, anciens_taux):
+        """Recalcule le cout des entrees archivees de l'employe apres un changement de
+        taux: totaux courants et resumes des mois clos dont le taux a change"""
+        for annee, mois in self.resumes.mois_employe(employee_id):
+            debut, fin = bornes_mois(mois, annee)
+            taux = self.taux.taux_constant(employee_id, debut, fin)
+            if taux is not None and taux == anciens_taux.taux_constant(employee_id, debut, fin):
+                continue
+            registre = self._lire_archive(annee, mois)
+            table = registre.table
+            lignes = registre.lignes_employe(employee_id)
+            couts = {}
+            for ligne, ancien, nouveau in zip(lignes, anciens_taux.couts(table, lignes), self.taux.couts(table, lignes)):
+                projet_id = table.project_id[ligne]
+                if ancien != nouveau:
+                    self.totaux.revaloriser(projet_id, annee, mois, ancien, nouveau)
+                couts[projet_id] = couts.get(projet_id, 0) + nouveau
+            resumes = self.resumes.employe_mois(employee_id, annee, mois)
+            for projet_id, cout in couts.items():
+                resumes[projet_id][1] = cout
+                self.stockage.enregistrer_cout_resume(employee_id, projet_id, annee, mois, cout)
+
+    def _noter(self, objet, operation, identifiant, valeur=-1):
+        """Ajoute une modification au journal et au stockage (sous la section commune)"""
+        sequence = self.modifications.ajouter(objet, operation, identifiant, valeur)
+        self.stockage.enregistrer_changement(sequence, objet, operation, identifiant, valeur)
+
+    def point_de_reprise(self):
+        """Sequence de la derniere modification, a conserver pour le prochain export delta"""
+        return self.modifications.derniere
+
+    def modifications_depuis(self, point=0, fusionner=False):
+        """Modifications posterieures au point de reprise, une par dict, avec l'etat
+        courant de l'objet concerne (sauf le statut d'une transition: celui qu'elle a
+        fixe). Avec fusionner, une seule ligne par objet: sa derniere modification.
+        Leve PointDeRepriseExpire si le journal a ete tronque apres ce point."""
+        with self.verrous.commun():
+            changements = self.modifications.depuis(point)
+            if fusionner:
+                derniers = {}
+                for changement in changements:
+                    derniers[changement[1], changement[3]] = changement
+                changements = sorted(derniers.values())
+            return [self._decrire_changement(*changement) for changement in changements]
+
+    def exporter_modifications(self, fichier, depuis=0, format="csv", fusionner=False, taille_tampon=64 * 1024):
+        """Ecrit dans un objet fichier les modifications posterieures au point de reprise
+        depuis, en CSV ou en JSON lines ("jsonl"). Renvoie le nouveau point de reprise."""
+        with self.metriques.chrono("exporter_modifications"):
+            with self.verrous.commun():
+                point = self.modifications.derniere
+                changements = self.modifications_depuis(depuis, fusionner)
+            lignes = self.export_service.lignes_modifications(changements, format)
+            self.export_service.ecrire_csv(fichier, lignes, taille_tampon)
+        return point
+
+    def tronquer_modifications(self, jusqu_a):
+        """Oublie les modifications deja exportees par tous les consommateurs"""
+        with self.verrous.commun():
+            self.modifications.tronquer(jusqu_a)
+            self.stockage.oublier_changements(jusqu_a)
+
+    def _decrire_changement(self, sequence, objet, operation, identifiant, valeur):
+        changement = {"sequence": sequence, "objet": objet, "operation": operation, "id": identifiant}
+        if objet == "entree":
+            entree = self.entrees.par_id(identifiant)
+            if entree is None:                      # entree archivee par la compaction
+                return changement
+            jour = entree.jour
+            statut = STATUTS[valeur] if valeur >= 0 else entree.statut
+            changement.update(employee_id=entree.employee_id, project_id=entree.project_id,
+                              date=self.formater_date(jour), heures=entree.heures, statut=statut.value,
+                              description=entree.description,
+                              cout=round(entree.heures * self.taux.taux_au(entree.employee_id, jour.toordinal()), 2))
+        elif objet == "employe":
+            emp = self._trouver_employe(identifiant)
+            changement.update(nom=emp.nom, prenom=emp.prenom, type_contrat=emp.type_contrat.value,
+                              taux_horaire=emp.taux_horaire)
+        else:
+            projet = self._trouver_projet(identifiant)
+            changement.update(nom=projet.nom, code=projet.code, budget_heures=projet.budget_heures)
+        return changement
+
+    def _chronologie(self, type_cle, id=None):
+        """Index trie par date des lignes d'un employe, d'un projet ou de toute la
+        table ("tout"), construit a la premiere requete puis tenu a jour"""
+        cle = (type_cle, id)
+        index = self._chronologies.get(cle)
+        if index is None:
+            # construit sous la section commune: une saisie concurrente ne peut pas
+            # s'intercaler entre la lecture de la table et l'enregistrement de l'index
+            with self.verrous.commun():
+                index = self._chronologies.get(cle)
+                if index is None:
+                    index = self._chronologies[cle] = self._indexer_chronologie(self.entrees, type_cle, id)
+        return index
+
+    def _indexer_chronologie(self, registre, type_cle, id):
+        if type_cle == "employe":
+            lignes = registre.lignes_employe(id)
+        elif type_cle == "projet":
+            lignes = registre.lignes_projet(id)
+        else:
+            lignes = range(len(registre))
+        return IndexChronologique(registre.table, lignes, self.taux)
+
+    def _chronologie_archivee(self, type_cle, id, annee, mois):
+        """Index chronologique des entrees d'un mois clos, relues depuis son archive"""
+        return self._indexer_chronologie(self._lire_archive(annee, mois), type_cle, id)
+
+    def _totaux_periode(self, type_cle, id, debut, fin):
+        """(heures, cout) entre deux dates incluses: lignes de la table, plus les resumes
+        des mois clos couverts en entier; un mois clos coupe par l'intervalle est relu
+        depuis son archive"""
+        heures, cout = self._chronologie(type_cle, id).totaux(debut, fin)
+        for annee, mois in self.resumes.mois_entre(debut, fin):
+            if self._mois_couvert(annee, mois, debut, fin):
+                heures_mois, cout_mois, _ = self.resumes.totaux(type_cle, id, annee, mois)
+            else:
+                heures_mois, cout_mois = self._chronologie_archivee(type_cle, id, annee, mois).totaux(debut, fin)
+            heures += heures_mois
+            cout += cout_mois
+        return heures, cout
+
+    @staticmethod
+    def _mois_couvert(annee, mois, debut, fin):
+        premier, dernier = bornes_mois(mois, annee)
+        return (debut is None or debut.toordinal() <= premier) and (fin is None or dernier <= fin.toordinal())
+
+    def _indexer_chronologies(self, ligne, employee_id, project_id):
+        """Ajoute une nouvelle ligne aux index chronologiques existants; un index
+        dont l'ordre serait casse (saisie anterieure a sa derniere date) est oublie"""
+        for cle in (("employe", employee_id), ("projet", project_id), ("tout", None)):
+            index = self._chronologies.get(cle)
+            if index is not None and not index.ajouter(ligne):
+                del self._chronologies[cle]
+
+    def _oublier_chronologies(self, employee_id, project_id):
+        for cle in (("employe", employee_id), ("projet", project_id), ("tout", None)):
+            self._chronologies.pop(cle, None)
+
+    def _verifier_mois_ouvert(self, jour):
+        """Refuse toute ecriture sur un mois clos par la compaction (entrees archivees
+        relues par une selection ou un export comprises)"""
+        if self.resumes.est_clos(jour.year, jour.month):
+            raise ValueError(f"Mois clos: {jour.month:02d}/{jour.year}")
+
+    def _entree_courante(self, entree):
+        """Vue de entree sur la table courante: une vue obtenue avant une compaction est
+        retrouvee par son identifiant stable (None si l'entree a ete archivee)"""
+        if entree.table is self.entrees.table:
+            return entree
+        return self.entrees.par_id(entree.id)
+
+    def _entree_modifiable(self, entree):
+        """Vue courante de entree, a modifier sous le verrou de son employe; leve
+        ValueError si son mois est clos"""
+        self._verifier_mois_ouvert(entree.jour)
+        courante = self._entree_courante(entree)
+        if courante is None:
+            raise ValueError("Entree inexistante")
+        return courante
+
+    def _adopter_registre(self, registre):
+        """Fait de registre le registre courant: les affectations sur ses vues
+        passent desormais par le service"""
+        registre.table.proprietaire = self
+        self.entrees = registre
+
+    def _lire_archive(self, annee, mois):
+        """Registre d'un mois clos dont les vues refusent l'ecriture (Mois clos)"""
+        registre = self.resumes.lire_archive(annee, mois)
+        registre.table.proprietaire = self
+        return registre
+
+    def _invalider_cache(self, entree):
+        jour = entree.jour
+        self.cache.invalider(entree.employee_id, jour.month, jour.year)
+
     def generer_rapport_mensuel(self, employee_id, mois, annee):
-        """Genere un rapport mensuel pour un employe"""
+        """Genere un rapport mensuel pour un employe (memorise jusqu'a la prochaine
+        ecriture sur ce mois)"""
+        with self.metriques.chrono("generer_rapport_mensuel"):
+            return self._lire_memorise("rapport", employee_id, mois, annee, self._generer_rapport_mensuel)
+
+    def _lire_memorise(self, type_sortie, employee_id, mois, annee, generer):
+        """Sortie memorisee d'un employe pour un mois. Elle est calculee sans verrou sur
+        un etat coherent de l'employe, et n'est memorisee que si aucune ecriture de
+        l'employe n'a eu lieu depuis ce calcul."""
+        version = None
+
+        def calculer():
+            nonlocal version
+            valeur, version = self.verrous.lire(employee_id, lambda: generer(employee_id, mois, annee))
+            return valeur
+
+        return self.cache.obtenir(type_sortie, employee_id, mois, annee, self.config, calculer,
+                                  lambda: self.verrous.version(employee_id) == version)
+
+    def _generer_rapport_mensuel(self, employee_id, mois, annee):
+        self.metriques.incrementer("recherches.employe")
         employe = self._trouver_employe(employee_id)
         if employe is None:
             return "Employe non trouve"
 
-        entrees_mois = self._filtrer_entrees_mois(employee_id, mois, annee)
-        heures_par_projet = self._calculer_heures_par_projet(entrees_mois)
+        heures_par_projet = self.totaux.heures_employe_par_projet(employee_id, mois, annee)
+        self.metriques.incrementer("recherches.projet", len(heures_par_projet))
         total_heures = sum(heures_par_projet.values())
-        cout_total = total_heures * employe.taux_horaire
+        debut, fin = bornes_mois(mois, annee)
+        taux = self.taux.taux_constant(employee_id, debut, fin)
+        if taux is not None:
+            couts = {projet_id: heures * taux for projet_id, heures in heures_par_projet.items()}
+            cout_total = total_heures * taux
+        elif self.resumes.est_clos(annee, mois):
+            couts = {projet_id: resume[1] for projet_id, resume in
+                     self.resumes.employe_mois(employee_id, annee, mois).items()}
+            cout_total = sum(couts.values())
+        else:
+            couts = self._couts_par_projet(self.entrees.lignes_employe_mois(employee_id, mois, annee))
+            cout_total = sum(couts.values())
 
-        rapport = self.construire_rapport(employe, mois, annee)
+        parties = [self.construire_rapport(employe, mois, annee, self.taux.taux_au(employee_id, fin))]
 
         for projet_id, heures in heures_par_projet.items():
             projet = self._trouver_projet(projet_id)
             projet_nom = projet.nom if projet else "Inconnu"
-            cout = heures * employe.taux_horaire
-            rapport += f"  {projet_nom}: {heures:.1f}h - {cout:.2f} EUR\n"
+            cout = couts.get(projet_id, 0)
+            parties.append(f"  {projet_nom}: {heures:.1f}h - {cout:.2f} EUR\n")
+
+        parties.append("-" * 40 + "\n")
+        parties.append(f"Total: {total_heures:.1f}h - {cout_total:.2f} EUR\n")
+        parties.append(self._verifier_depassement(employe, total_heures))
+
+        return "".join(parties)
+
+    def _couts_par_projet(self, lignes):
+        """Couts des lignes groupes par projet, au taux en vigueur a la date de chacune"""
+        table = self.entrees.table
+        couts = {}
+        for ligne, cout in zip(lignes, self.taux.couts(table, lignes)):
+            projet_id = table.project_id[ligne]
+            couts[projet_id] = couts.get(projet_id, 0) + cout
+        return couts
+
+    def generer_rapports_mensuels(self, employee_ids, mois, annee, workers=None, taille_lot=256):
+        """Genere les rapports mensuels de plusieurs employes et les renvoie au fil de l'eau,
+        dans l'ordre de employee_ids. Avec workers > 1, les employes sont repartis par lots
+        sur un pool de processus crees par fork: ils heritent des donnees du service en
+        lecture seule, sans serialisation. Sans fork, ou si le processus a deja d'autres
+        threads (verrous partages, notifications asynchrones, serveur...) qu'un fork
+        copierait dans un etat incoherent, un pool de threads est utilise."""
+        employee_ids = list(employee_ids)
+        if not workers or workers <= 1:
+            for employee_id in employee_ids:
+                yield self.generer_rapport_mensuel(employee_id, mois, annee)
+            return
+
+        lots = [employee_ids[i:i + taille_lot] for i in range(0, len(employee_ids), taille_lot)]
+        if self._fork_sur():
+            pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"),
+                                       initializer=_partager_service, initargs=(self,))
+            tache = _rapports_service_partage
+        else:
+            pool = ThreadPoolExecutor(workers)
+            tache = self._rapports_lot
+        with pool:
+            for rapports in pool.map(tache, lots, repeat(mois), repeat(annee)):
+                yield from rapports
 
-        rapport += "-" * 40 + "\n"
-        rapport += f"Total: {total_heures:.1f}h - {cout_total:.2f} EUR\n"
-        rapport += self._verifier_depassement(employe, total_heures)
+    def _fork_sur(self):
+        """Vrai si le processus peut etre duplique par fork sans heriter de verrous
+        tenus par un autre thread"""
+        return ("fork" in multiprocessing.get_all_start_methods() and not self.config.concurrence
+                and threading.active_count() == 1)
 
-        return rapport
+    def _rapports_lot(self, employee_ids, mois, annee):
+        return [self.generer_rapport_mensuel(employee_id, mois, annee) for employee_id in employee_ids]
 
-    def construire_rapport(self, employe, mois, annee):
-        """Construit un rapport mensuel pour un employe"""
-        rapport = f"=== Rapport mensuel {mois:02d}/{annee} ===\n"
-        rapport += f"Employe: {employe.nom} {employe.prenom}\n"
-        rapport += f"Contrat: {employe.type_contrat.value}\n"
-        rapport += f"Taux horaire: {employe.taux_horaire:.2f} EUR\n"
-        rapport += "-" * 40 + "\n"
-        return rapport
+    def construire_rapport(self, employe, mois, annee, taux_horaire=None):
+        """Construit un rapport mensuel pour un employe (taux en vigueur en fin de mois)"""
+        if taux_horaire is None:
+            taux_horaire = employe.taux_horaire
+        return (
+            f"=== Rapport mensuel {mois:02d}/{annee} ===\n"
+            f"Employe: {employe.nom} {employe.prenom}\n"
+            f"Contrat: {employe.type_contrat.value}\n"
+            f"Taux horaire: {taux_horaire:.2f} EUR\n"
+            + "-" * 40 + "\n"
+        )
 
     def _filtrer_entrees_mois(self, employee_id, mois, annee):
-        """Filtre les entrees de temps pour un employe sur un mois donne"""
-        entrees_mois = []
-        for entree in self.entrees:
-            parties = entree.date.split("/")
-            entry_mois = int(parties[1])
-            entry_annee = int(parties[2])
-            if entree.employee_id == employee_id and entry_mois == mois and entry_annee == annee:
-                entrees_mois.append(entree)
-        return entrees_mois
-
-    def _calculer_heures_par_projet(self, entrees):
-        """Calcule les heures regroupees par projet"""
-        heures_par_projet = {}
-        for entree in entrees:
-            if entree.project_id not in heures_par_projet:
-                heures_par_projet[entree.project_id] = 0
-            heures_par_projet[entree.project_id] += entree.heures
-        return heures_par_projet
+        """Filtre les entrees de temps pour un employe sur un mois donne
+        (relues depuis l'archive pour un mois clos)"""
+        if self.resumes.est_clos(annee, mois):
+            return self._lire_archive(annee, mois).par_employe_mois(employee_id, mois, annee)
+        return self.entrees.par_employe_mois(employee_id, mois, annee)
 
     def _verifier_depassement(self, employe, total_heures):
         """Verifie si les heures depassent le forfait mensuel"""
-        seuils = {
-            TypeContrat.CDI: 151.67,
-            TypeContrat.CDD: 140,
-            TypeContrat.STAGE: 120,
-        }
-        seuil = seuils.get(employe.type_contrat)
+        seuil = self.FORFAIT_MENSUEL.get(employe.type_contrat)
         if seuil and total_heures > seuil:
             return "ATTENTION: Depassement du forfait mensuel!\n"
         return ""
 
+    def depasse_forfait(self, employee_id, mois, annee):
+        """Indique si l'employe depasse son forfait mensuel (lecture en temps constant)"""
+        employe = self._trouver_employe(employee_id)
+        if employe is None:
+            return False
+        return self._verifier_depassement(employe, self.totaux.heures_employe(employee_id, mois, annee)) != ""
+
+    def depasse_budget(self, project_id):
+        """Indique si les heures non rejetees du projet depassent son budget_heures"""
+        projet = self._trouver_projet(project_id)
+        if projet is None:
+            return False
+        return self.totaux.heures_consommees_projet(project_id) > projet.budget_heures
+
     def calculer_heures_employe(self, employee_id, mois, annee):
         """Calcule le total des heures pour un employe sur un mois"""
-        entrees = self._filtrer_entrees_mois(employee_id, mois, annee)
-        return sum(e.heures for e in entrees)
+        return self.totaux.heures_employe(employee_id, mois, annee)
 
     def calculer_cout_projet(self, project_id, mois, annee):
         """Calcule le cout d'un projet sur un mois"""
-        total_cout = 0
-        entrees = self._filtrer_entrees_par_projet(project_id, mois, annee)
-        for entree in entrees:
-            emp = self._trouver_employe(entree.employee_id)
-            if emp:
-                total_cout += entree.heures * emp.taux_horaire
-        return total_cout
+        self.metriques.incrementer("calculer_cout_projet")
+        return self.totaux.cout_projet(project_id, mois, annee)
+
+    def heures_employe_periode(self, employee_id, debut, fin):
+        """Total des heures d'un employe entre deux dates incluses"""
+        debut, fin = parser_date(debut), parser_date(fin)
+        return self.verrous.lire_commun(lambda: self._totaux_periode("employe", employee_id, debut, fin))[0]
+
+    def cout_projet_periode(self, project_id, debut, fin):
+        """Cout d'un projet entre deux dates incluses"""
+        debut, fin = parser_date(debut), parser_date(fin)
+        return self.verrous.lire_commun(lambda: self._totaux_periode("projet", project_id, debut, fin))[1]
+
+    def cumuls_employe(self, employee_id, debut=None, fin=None, granularite="mois"):
+        """Heures et couts d'un employe par periode (semaine, mois, trimestre, annee):
+        {cle de periode: (heures, cout)}, periodes vides omises"""
+        return self._cumuls("employe", employee_id, debut, fin, granularite)
+
+    def cumuls_projet(self, project_id, debut=None, fin=None, granularite="mois"):
+        """Heures et couts d'un projet par periode, par exemple sa courbe de couts annuelle"""
+        return self._cumuls("projet", project_id, debut, fin, granularite)
+
+    def cumuls_entreprise(self, debut=None, fin=None, granularite="mois"):
+        """Heures et couts de toute l'entreprise par periode"""
+        return self._cumuls("tout", None, debut, fin, granularite)
+
+    def _cumuls(self, type_cle, id, debut, fin, granularite):
+        """Cumuls des lignes de la table, completes par les mois clos: un mois couvert en
+        entier est lu dans les resumes, sauf pour les semaines (a cheval sur deux mois)
+        ou un mois coupe par l'intervalle, relus depuis l'archive"""
+        debut = parser_date(debut) if debut is not None else None
+        fin = parser_date(fin) if fin is not None else None
+        def calculer():
+            cumuls = self._chronologie(type_cle, id).cumuls(debut, fin, granularite)
+            mois_clos = self.resumes.mois_entre(debut, fin)
+            if not mois_clos:
+                return cumuls
+            for annee, mois in mois_clos:
+                if granularite != "semaine" and self._mois_couvert(annee, mois, debut, fin):
+                    heures, cout, nombre = self.resumes.totaux(type_cle, id, annee, mois)
+                    partiels = {cle_mois(annee, mois, granularite): (heures, cout)} if nombre else {}
+                else:
+                    partiels = self._chronologie_archivee(type_cle, id, annee, mois).cumuls(debut, fin, granularite)
+                for cle, (heures, cout) in partiels.items():
+                    cumul = cumuls.get(cle)
+                    cumuls[cle] = (cumul[0] + heures, cumul[1] + cout) if cumul is not None else (heures, cout)
+            return dict(sorted(cumuls.items()))
+        with self.metriques.chrono("cumuls"):
+            return self.verrous.lire_commun(calculer)
+
+    def matrice_heures(self, mois=None, annee=None):
+        """Heures par (employe, projet, annee, mois) pour toute l'entreprise, en une passe.
+        Si mois et annee sont donnes, seul ce mois est agrege. Les mois clos sont lus
+        dans leurs resumes."""
+        def calculer():
+            matrice = self.entrees.table.matrice_heures(self._lignes_periode(mois, annee))
+            matrice.update((cle, resume[0]) for cle, resume in self.resumes.cellules(annee, mois))
+            return matrice
+        return self.verrous.lire_commun(calculer)
+
+    def matrice_couts(self, mois=None, annee=None):
+        """Couts par (employe, projet, annee, mois), chaque entree etant valorisee au taux
+        en vigueur a sa date (jointure par fusion avec les periodes de taux). Les mois
+        clos sont lus dans leurs resumes."""
+        def calculer():
+            table = self.entrees.table
+            lignes = self._lignes_periode(mois, annee)
+            taux = self.taux.taux_uniques()
+            resumes = self.resumes.cellules(annee, mois)
+            if taux is not None:        # aucun changement de taux: un produit par cellule suffit
+                matrice = table.matrice_heures(lignes)
+                matrice.update((cle, resume[0]) for cle, resume in resumes)
+                return {cle: heures * taux[cle[0]] for cle, heures in matrice.items()
+                        if cle[0] in self._employes_par_id}
+            couts = self.taux.couts(table, lignes if lignes is not None else range(len(table)))
+            matrice = table.matrice_couts(couts, lignes)
+            matrice.update((cle, resume[1]) for cle, resume in resumes)
+            return {cle: cout for cle, cout in matrice.items() if cle[0] in self._employes_par_id}
+        return self.verrous.lire_commun(calculer)
+
+    def _lignes_periode(self, mois, annee):
+        if mois is None or annee is None:
+            return None
+        return self.entrees.lignes_mois(mois, annee)
+
+    def changer_statut(self, entree, statut):
+        """Change le statut d'une entree de temps"""
+        with self.verrous.ecriture(entree.employee_id):
+            entree = self._entree_modifiable(entree)
+            ancien = entree.statut
+            with self.verrous.commun():
+                entree.table.definir_statut(entree.ligne, statut)
+                self.totaux.changer_statut_projet(entree, ancien, statut)
+                self.stockage.enregistrer_statut(entree)
+                self._noter("entree", "statut", entree.id, CODE_STATUT[statut])
+            self.totaux.changer_statut_employe(entree, ancien, statut)
+            self._invalider_cache(entree)
 
     def _filtrer_entrees_par_projet(self, project_id, mois, annee):
-        """Filtre les entrees de temps pour un projet sur un mois donne"""
-        entrees_mois = []    
-        for entree in self.entrees:
-            parties = entree.date.split("/")
-            entry_mois = int(parties[1])
-            entry_annee = int(parties[2])
-            if entree.project_id == project_id and entry_mois == mois and entry_annee == annee:
-                entrees_mois.append(entree)
-        return entrees_mois
+        """Filtre les entrees de temps pour un projet sur un mois donne
+        (relues depuis l'archive pour un mois clos)"""
+        if self.resumes.est_clos(annee, mois):
+            return self._lire_archive(annee, mois).par_projet_mois(project_id, mois, annee)
+        return self.entrees.par_projet_mois(project_id, mois, annee)
 
     def valider_entree(self, employee_id, project_id, date, heures, description):
         """Valide une entree de temps avant saisie (delegue a ValidationService)"""
@@ -149,114 +725,487 @@ class TimesheetService:
         return self.validation_service.formater_date(date_str)
 
     def exporter_csv(self, employee_id, mois, annee):
-        """Exporte les entrees de temps au format CSV (delegue a ExportService)"""
+        """Exporte les entrees de temps au format CSV (delegue a ExportService, memorise)"""
+        with self.metriques.chrono("exporter_csv"):
+            return self._lire_memorise("csv", employee_id, mois, annee, self._exporter_csv)
+
+    def _exporter_csv(self, employee_id, mois, annee):
         entrees = self._filtrer_entrees_mois(employee_id, mois, annee)
-        emp = self._trouver_employe(employee_id)
+        self.metriques.incrementer("entrees_parcourues.exporter_csv", len(entrees))
         return self.export_service.exporter_csv(
-            entrees, emp, self._trouver_projet, self.formater_date
+            entrees, self._trouver_employe(employee_id), self._trouver_projet, self.formater_date, self.taux.taux_au
         )
 
+    def exporter_csv_flux(self, fichier, employee_ids=None, project_ids=None, debut=None, fin=None,
+                          taille_tampon=64 * 1024):
+        """Exporte en continu les entrees filtrees vers un objet fichier.
+        Filtres optionnels: ensembles d'employes et de projets, dates debut/fin incluses.
+        Renvoie le nombre de lignes ecrites, en-tete compris."""
+        with self.metriques.chrono("exporter_csv_flux"):
+            entrees = self._selectionner_entrees(employee_ids, project_ids, debut, fin, None)
+            lignes = self.export_service.lignes_csv(
+                entrees, self._trouver_employe, self._trouver_projet, self.formater_date, self.taux.taux_au
+            )
+            return self.export_service.ecrire_csv(fichier, lignes, taille_tampon)
+
+    def selectionner_entrees(self, employee_ids=None, project_ids=None, debut=None, fin=None, statuts=None):
+        """Renvoie les entrees correspondant aux filtres (ensembles d'employes, de projets,
+        de statuts, dates debut/fin incluses), dans l'ordre de saisie"""
+        with self.metriques.chrono("selectionner_entrees"):
+            return list(self._selectionner_entrees(employee_ids, project_ids, debut, fin, statuts))
+
+    def exporter_colonnes(self, chemin, employee_ids=None, project_ids=None, debut=None, fin=None,
+                          format="tscol", taille_groupe=64 * 1024):
+        """Exporte les entrees filtrees et leur cout (au taux en vigueur a leur date) dans un
+        fichier binaire columnaire type (delegue a ExportService). Renvoie le nombre de
+        lignes exportees."""
+        with self.metriques.chrono("exporter_colonnes"):
+            sources = self._sources_selection(employee_ids, project_ids, debut, fin, None)
+            return self.export_service.exporter_colonnes(
+                chemin, sources, self._employes_par_id.values(), self._projets_par_id.values(), self.taux.couts,
+                format, taille_groupe
+            )
+
+    def compacter(self, dossier_archive, avant=None, taille_groupe=64 * 1024):
+        """Clot les mois anterieurs au mois de la date avant (le mois courant par defaut)
+        dont toutes les entrees sont approuvees. Leurs entrees sont archivees dans
+        dossier_archive (un fichier columnaire AAAA-MM.tscol par mois), resumees par
+        (employe, projet, mois) puis retirees de la table, qui est renumerotee: les
+        VueEntree obtenues avant la compaction lisent l'ancienne table, mais les entrees
+        gardent leur identifiant stable (entree.id), par lequel modifier_entree et
+        changer_statut les retrouvent, et le journal des modifications n'est pas reecrit.
+        Les rapports, couts, matrices et cumuls des mois clos sont ensuite servis par les
+        resumes et les totaux courants, ou relus dans l'archive (export CSV d'un mois,
+        intervalle qui coupe un mois clos). Plus aucune entree ne peut y etre saisie.
+        Renvoie les (annee, mois) clos, dans l'ordre."""
+        limite = periode_limite(parser_date(avant) if avant is not None else None)
+        approuve = CODE_STATUT[StatutEntree.APPROUVE]
+        with self.metriques.chrono("compacter"), self.verrous.ecriture_tous(), self.verrous.commun():
+            table = self.entrees.table
+            clos = sorted((annee, mois) for annee, mois in self.entrees.mois()
+                          if periode(annee, mois) < limite and not self.resumes.est_clos(annee, mois)
+                          and all(table.statut[ligne] == approuve for ligne in self.entrees.lignes_mois(mois, annee)))
+            if not clos:
+                return []
+
+            os.makedirs(dossier_archive, exist_ok=True)
+            archives, resumes = [], []
+            for annee, mois in clos:
+                lignes = self.entrees.lignes_mois(mois, annee)
+                chemin = os.path.join(dossier_archive, f"{annee:04d}-{mois:02d}.tscol")
+                self.export_service.ecrire_colonnes(chemin, [(self.entrees, lignes)], ecrire_colonnaire,
+                                                    self._employes_par_id.values(), self._projets_par_id.values(),
+                                                    self.taux.couts, taille_groupe)
+                archives.append((annee, mois, chemin))
+                cellules = {}   # (employee_id, project_id) -> [heures, cout, nombre], sommes dans l'ordre des lignes
+                for ligne, cout in zip(lignes, self.taux.couts(table, lignes)):
+                    cellule = cellules.setdefault((table.employee_id[ligne], table.project_id[ligne]), [0, 0, 0])
+                    cellule[0] += table.heures[ligne]
+                    cellule[1] += cout
+                    cellule[2] += 1
+                resumes += [(employee_id, project_id, annee, mois, *cellule)
+                            for (employee_id, project_id), cellule in cellules.items()]
+
+            # toutes les archives sont ecrites: l'etat du service peut changer
+            for annee, mois, chemin in archives:
+                self.resumes.clore(annee, mois, chemin)
+            for resume in resumes:
+                self.resumes.ajouter(*resume)
+            periodes_closes = {periode(annee, mois) for annee, mois in clos}
+            registre = RegistreEntrees()
+            registre.table.prochain_id = table.prochain_id
+            semaines = {}       # (employee_id, semaine) -> heures des entrees archivees
+            for ligne in range(len(table)):
+                employee_id, jour = table.employee_id[ligne], table.jour[ligne]
+                if table.periode[ligne] in periodes_closes:
+                    self.totaux.oublier_jour(employee_id, jour)
+                    cle = (employee_id, (jour - 1) // 7)
+                    semaines[cle] = semaines.get(cle, 0) + table.heures[ligne]
+                else:
+                    registre.charger_ligne(
+                        employee_id, table.project_id[ligne], jour, table.periode[ligne], table.heures[ligne],
+                        table.statut[ligne], table.description[ligne], table.id[ligne])
+            archivees = len(table) - len(registre)
+            self._adopter_registre(registre)
+            self._chronologies.clear()
+            self.cache.vider()
+            self.stockage.enregistrer_compaction(sorted(periodes_closes), registre.table.prochain_id, resumes, archives,
+                                                 [(*cle, heures) for cle, heures in semaines.items()])
+            self.log.append(f"Compaction: {archivees} entrees archivees ({len(clos)} mois clos)")
+        self.metriques.incrementer("compaction.entrees_archivees", archivees)
+        return clos
+
+    def _selectionner_entrees(self, employee_ids, project_ids, debut, fin, statuts):
+        """Parcourt les entrees filtrees: celles des mois clos d'abord, mois par mois, puis
+        les autres, chaque groupe dans l'ordre de saisie"""
+        for registre, lignes in self._sources_selection(employee_ids, project_ids, debut, fin, statuts):
+            for ligne in lignes:
+                yield registre[ligne]
+
+    def _sources_selection(self, employee_ids, project_ids, debut, fin, statuts):
+        """(registre, numeros de ligne filtres) de chaque source d'une selection: les mois
+        clos qui chevauchent [debut, fin] et ont des entrees des employes et projets
+        demandes, relus un par un depuis leur archive, puis la table"""
+        with self.verrous.commun():
+            mois_clos = [(annee, mois) for annee, mois in self.resumes.mois_entre(
+                             parser_date(debut) if debut is not None else None,
+                             parser_date(fin) if fin is not None else None)
+                         if self.resumes.concerne(annee, mois, employee_ids, project_ids)]
+        for annee, mois in mois_clos:
+            registre = self._lire_archive(annee, mois)
+            yield registre, self._selectionner_lignes(employee_ids, project_ids, debut, fin, statuts, registre)
+        yield self.entrees, self._selectionner_lignes(employee_ids, project_ids, debut, fin, statuts)
+
+    def _selectionner_lignes(self, employee_ids, project_ids, debut, fin, statuts, registre=None):
+        """Numeros de ligne des entrees filtrees du registre (les entrees courantes par
+        defaut), dans l'ordre de saisie"""
+        archive = registre is not None
+        registre = registre if archive else self.entrees
+        if employee_ids is not None:
+            lignes = sorted(ligne for emp_id in set(employee_ids) for ligne in registre.lignes_employe(emp_id))
+        elif project_ids is not None:
+            lignes = sorted(ligne for proj_id in set(project_ids) for ligne in registre.lignes_projet(proj_id))
+        elif (debut is not None or fin is not None) and not archive:
+            bornes = (parser_date(debut) if debut is not None else None,
+                      parser_date(fin) if fin is not None else None)
+            lignes = self.verrous.lire_commun(lambda: sorted(self._chronologie("tout").lignes_entre(*bornes)))
+        else:
+            lignes = range(len(registre))
+
+        table = registre.table
+        projets = set(project_ids) if project_ids is not None else None
+        jour_min = parser_date(debut).toordinal() if debut is not None else None
+        jour_max = parser_date(fin).toordinal() if fin is not None else None
+        codes = {CODE_STATUT[statut] for statut in statuts} if statuts is not None else None
+        self.metriques.incrementer("entrees_parcourues.selection", len(lignes))
+        for ligne in lignes:
+            if projets is not None and table.project_id[ligne] not in projets:
+                continue
+            if codes is not None and table.statut[ligne] not in codes:
+                continue
+            if jour_min is not None and table.jour[ligne] < jour_min:
+                continue
+            if jour_max is not None and table.jour[ligne] > jour_max:
+                continue
+            yield ligne
+
     def _trouver_employe(self, employee_id):
-        for emp in self.employees:
-            if emp.id == employee_id:
-                return emp
-        return None
+        return self._employes_par_id.get(employee_id)
 
     def _trouver_projet(self, project_id):
-        for p in self.projets:
-            if p.id == project_id:
-                return p
-        return None
+        return self._projets_par_id.get(project_id)
+
+class ErreurValidation(str):
+    """Message d'erreur de validation portant sa raison: une cle stable
+    (depassement, date_invalide, mois_clos...) pour les compteurs d'echecs.
+    Le message se compare et s'affiche comme le texte qu'il porte."""
+
+    def __new__(cls, texte, raison="autre"):
+        erreur = super().__new__(cls, texte)
+        erreur.raison = raison
+        return erreur
+
+
+def raison_erreur(message):
+    """Cle stable d'un message d'erreur de validation ("autre" pour un texte sans raison)"""
+    return getattr(message, "raison", "autre")
+
 
 class ValidationService:
-    """Service de validation des entrees de temps et formatage de dates"""
+    """Service de validation des entrees de temps et formatage de dates.
+    Avec config.plafonds_cumules, une entree est aussi refusee si elle porte les
+    heures de l'employe au-dela du plafond journalier ou hebdomadaire de son
+    contrat: les heures deja saisies sont lues dans les totaux courants par jour
+    et par semaine, en temps constant. Une entree d'un mois clos par la compaction
+    est refusee."""
+
+    MAX_HEURES_PAR_CONTRAT = {
+        TypeContrat.CDI: 8.0,
+        TypeContrat.CDD: 7.5,
+        TypeContrat.STAGE: 6.0,
+        TypeContrat.ALTERNANCE: 7.0,
+        TypeContrat.FREELANCE: 10.0,
+    }
 
-    def __init__(self, config):
+    MAX_HEURES_SEMAINE_PAR_CONTRAT = {
+        TypeContrat.CDI: 40.0,
+        TypeContrat.CDD: 37.5,
+        TypeContrat.STAGE: 30.0,
+        TypeContrat.ALTERNANCE: 35.0,
+        TypeContrat.FREELANCE: 50.0,
+    }
+
+    def __init__(self, config, metriques=METRIQUES_INACTIVES, totaux=None, resumes=None):
         self.config = config
+        self.metriques = metriques
+        self.totaux = totaux
+        self.resumes = resumes
 
     def valider_entree(self, emp, projet, date, heures):
         """Valide une entree de temps avant saisie"""
-        erreurs = []
+        with self.metriques.chrono("valider_entree"):
+            erreurs, _ = self._verifier_ligne(emp, projet, date, heures)
+        for erreur in erreurs:
+            self.metriques.incrementer(f"validation.echecs.{raison_erreur(erreur)}")
+        return erreurs
 
+    def _verifier_ligne(self, emp, projet, date, heures, lot_jour=None, lot_semaine=None):
+        """Controles d'une ligne a saisir, communs a valider_entree et valider_lot.
+        Renvoie (erreurs, jour): jour est la date telle qu'elle sera stockee (texte au
+        format FR, comme TimeEntry), None si elle n'a pas pu etre analysee."""
         if emp is None:
-            erreurs.append("Employe inexistant")
-            return erreurs
-
+            return [ErreurValidation("Employe inexistant", "employe_inexistant")], None
         if projet is None:
-            erreurs.append("Projet inexistant")
-            return erreurs
+            return [ErreurValidation("Projet inexistant", "projet_inexistant")], None
 
+        erreurs = []
         max_heures = self.verifier_heures_max(emp)
-
         if heures > max_heures:
-            erreurs.append(f"Depassement: {heures}h > {max_heures}h max pour {emp.type_contrat.value}")
-
+            erreurs.append(ErreurValidation(f"Depassement: {heures}h > {max_heures}h max pour {emp.type_contrat.value}",
+                                            "depassement"))
         if heures <= 0:
-            erreurs.append("Les heures doivent etre positives")
-
+            erreurs.append(ErreurValidation("Les heures doivent etre positives", "heures_negatives"))
+        nombre = len(erreurs)
         erreurs = self.valider_date(date, erreurs)
+        try:
+            jour = parser_date(date)
+        except ValueError as erreur:
+            if len(erreurs) == nombre:      # valide au format configure, pas au format stocke
+                erreurs.append(ErreurValidation(str(erreur), "date_invalide"))
+            return erreurs, None
+        if erreurs:
+            return erreurs, jour
+        message = self._mois_clos(jour)
+        if message:
+            return [message], jour
+        if self._plafonds_actifs():
+            erreurs = self._verifier_plafonds(emp, jour.toordinal(), heures, lot_jour, lot_semaine)
+        return erreurs, jour
+
+    def _mois_clos(self, jour):
+        """Message d'erreur si le mois de jour est clos, chaine vide sinon"""
+        if self.resumes and self.resumes.est_clos(jour.year, jour.month):
+            return ErreurValidation(f"Mois clos: {jour.month:02d}/{jour.year}", "mois_clos")
+        return ""
+
+    def _plafonds_actifs(self):
+        return self.config.plafonds_cumules and self.totaux is not None
 
+    def _format_date(self):
+        return self.config.format_date if self.config.format_date in FORMATS_DATE else "FR"
+
+    def _verifier_plafonds(self, emp, jour, heures, lot_jour=None, lot_semaine=None):
+        """Erreurs de plafond cumule pour heures saisies le jour donne (ordinal). lot_jour et
+        lot_semaine cumulent les lignes deja acceptees d'un lot en cours de validation."""
+        erreurs = []
+        semaine = (jour - 1) // 7
+        cumul_jour = self.totaux.heures_jour(emp.id, jour) + heures
+        cumul_semaine = self.totaux.heures_semaine(emp.id, jour) + heures
+        if lot_jour is not None:
+            cumul_jour += lot_jour.get((emp.id, jour), 0)
+            cumul_semaine += lot_semaine.get((emp.id, semaine), 0)
+        max_jour = self.MAX_HEURES_PAR_CONTRAT.get(emp.type_contrat, 8.0)
+        max_semaine = self.MAX_HEURES_SEMAINE_PAR_CONTRAT.get(emp.type_contrat, 40.0)
+        if cumul_jour <= max_jour and cumul_semaine <= max_semaine:
+            return erreurs
+        le = formater_date(date.fromordinal(jour), self._format_date())
+        if cumul_jour > max_jour:
+            erreurs.append(ErreurValidation(
+                f"Depassement journalier le {le}: {cumul_jour}h > {max_jour}h max pour {emp.type_contrat.value}",
+                "depassement_journalier"))
+        if cumul_semaine > max_semaine:
+            erreurs.append(ErreurValidation(
+                f"Depassement hebdomadaire le {le}: {cumul_semaine}h > {max_semaine}h max pour {emp.type_contrat.value}",
+                "depassement_hebdomadaire"))
         return erreurs
 
+    def valider_lot(self, lignes, employes_par_id, projets_par_id):
+        """Valide un lot de lignes (employee_id, project_id, date, heures, description) en une passe.
+        Renvoie (valides, erreurs): les lignes valides avec leur date analysee,
+        et {position: [erreurs]} pour les autres. L'erreur de plafond cumule est portee
+        par la premiere ligne qui le depasse."""
+        plafonds = self._plafonds_actifs()
+        lot_jour, lot_semaine = {}, {}      # heures des lignes deja acceptees du lot
+        valides = []
+        erreurs = {}
+        metriques = self.metriques
+        for position, (employee_id, project_id, date, heures, description) in enumerate(lignes):
+            messages, jour = self._verifier_ligne(employes_par_id.get(employee_id), projets_par_id.get(project_id),
+                                                  date, heures, lot_jour, lot_semaine)
+            if messages:
+                erreurs[position] = messages
+                for message in messages:
+                    metriques.incrementer(f"validation.echecs.{raison_erreur(message)}")
+                continue
+            if plafonds:
+                ordinal = jour.toordinal()
+                cle_jour, cle_semaine = (employee_id, ordinal), (employee_id, (ordinal - 1) // 7)
+                lot_jour[cle_jour] = lot_jour.get(cle_jour, 0) + heures
+                lot_semaine[cle_semaine] = lot_semaine.get(cle_semaine, 0) + heures
+            valides.append((employee_id, project_id, jour, heures, description))
+        return valides, erreurs
+
     def formater_date(self, date_str):
-        """Formate une date selon la configuration"""
-        if self.config.format_date == "FR":
-            parties = date_str.split("/")
-            if len(parties) == 3:
-                return f"{parties[0]}/{parties[1]}/{parties[2]}"
-        elif self.config.format_date == "US":
-            parties = date_str.split("/")
-            if len(parties) == 3:
-                return f"{parties[1]}/{parties[0]}/{parties[2]}"
-        elif self.config.format_date == "ISO":
-            parties = date_str.split("/")
-            if len(parties) == 3:
-                return f"{parties[2]}-{parties[1]}-{parties[0]}"
-        return date_str
+        """Formate une date (texte "JJ/MM/AAAA" ou datetime.date) selon la configuration"""
+        if self.config.format_date not in FORMATS_DATE:
+            return date_str
+        try:
+            jour = parser_date(date_str)
+        except ValueError:
+            return date_str
+        return formater_date(jour, self.config.format_date)
 
     def valider_date(self, date, erreurs):
-        if self.config.format_date == "FR":
-            parties = date.split("/")
-            if len(parties) != 3:
-                erreurs.append("Format de date invalide (attendu: JJ/MM/AAAA)")
-        elif self.config.format_date == "US":
-            parties = date.split("/")
-            if len(parties) != 3:
-                erreurs.append("Format de date invalide (attendu: MM/DD/YYYY)")
-        elif self.config.format_date == "ISO":
-            parties = date.split("-")
-            if len(parties) != 3:
-                erreurs.append("Format de date invalide (attendu: AAAA-MM-JJ)")
+        if self.config.format_date in FORMATS_DATE:
+            try:
+                parser_date(date, self.config.format_date)
+            except ValueError as erreur:
+                erreurs.append(ErreurValidation(str(erreur), "date_invalide"))
 
         return erreurs
 
     def verifier_heures_max(self, emp):
-        max_heures_par_contrat = {
-            TypeContrat.CDI: 8.0,
-            TypeContrat.CDD: 7.5,
-            TypeContrat.STAGE: 6.0,
-            TypeContrat.ALTERNANCE: 7.0,
-            TypeContrat.FREELANCE: 10.0,
-        }
-        max_heures = max_heures_par_contrat.get(emp.type_contrat, 8.0)
-        return max_heures
+        return self.MAX_HEURES_PAR_CONTRAT.get(emp.type_contrat, 8.0)
 
 class ExportService:
-    """Service d'export des donnees au format CSV"""
+    """Service d'export des donnees au format CSV et en fichiers columnaires"""
 
-    def __init__(self, config):
+    def __init__(self, config, metriques=METRIQUES_INACTIVES):
         self.config = config
+        self.metriques = metriques
 
-    def exporter_csv(self, entrees, emp, trouver_projet_fn, formater_date_fn):
+    def exporter_csv(self, entrees, emp, trouver_projet_fn, formater_date_fn, taux_fn=None):
         """Exporte les entrees de temps au format CSV"""
+        lignes = self.lignes_csv(entrees, lambda employee_id: emp, trouver_projet_fn, formater_date_fn, taux_fn)
+        texte = "\n".join(lignes)
+        self.metriques.incrementer("export.octets", len(texte))
+        return texte
+
+    def lignes_csv(self, entrees, trouver_employe_fn, trouver_projet_fn, formater_date_fn, taux_fn=None):
+        """Genere l'en-tete puis une ligne CSV par entree, sans les accumuler.
+        taux_fn(employee_id, jour ordinal) donne le taux en vigueur a la date de l'entree;
+        a defaut, le taux horaire courant de l'employe est utilise."""
         sep = self.config.separateur_csv
-        lignes = [f"Date{sep}Projet{sep}Heures{sep}Description{sep}Cout (EUR)"]
+        yield f"Date{sep}Projet{sep}Heures{sep}Description{sep}Cout (EUR)"
 
         for entree in entrees:
             projet = trouver_projet_fn(entree.project_id)
             projet_nom = projet.nom if projet else "Inconnu"
-            cout = entree.heures * emp.taux_horaire
-            date_formatee = formater_date_fn(entree.date)
-            lignes.append(f"{date_formatee}{sep}{projet_nom}{sep}{entree.heures}{sep}{entree.description}{sep}{cout:.2f} EUR")
+            emp = trouver_employe_fn(entree.employee_id)
+            jour = entree.jour
+            if emp is None:
+                cout = 0
+            elif taux_fn is not None:
+                cout = entree.heures * taux_fn(entree.employee_id, jour.toordinal())
+            else:
+                cout = entree.heures * emp.taux_horaire
+            date_formatee = formater_date_fn(jour)
+            yield f"{date_formatee}{sep}{projet_nom}{sep}{entree.heures}{sep}{entree.description}{sep}{cout:.2f} EUR"
+
+    # Colonnes de l'export des modifications; chaque objet ne remplit que les siennes
+    COLONNES_MODIFICATIONS = ("sequence", "objet", "operation", "id", "employee_id", "project_id", "date",
+                              "heures", "statut", "description", "cout", "nom", "prenom", "type_contrat",
+                              "taux_horaire", "code", "budget_heures")
+
+    def lignes_modifications(self, changements, format="csv"):
+        """Genere les lignes d'export des modifications: CSV (en-tete puis une ligne par
+        modification, colonnes vides si non applicables) ou JSON lines"""
+        if format == "jsonl":
+            for changement in changements:
+                yield json.dumps(changement, ensure_ascii=False)
+            return
+        if format != "csv":
+            raise ValueError(f"Format d'export inconnu: {format}")
+        sep = self.config.separateur_csv
+        colonnes = self.COLONNES_MODIFICATIONS
+        yield sep.join(colonnes)
+        for changement in changements:
+            yield sep.join(str(changement.get(colonne, "")) for colonne in colonnes)
+
+    def ecrire_csv(self, fichier, lignes, taille_tampon=64 * 1024):
+        """Ecrit des lignes CSV dans un objet fichier, par blocs d'environ taille_tampon
+        caracteres. Renvoie le nombre de lignes ecrites, en-tete compris."""
+        tampon = []
+        taille = 0
+        ecrits = 0
+        nb_lignes = 0
+        for ligne in lignes:
+            tampon.append(ligne)
+            tampon.append("\n")
+            taille += len(ligne) + 1
+            nb_lignes += 1
+            if taille >= taille_tampon:
+                fichier.write("".join(tampon))
+                ecrits += taille
+                tampon = []
+                taille = 0
+        if tampon:
+            fichier.write("".join(tampon))
+            ecrits += taille
+        self.metriques.incrementer("export.octets", ecrits)
+        self.metriques.incrementer("export.lignes", nb_lignes)
+        return nb_lignes
+
+    def exporter_colonnes(self, chemin, sources, employes, projets, couts_fn, format="tscol",
+                          taille_groupe=64 * 1024):
+        """Exporte les lignes de chaque source (registre, numeros de ligne) dans un fichier
+        binaire columnaire type, par groupes de taille_groupe lignes: format "tscol" (voir
+        colonnaire.py) ou "arrow" (Arrow IPC, necessite pyarrow). Les noms d'employes, de
+        projets et les statuts sont encodes par dictionnaire, ainsi que les descriptions en
+        "tscol". couts_fn(table, lignes) valorise un groupe de lignes.
+        Renvoie le nombre de lignes exportees."""
+        ecrire = {"tscol": ecrire_colonnaire, "arrow": ecrire_arrow}.get(format)
+        if ecrire is None:
+            raise ValueError(f"Format d'export inconnu: {format}")
+        nb_lignes = self.ecrire_colonnes(chemin, sources, ecrire, employes, projets, couts_fn, taille_groupe)
+        self.metriques.incrementer("export.lignes", nb_lignes)
+        return nb_lignes
+
+    def ecrire_colonnes(self, chemin, sources, ecrire, employes, projets, couts_fn, taille_groupe):
+        """Ecrit les lignes de chaque source dans un fichier columnaire avec la fonction
+        ecrire (colonnaire.py); pas de fichier partiel en cas d'erreur"""
+        employes = list(employes)
+        projets = list(projets)
+        dictionnaires = {"statut": [statut.value for statut in STATUTS],
+                         "employe": [f"{emp.nom} {emp.prenom}" for emp in employes],
+                         "projet": [projet.nom for projet in projets],
+                         "description": {}}     # texte -> indice, complete au fil des groupes
+        code_employe = {emp.id: code for code, emp in enumerate(employes)}
+        code_projet = {projet.id: code for code, projet in enumerate(projets)}
+        groupes = (groupe for registre, lignes in sources
+                   for groupe in self._groupes_colonnes(registre.table, lignes, taille_groupe, code_employe,
+                                                        code_projet, dictionnaires["description"], couts_fn))
+        try:
+            with open(chemin, "wb") as fichier:
+                return ecrire(fichier, groupes, dictionnaires)
+        except BaseException:
+            os.remove(chemin)
+            raise
 
-        return "\n".join(lignes)
\ No newline at end of file
+    @staticmethod
+    def _groupes_colonnes(table, lignes, taille_groupe, code_employe, code_projet, code_description, couts_fn):
+        """Colonnes typees de chaque groupe de lignes de la table; les couts d'un groupe sont
+        calcules en un appel a couts_fn (jointure par fusion avec les periodes de taux)"""
+        lignes = iter(lignes)
+        while True:
+            groupe = array("q", islice(lignes, taille_groupe))
+            if not groupe:
+                return
+            employes = array("i", map(table.employee_id.__getitem__, groupe))
+            projets = array("i", map(table.project_id.__getitem__, groupe))
+            descriptions = array("i")
+            for ligne in groupe:
+                texte = table.description[ligne]
+                code = code_description.get(texte)
+                if code is None:
+                    code = code_description[texte] = len(code_description)
+                descriptions.append(code)
+            yield {"id": array("q", map(table.id.__getitem__, groupe)),
+                   "employee_id": employes, "project_id": projets,
+                   "date": array("i", (table.jour[ligne] - EPOQUE for ligne in groupe)),
+                   "heures": array("d", map(table.heures.__getitem__, groupe)),
+                   "cout": array("d", couts_fn(table, groupe)),
+                   "statut": array("b", map(table.statut.__getitem__, groupe)),
+                   "employe": array("i", (code_employe.get(emp_id, -1) for emp_id in employes)),
+                   "projet": array("i", (code_projet.get(proj_id, -1) for proj_id in projets)),
+                   "description": descriptions}
@@ -0,0 +1,240 @@
+# stockage.py - Backends de persistance du service de feuilles de temps
+
+import sqlite3
+from collections import deque
+
+from models import Employee, Projet, TypeContrat
+from colonnes import CODE_STATUT, periode
+from modifications import CODE_OBJET, CODE_OPERATION
+
+
+class StockageMemoire:
+    """Stockage en memoire: rien n'est persiste, le journal ne garde que
+    les derniers messages."""
+
+    def __init__(self, taille_journal=10000):
+        self.journal = deque(maxlen=taille_journal)
+
+    def charger(self, service):
+        pass
+
+    def enregistrer_employe(self, employe):
+        pass
+
+    def enregistrer_employe_modifie(self, employe):
+        pass
+
+    def enregistrer_taux_horaires(self, employee_id, periodes):
+        pass
+
+    def enregistrer_projet(self, projet):
+        pass
+
+    def enregistrer_entree(self, entree):
+        pass
+
+    def enregistrer_statut(self, entree):
+        pass
+
+    def enregistrer_modification(self, entree):
+        pass
+
+    def enregistrer_changement(self, sequence, objet, operation, identifiant, valeur):
+        pass
+
+    def oublier_changements(self, jusqu_a):
+        pass
+
+    def enregistrer_compaction(self, periodes, prochain_id, resumes, archives, semaines):
+        pass
+
+    def enregistrer_cout_resume(self, employee_id, project_id, annee, mois, cout):
+        pass
+
+    def valider(self):
+        pass
+
+    def fermer(self):
+        pass
+
+
+class JournalFichier:
+    """Journal sur disque en ajout seul, un message par ligne"""
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self._fichier = open(chemin, "a", encoding="utf-8")
+
+    def append(self, message):
+        self._fichier.write(message.replace("\n", " ") + "\n")
+
+    def __iter__(self):
+        self._fichier.flush()
+        with open(self.chemin, encoding="utf-8") as fichier:
+            for ligne in fichier:
+                yield ligne.rstrip("\n")
+
+    def vider(self):
+        self._fichier.flush()
+
+    def fermer(self):
+        self._fichier.close()
+
+
+class StockageSQLite:
+    """Stockage SQLite. Les ecritures sont mises en attente puis appliquees
+    par lots dans une transaction (tous les taille_lot ecritures, ou a valider()).
+    L'identifiant stable de l'entree (entree.id) sert de cle aux entrees."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS employes (
+            id INTEGER PRIMARY KEY, nom TEXT, prenom TEXT, telephone TEXT, email TEXT,
+            date_embauche TEXT, type_contrat TEXT, taux_horaire REAL);
+        CREATE TABLE IF NOT EXISTS projets (
+            id INTEGER PRIMARY KEY, nom TEXT, code TEXT, budget_heures);
+        CREATE TABLE IF NOT EXISTS entrees (
+            id INTEGER PRIMARY KEY, employee_id INTEGER, project_id INTEGER, jour INTEGER,
+            periode INTEGER, heures REAL, statut INTEGER, description TEXT);
+        CREATE INDEX IF NOT EXISTS idx_entrees_employe_jour ON entrees (employee_id, jour);
+        CREATE INDEX IF NOT EXISTS idx_entrees_projet_jour ON entrees (project_id, jour);
+        CREATE TABLE IF NOT EXISTS taux_horaires (
+            employee_id INTEGER, debut INTEGER, taux REAL, PRIMARY KEY (employee_id, debut));
+        CREATE TABLE IF NOT EXISTS modifications (
+            sequence INTEGER PRIMARY KEY, objet INTEGER, operation INTEGER, identifiant INTEGER, valeur INTEGER);
+        CREATE TABLE IF NOT EXISTS mois_clos (annee INTEGER, mois INTEGER, archive TEXT, PRIMARY KEY (annee, mois));
+        CREATE TABLE IF NOT EXISTS resumes (
+            employee_id INTEGER, project_id INTEGER, annee INTEGER, mois INTEGER, heures REAL, cout REAL,
+            nombre INTEGER, PRIMARY KEY (employee_id, project_id, annee, mois));
+        CREATE TABLE IF NOT EXISTS semaines_closes (
+            employee_id INTEGER, semaine INTEGER, heures REAL, PRIMARY KEY (employee_id, semaine));
+        CREATE TABLE IF NOT EXISTS compteurs (nom TEXT PRIMARY KEY, valeur INTEGER);
+    """
+
+    def __init__(self, chemin, chemin_journal=None, taille_lot=1000):
+        # partage entre threads possible: le service serialise les acces (section commune)
+        self.connexion = sqlite3.connect(chemin, check_same_thread=False)
+        self.connexion.executescript(self.SCHEMA)
+        self.journal = JournalFichier(chemin_journal or f"{chemin}.journal")
+        self.taille_lot = taille_lot
+        self._en_attente = []   # (requete, parametres) dans l'ordre des ecritures
+        self._changements = []  # lignes du journal des modifications, inserees en un executemany
+
+    def charger(self, service):
+        """Recharge employes, historiques de taux et projets, les resumes des mois clos,
+        puis les entrees en colonnes sans creer de TimeEntry"""
+        for ligne in self.connexion.execute(
+                "SELECT id, nom, prenom, telephone, email, date_embauche, type_contrat, taux_horaire "
+                "FROM employes ORDER BY rowid"):
+            service._indexer_employe(Employee(*ligne[:6], TypeContrat(ligne[6]), ligne[7]))
+        historiques = {}
+        for employee_id, debut, taux in self.connexion.execute(
+                "SELECT employee_id, debut, taux FROM taux_horaires ORDER BY employee_id, debut"):
+            historiques.setdefault(employee_id, []).append((debut, taux))
+        for employee_id, periodes in historiques.items():
+            service.taux.remplacer(employee_id, periodes)
+        for ligne in self.connexion.execute("SELECT id, nom, code, budget_heures FROM projets ORDER BY rowid"):
+            service._indexer_projet(Projet(*ligne))
+        service._charger_resumes(
+            self.connexion.execute("SELECT annee, mois, archive FROM mois_clos ORDER BY annee, mois"),
+            self.connexion.execute("SELECT employee_id, project_id, annee, mois, heures, cout, nombre "
+                                   "FROM resumes ORDER BY rowid").fetchall(),
+            self.connexion.execute("SELECT employee_id, semaine, heures FROM semaines_closes").fetchall())
+        prochain_id = self.connexion.execute("SELECT valeur FROM compteurs WHERE nom = 'prochain_id'").fetchone()
+        service._charger_lignes(self.connexion.execute(
+            "SELECT id, employee_id, project_id, jour, periode, heures, statut, description "
+            "FROM entrees ORDER BY id"), prochain_id[0] if prochain_id else 0)
+        service.modifications.charger(self.connexion.execute(
+            "SELECT sequence, objet, operation, identifiant, valeur FROM modifications ORDER BY sequence"))
+
+    def enregistrer_employe(self, employe):
+        self._ecrire(
+            "INSERT OR IGNORE INTO employes VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (employe.id, employe.nom, employe.prenom, employe.telephone, employe.email,
+             employe.date_embauche, employe.type_contrat.value, employe.taux_horaire))
+
+    def enregistrer_employe_modifie(self, employe):
+        self._ecrire("UPDATE employes SET taux_horaire = ? WHERE id = ?", (employe.taux_horaire, employe.id))
+
+    def enregistrer_taux_horaires(self, employee_id, periodes):
+        """Remplace l'historique des taux d'un employe (rien n'est stocke pour un taux unique,
+        deja porte par employes.taux_horaire)"""
+        self._ecrire("DELETE FROM taux_horaires WHERE employee_id = ?", (employee_id,))
+        if len(periodes) > 1:
+            for debut, taux in periodes:
+                self._ecrire("INSERT INTO taux_horaires VALUES (?, ?, ?)", (employee_id, debut, taux))
+
+    def enregistrer_projet(self, projet):
+        self._ecrire("INSERT OR IGNORE INTO projets VALUES (?, ?, ?, ?)",
+                     (projet.id, projet.nom, projet.code, projet.budget_heures))
+
+    def enregistrer_entree(self, entree):
+        jour = entree.jour
+        self._ecrire(
+            "INSERT INTO entrees VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (entree.id, entree.employee_id, entree.project_id, jour.toordinal(),
+             periode(jour.year, jour.month), entree.heures, CODE_STATUT[entree.statut], entree.description))
+
+    def enregistrer_statut(self, entree):
+        self._ecrire("UPDATE entrees SET statut = ? WHERE id = ?", (CODE_STATUT[entree.statut], entree.id))
+
+    def enregistrer_modification(self, entree):
+        self._ecrire("UPDATE entrees SET heures = ?, description = ? WHERE id = ?",
+                     (entree.heures, entree.description, entree.id))
+
+    def enregistrer_changement(self, sequence, objet, operation, identifiant, valeur):
+        # table independante: regroupee a part pour ne pas couper les lots des autres requetes
+        self._changements.append((sequence, CODE_OBJET[objet], CODE_OPERATION[operation], identifiant, valeur))
+        if len(self._en_attente) + len(self._changements) >= self.taille_lot:
+            self.valider()
+
+    def oublier_changements(self, jusqu_a):
+        self.valider()
+        # la derniere ligne est gardee: au rechargement, la sequence reprend apres elle
+        self._ecrire("DELETE FROM modifications WHERE sequence <= ? "
+                     "AND sequence < (SELECT MAX(sequence) FROM modifications)", (jusqu_a,))
+
+    def enregistrer_compaction(self, periodes, prochain_id, resumes, archives, semaines):
+        """Retire les entrees des periodes closes (leurs identifiants ne sont pas reutilises)
+        puis ajoute les resumes, les archives et les heures par semaine des mois clos, en une
+        seule transaction. Le journal des modifications n'est pas modifie."""
+        self.valider()
+        with self.connexion:
+            self.connexion.executemany("DELETE FROM entrees WHERE periode = ?", ((valeur,) for valeur in periodes))
+            self.connexion.execute("INSERT OR REPLACE INTO compteurs VALUES ('prochain_id', ?)", (prochain_id,))
+            self.connexion.executemany("INSERT INTO mois_clos VALUES (?, ?, ?)", archives)
+            self.connexion.executemany("INSERT INTO resumes VALUES (?, ?, ?, ?, ?, ?, ?)", resumes)
+            self.connexion.executemany(
+                "INSERT INTO semaines_closes VALUES (?, ?, ?) "
+                "ON CONFLICT (employee_id, semaine) DO UPDATE SET heures = heures + excluded.heures", semaines)
+
+    def enregistrer_cout_resume(self, employee_id, project_id, annee, mois, cout):
+        self._ecrire("UPDATE resumes SET cout = ? WHERE employee_id = ? AND project_id = ? AND annee = ? AND mois = ?",
+                     (cout, employee_id, project_id, annee, mois))
+
+    def valider(self):
+        """Applique les ecritures en attente dans une seule transaction"""
+        if self._en_attente or self._changements:
+            with self.connexion:
+                requete, lot = None, []
+                for suivante, parametres in self._en_attente:
+                    if suivante != requete and lot:
+                        self.connexion.executemany(requete, lot)
+                        lot = []
+                    requete = suivante
+                    lot.append(parametres)
+                if lot:
+                    self.connexion.executemany(requete, lot)
+                self.connexion.executemany("INSERT INTO modifications VALUES (?, ?, ?, ?, ?)", self._changements)
+            self._en_attente = []
+            self._changements = []
+        self.journal.vider()
+
+    def fermer(self):
+        self.valider()
+        self.journal.fermer()
+        self.connexion.close()
+
+    def _ecrire(self, requete, parametres):
+        self._en_attente.append((requete, parametres))
+        if len(self._en_attente) + len(self._changements) >= self.taille_lot:
+            self.valider()
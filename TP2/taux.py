@@ -0,0 +1,117 @@
+# taux.py - Taux horaires dates de chaque employe
+
+from array import array
+from bisect import bisect_right
+
+TOUJOURS = 0    # date d'effet (ordinal) du premier taux: s'applique depuis toujours
+
+
+class HistoriqueTaux:
+    """Historique des taux horaires: pour chaque employe, dates d'effet croissantes
+    (ordinaux) et taux correspondants. Le taux en vigueur a une date est celui de la
+    derniere date d'effet inferieure ou egale (recherche dichotomique). Les employes
+    sans historique sont valorises a 0."""
+
+    def __init__(self):
+        self._dates = {}        # employee_id -> array("i") des dates d'effet
+        self._taux = {}         # employee_id -> array("d") des taux
+        self._fixes = {}        # employee_id -> taux, pour les employes a taux unique (cas courant)
+
+    def initialiser(self, employee_id, taux):
+        """Taux unique depuis toujours, si l'employe n'a pas encore d'historique"""
+        if employee_id not in self._dates:
+            self.remplacer(employee_id, [(TOUJOURS, taux)])
+
+    def remplacer(self, employee_id, periodes):
+        """Remplace l'historique d'un employe par [(date d'effet, taux)] triees"""
+        self._dates[employee_id] = array("i", (debut for debut, _ in periodes))
+        self._taux[employee_id] = array("d", (taux for _, taux in periodes))
+        if len(periodes) == 1:
+            self._fixes[employee_id] = periodes[0][1]
+        else:
+            self._fixes.pop(employee_id, None)
+
+    def definir(self, employee_id, taux, depuis=None):
+        """Applique taux a partir de la date d'effet depuis (ordinal) jusqu'au changement
+        suivant de l'historique; sans date, remplace tout l'historique"""
+        if depuis is None or employee_id not in self._dates:
+            self.remplacer(employee_id, [(TOUJOURS, taux)])
+            return
+        periodes = self.periodes(employee_id)
+        position = bisect_right(self._dates[employee_id], depuis)
+        if periodes[position - 1][0] == depuis:
+            periodes[position - 1] = (depuis, taux)
+        else:
+            periodes.insert(position, (depuis, taux))
+        self.remplacer(employee_id, periodes)
+
+    def periodes(self, employee_id):
+        """[(date d'effet, taux)] de l'employe, par date croissante"""
+        return list(zip(self._dates.get(employee_id, ()), self._taux.get(employee_id, ())))
+
+    def historiques(self):
+        """{employee_id: periodes} des employes dont le taux a change au cours du temps"""
+        return {employee_id: self.periodes(employee_id) for employee_id in self._dates
+                if employee_id not in self._fixes}
+
+    def taux_uniques(self):
+        """{employee_id: taux} si aucun employe n'a change de taux, None sinon"""
+        return self._fixes if len(self._fixes) == len(self._dates) else None
+
+    def dernier(self, employee_id):
+        """Taux de la date d'effet la plus recente"""
+        taux = self._taux.get(employee_id)
+        return taux[-1] if taux else 0
+
+    def taux_au(self, employee_id, jour):
+        """Taux en vigueur a la date jour (ordinal)"""
+        taux = self._fixes.get(employee_id)
+        if taux is not None:
+            return taux
+        dates = self._dates.get(employee_id)
+        if dates is None:
+            return 0
+        return self._taux[employee_id][max(bisect_right(dates, jour) - 1, 0)]
+
+    def taux_constant(self, employee_id, debut, fin):
+        """Taux unique en vigueur de debut a fin (ordinaux inclus), None s'il change entre les deux"""
+        taux = self._fixes.get(employee_id)
+        if taux is not None:
+            return taux
+        dates = self._dates.get(employee_id)
+        if dates is None:
+            return 0
+        if bisect_right(dates, debut) != bisect_right(dates, fin):
+            return None
+        return self.taux_au(employee_id, debut)
+
+    def couts(self, table, lignes, triees=False):
+        """Cout (heures x taux en vigueur a sa date) de chaque ligne de la table, dans
+        l'ordre de lignes. Jointure par fusion: les lignes sont parcourues par date
+        croissante et le curseur de chaque employe dans ses periodes ne fait qu'avancer,
+        sans recherche par ligne. triees indique que lignes est deja dans l'ordre des dates."""
+        employes, heures, jours = table.employee_id, table.heures, table.jour
+        fixes = self._fixes
+        if self.taux_uniques() is not None:
+            return [heures[ligne] * fixes.get(employes[ligne], 0) for ligne in lignes]
+
+        lignes = lignes if isinstance(lignes, (list, array)) else list(lignes)
+        ordre = range(len(lignes)) if triees else sorted(range(len(lignes)), key=lambda k: jours[lignes[k]])
+        couts = [0.0] * len(lignes)
+        curseurs = {}           # employee_id -> indice de la periode courante
+        for k in ordre:
+            ligne = lignes[k]
+            employee_id = employes[ligne]
+            taux = fixes.get(employee_id)
+            if taux is None:
+                dates = self._dates.get(employee_id)
+                if dates is None:
+                    continue
+                jour = jours[ligne]
+                curseur = curseurs.get(employee_id, 0)
+                while curseur + 1 < len(dates) and dates[curseur + 1] <= jour:
+                    curseur += 1
+                curseurs[employee_id] = curseur
+                taux = self._taux[employee_id][curseur]
+            couts[k] = heures[ligne] * taux
+        return couts
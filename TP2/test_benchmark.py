@@ -0,0 +1,37 @@
+# test_benchmark.py - Tests du generateur de donnees et de la comparaison de benchmarks
+
+import unittest
+
+from benchmark import generer_donnees, executer, comparer
+from services import ValidationService
+
+
+class TestBenchmark(unittest.TestCase):
+    """Verifie le generateur deterministe et la detection des regressions"""
+
+    def test_generateur_deterministe(self):
+        self.assertEqual(generer_donnees(1000, graine=7)[2], generer_donnees(1000, graine=7)[2])
+        self.assertNotEqual(generer_donnees(1000, graine=7)[2], generer_donnees(1000, graine=8)[2])
+
+    def test_generateur_respecte_les_contrats(self):
+        employes, projets, lignes = generer_donnees(2000)
+        contrats = {emp.id: emp.type_contrat for emp in employes}
+        for employee_id, project_id, _, heures, _ in lignes:
+            self.assertLessEqual(heures, ValidationService.MAX_HEURES_PAR_CONTRAT[contrats[employee_id]])
+            self.assertLessEqual(project_id, len(projets))
+
+    def test_execution_et_comparaison(self):
+        resultats = executer(1000, tracer_memoire=False)
+        noms = [mesure["nom"] for mesure in resultats["mesures"]]
+        self.assertIn("saisir_entree", noms)
+        self.assertIn("approuver_lot", noms)
+        self.assertEqual(comparer(resultats, resultats), [])
+
+        reference = {"mesures": [dict(mesure, duree_par_operation_s=mesure["duree_par_operation_s"] / 2)
+                                 for mesure in resultats["mesures"]]}
+        regressions = comparer(resultats, reference, seuil=0.5)
+        self.assertEqual(len(regressions), len([m for m in resultats["mesures"] if m["duree_par_operation_s"]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
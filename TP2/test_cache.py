@@ -0,0 +1,94 @@
+# test_cache.py - Tests unitaires du cache des rapports et exports
+
+import unittest
+
+from cache import CacheRapports
+from models import Employee, TypeContrat
+from notifications import NotificationService, ApprobationWorkflow
+from services import TimesheetService, Config
+
+
+class NotificationsMuettes(NotificationService):
+    def _envoyer(self, destinataire, message):
+        self.notifications_envoyees.append(message)
+
+    def _alerter(self, destinataire, message):
+        pass
+
+
+class TestCacheRapports(unittest.TestCase):
+    """Verifie l'eviction LRU et la limite memoire du cache"""
+
+    def test_eviction_lru(self):
+        cache = CacheRapports(taille_max=2)
+        config = Config()
+        cache.obtenir("rapport", 1, 3, 2024, config, lambda: "a")
+        cache.obtenir("rapport", 2, 3, 2024, config, lambda: "b")
+        cache.obtenir("rapport", 1, 3, 2024, config, lambda: "x")
+        cache.obtenir("rapport", 3, 3, 2024, config, lambda: "c")
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.obtenir("rapport", 1, 3, 2024, config, lambda: "x"), "a")
+        self.assertEqual(cache.obtenir("rapport", 2, 3, 2024, config, lambda: "b2"), "b2")
+
+    def test_limite_octets(self):
+        cache = CacheRapports(octets_max=10)
+        config = Config()
+        cache.obtenir("csv", 1, 3, 2024, config, lambda: "123456")
+        cache.obtenir("csv", 2, 3, 2024, config, lambda: "123456")
+        self.assertEqual(cache.statistiques()["elements"], 1)
+        self.assertEqual(cache.statistiques()["octets"], 6)
+
+    def test_configuration_dans_la_cle(self):
+        cache = CacheRapports()
+        cache.obtenir("csv", 1, 3, 2024, Config(), lambda: "fr")
+        self.assertEqual(cache.obtenir("csv", 1, 3, 2024, Config(format_date="ISO"), lambda: "iso"), "iso")
+        self.assertEqual(cache.echecs, 2)
+
+
+class TestCacheService(unittest.TestCase):
+    """Verifie que le service memorise ses sorties et les invalide precisement"""
+
+    def setUp(self):
+        self.ts = TimesheetService()
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_employe(Employee(2, "Martin", "Jean", "0698765432", "jean@example.com", "01/06/2023", TypeContrat.CDD, 28.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 100)
+        self.e1 = self.ts.saisir_entree(1, 1, "01/03/2024", 8.0, "Developpement")
+        self.ts.saisir_entree(1, 1, "01/04/2024", 6.0, "Tests")
+        self.ts.saisir_entree(2, 1, "01/03/2024", 5.0, "Analyse")
+
+    def test_succes_et_echecs(self):
+        premier = self.ts.generer_rapport_mensuel(1, 3, 2024)
+        self.assertIs(self.ts.generer_rapport_mensuel(1, 3, 2024), premier)
+        self.ts.exporter_csv(1, 3, 2024)
+        self.ts.exporter_csv(1, 3, 2024)
+        self.assertEqual((self.ts.cache.succes, self.ts.cache.echecs), (2, 2))
+
+    def test_saisie_invalide_seulement_le_mois_touche(self):
+        self.ts.generer_rapport_mensuel(1, 3, 2024)
+        self.ts.generer_rapport_mensuel(1, 4, 2024)
+        self.ts.generer_rapport_mensuel(2, 3, 2024)
+        self.ts.saisir_entree(1, 1, "02/03/2024", 2.0, "Revue")
+        self.assertEqual(len(self.ts.cache), 2)
+        self.assertIn("Total: 10.0h", self.ts.generer_rapport_mensuel(1, 3, 2024))
+
+    def test_changement_statut_invalide(self):
+        workflow = ApprobationWorkflow(self.ts, NotificationsMuettes())
+        self.ts.exporter_csv(1, 3, 2024)
+        self.ts.exporter_csv(1, 4, 2024)
+        workflow.soumettre(self.e1)
+        self.assertEqual(len(self.ts.cache), 1)
+        self.ts.exporter_csv(1, 3, 2024)
+        self.assertEqual(self.ts.cache.echecs, 3)
+
+    def test_changement_taux_horaire(self):
+        self.ts.generer_rapport_mensuel(1, 3, 2024)
+        self.ts.generer_rapport_mensuel(2, 3, 2024)
+        self.ts.changer_taux_horaire(1, 40.0)
+        self.assertEqual(len(self.ts.cache), 1)
+        self.assertEqual(self.ts.calculer_cout_projet(1, 3, 2024), 8.0 * 40.0 + 5.0 * 28.0)
+        self.assertEqual(self.ts.calculer_cout_projet(1, 4, 2024), 6.0 * 40.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# test_chronologie.py - Tests unitaires des requetes par intervalle de dates
+
+import unittest
+from datetime import date
+
+from chronologie import debut_periode, cle_periode
+from models import Employee, TypeContrat
+from services import TimesheetService
+
+
+class TestPeriodes(unittest.TestCase):
+
+    def test_debut_et_cle(self):
+        jour = date(2024, 5, 15)
+        self.assertEqual(debut_periode(jour, "semaine"), date(2024, 5, 13))
+        self.assertEqual(cle_periode(debut_periode(jour, "semaine"), "semaine"), (2024, 20))
+        self.assertEqual(cle_periode(debut_periode(jour, "trimestre"), "trimestre"), (2024, 2))
+        self.assertEqual(cle_periode(debut_periode(jour, "annee"), "annee"), 2024)
+        with self.assertRaises(ValueError):
+            debut_periode(jour, "siecle")
+
+
+class TestRequetesPeriode(unittest.TestCase):
+    """Verifie totaux et cumuls sur des intervalles de dates quelconques"""
+
+    def setUp(self):
+        self.ts = TimesheetService()
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_employe(Employee(2, "Martin", "Jean", "0698765432", "jean@example.com", "01/06/2023", TypeContrat.CDD, 28.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 1000)
+        self.ts.ajouter_projet(2, "App Mobile", "MOB01", 1000)
+        # saisies volontairement dans le desordre
+        self.ts.saisir_entree(1, 1, "15/05/2024", 8.0, "a")
+        self.ts.saisir_entree(1, 2, "02/01/2024", 4.0, "b")
+        self.ts.saisir_entree(2, 1, "30/06/2024", 7.0, "c")
+        self.ts.saisir_entree(1, 1, "01/07/2024", 6.0, "d")
+
+    def test_totaux_intervalle(self):
+        self.assertEqual(self.ts.heures_employe_periode(1, "01/01/2024", "30/06/2024"), 12.0)
+        self.assertEqual(self.ts.heures_employe_periode(1, date(2024, 5, 15), date(2024, 7, 1)), 14.0)
+        self.assertEqual(self.ts.cout_projet_periode(1, "01/04/2024", "30/06/2024"), 8.0 * 35.0 + 7.0 * 28.0)
+        self.assertEqual(self.ts.heures_employe_periode(1, "01/08/2024", "31/12/2024"), 0.0)
+
+    def test_cumuls(self):
+        self.assertEqual(self.ts.cumuls_projet(1, granularite="trimestre"),
+                         {(2024, 2): (15.0, 8.0 * 35.0 + 7.0 * 28.0), (2024, 3): (6.0, 6.0 * 35.0)})
+        self.assertEqual(self.ts.cumuls_employe(1, "01/01/2024", "31/05/2024"),
+                         {(2024, 1): (4.0, 140.0), (2024, 5): (8.0, 280.0)})
+        self.assertEqual(self.ts.cumuls_entreprise(granularite="annee"), {2024: (25.0, 25 * 35.0 - 7.0 * 7.0)})
+        self.assertEqual(list(self.ts.cumuls_employe(1, granularite="semaine")), [(2024, 1), (2024, 20), (2024, 27)])
+
+    def test_coherent_avec_les_totaux_mensuels(self):
+        for mois in range(1, 13):
+            cumul = self.ts.cumuls_projet(1).get((2024, mois), (0.0, 0.0))
+            self.assertEqual(cumul[1], self.ts.calculer_cout_projet(1, mois, 2024))
+
+    def test_index_tenu_a_jour(self):
+        self.ts.cumuls_employe(1)
+        self.ts.saisir_entree(1, 1, "02/07/2024", 2.0, "en fin d'index")
+        self.assertEqual(self.ts.heures_employe_periode(1, "01/07/2024", "31/07/2024"), 8.0)
+        self.ts.saisir_entree(1, 1, "01/03/2024", 3.0, "dans le passe")
+        self.assertEqual(self.ts.cumuls_employe(1, granularite="trimestre")[(2024, 1)], (7.0, 245.0))
+        entree = self.ts.selectionner_entrees(employee_ids={1}, debut="01/03/2024", fin="01/03/2024")[0]
+        self.ts.modifier_entree(entree, heures=1.0)
+        self.assertEqual(self.ts.heures_employe_periode(1, "01/03/2024", "01/03/2024"), 1.0)
+        self.ts.changer_taux_horaire(1, 40.0)
+        self.assertEqual(self.ts.cout_projet_periode(2, "01/01/2024", "31/01/2024"), 160.0)
+
+    def test_selection_par_intervalle(self):
+        entrees = self.ts.selectionner_entrees(debut="01/05/2024", fin="30/06/2024")
+        self.assertEqual([e.description for e in entrees], ["a", "c"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# test_cliche.py - Tests unitaires du cliche binaire projete en memoire
+
+import os
+import tempfile
+import unittest
+
+from cliche import EN_TETE, VERSION, ecrire_cliche, charger_cliche
+from models import Employee, TypeContrat, StatutEntree
+from services import TimesheetService
+
+
+class TestCliche(unittest.TestCase):
+    """Verifie qu'un cliche recharge donne les memes resultats que le service d'origine"""
+
+    def setUp(self):
+        self.ts = TimesheetService()
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_employe(Employee(2, "Martin", "Jean", "0698765432", "jean@example.com", "01/06/2023", TypeContrat.CDD, 28.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 10)
+        self.ts.ajouter_projet(2, "Application Mobile", "MOB01", 12.5)
+        self.ts.saisir_entree(1, 1, "01/03/2024", 8.0, "Developpement")
+        self.ts.saisir_entree(1, 2, "02/03/2024", 6.0, "Réunion équipe")
+        self.ts.saisir_entree(2, 1, "04/03/2024", 7.0, "Developpement")
+        self.ts.saisir_entree(2, 2, "01/04/2024", 5.0, "Tests")
+        self.ts.changer_statut(self.ts.entrees[3], StatutEntree.REJETE)
+        descripteur, self.chemin = tempfile.mkstemp(suffix=".cliche")
+        os.close(descripteur)
+        ecrire_cliche(self.ts, self.chemin)
+        self.charge = charger_cliche(self.chemin)
+
+    def tearDown(self):
+        os.remove(self.chemin)
+
+    def test_memes_resultats(self):
+        for emp_id in (1, 2):
+            for mois in (3, 4):
+                self.assertEqual(self.charge.generer_rapport_mensuel(emp_id, mois, 2024),
+                                 self.ts.generer_rapport_mensuel(emp_id, mois, 2024))
+                self.assertEqual(self.charge.exporter_csv(emp_id, mois, 2024), self.ts.exporter_csv(emp_id, mois, 2024))
+        self.assertEqual(self.charge.matrice_couts(), self.ts.matrice_couts())
+        self.assertEqual(self.charge.totaux.heures_consommees, self.ts.totaux.heures_consommees)
+        self.assertEqual(self.charge.totaux.heures_par_semaine, self.ts.totaux.heures_par_semaine)
+        self.assertEqual(self.charge.entrees[3].statut, StatutEntree.REJETE)
+        self.assertEqual(self.charge._trouver_projet(1).budget_heures, 10)
+        self.assertEqual(self.charge._trouver_projet(2).budget_heures, 12.5)
+
+    def test_colonnes_sans_copie(self):
+        table = self.charge.entrees.table
+        self.assertIsInstance(table.heures, memoryview)
+        self.assertIsInstance(self.charge.entrees.lignes_employe(1), memoryview)
+
+    def test_ecritures_apres_chargement(self):
+        self.charge.saisir_entree(1, 1, "05/03/2024", 2.0, "Revue")
+        self.charge.modifier_entree(self.charge.entrees[0], heures=4.0, description="Refactoring")
+        self.charge.changer_statut(self.charge.entrees[1], StatutEntree.SOUMIS)
+        self.assertEqual(len(self.charge.entrees), 5)
+        self.assertEqual(list(self.charge.entrees.lignes_employe(1)), [0, 1, 4])
+        self.assertEqual(self.charge.calculer_heures_employe(1, 3, 2024), 12.0)
+        self.assertEqual(self.charge.entrees[0].description, "Refactoring")
+        self.assertEqual(self.charge.entrees[1].statut, StatutEntree.SOUMIS)
+        # le cliche sur disque n'est pas modifie
+        self.assertEqual(charger_cliche(self.chemin).calculer_heures_employe(1, 3, 2024), 14.0)
+
+    def test_fichier_invalide(self):
+        with open(self.chemin, "wb") as fichier:
+            fichier.write(b"pas un cliche" * 10)
+        with self.assertRaises(ValueError):
+            charger_cliche(self.chemin)
+
+    def test_version_inconnue(self):
+        with open(self.chemin, "r+b") as fichier:
+            octets = fichier.read(EN_TETE.size)
+            magique, version, ordre, nb_sections = EN_TETE.unpack(octets)
+            fichier.seek(0)
+            fichier.write(EN_TETE.pack(magique, VERSION - 1, ordre, nb_sections))
+        with self.assertRaisesRegex(ValueError, "Version de cliche non prise en charge"):
+            charger_cliche(self.chemin)
+
+
+if __name__ == "__main__":
+    unittest.main()
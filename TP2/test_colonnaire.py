@@ -0,0 +1,84 @@
+# test_colonnaire.py - Tests unitaires de l'export binaire columnaire
+
+import importlib.util
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from colonnaire import lire_colonnaire
+from models import Employee, TypeContrat, StatutEntree
+from services import TimesheetService
+
+PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+class TestExportColonnaire(unittest.TestCase):
+    """Verifie l'aller-retour de l'export columnaire et la lecture selective"""
+
+    def setUp(self):
+        self.dossier = tempfile.TemporaryDirectory()
+        self.chemin = os.path.join(self.dossier.name, "entrees.tscol")
+        self.ts = TimesheetService()
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_employe(Employee(2, "Martin", "Pierre", "0698765432", "pierre@example.com", "01/06/2022", TypeContrat.CDD, 28.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        self.ts.ajouter_projet(2, "Application Mobile", "MOB01", 300)
+        self.ts.saisir_entree(1, 1, "01/03/2024", 8.0, "Developpement")
+        self.ts.saisir_entree(2, 2, "02/03/2024", 7.0, "Maquettes")
+        self.ts.saisir_entree(1, 2, "03/04/2024", 6.0, "Developpement")
+        self.ts.saisir_entree(2, 3, "04/04/2024", 1.5, "Projet supprime")
+        self.ts.changer_statut(self.ts.entrees[1], StatutEntree.SOUMIS)
+        self.ts.changer_taux_horaire(1, 40.0, "01/04/2024")
+
+    def tearDown(self):
+        self.dossier.cleanup()
+
+    def test_aller_retour(self):
+        self.assertEqual(self.ts.exporter_colonnes(self.chemin, taille_groupe=3), 4)
+        colonnes = lire_colonnaire(self.chemin)
+        self.assertEqual(list(colonnes["employee_id"]), [1, 2, 1, 2])
+        self.assertEqual([date(1970, 1, 1).toordinal() + jours for jours in colonnes["date"]],
+                         [entree.jour.toordinal() for entree in self.ts.entrees])
+        self.assertEqual(list(colonnes["heures"]), [8.0, 7.0, 6.0, 1.5])
+        self.assertEqual(list(colonnes["cout"]), [280.0, 196.0, 240.0, 42.0])
+        self.assertEqual(colonnes["statut"], ["brouillon", "soumis", "brouillon", "brouillon"])
+        self.assertEqual(colonnes["employe"], ["Dupont Marie", "Martin Pierre", "Dupont Marie", "Martin Pierre"])
+        self.assertEqual(colonnes["projet"], ["Site Web Corporate", "Application Mobile", "Application Mobile", None])
+        self.assertEqual(colonnes["description"], ["Developpement", "Maquettes", "Developpement", "Projet supprime"])
+
+    def test_lecture_selective(self):
+        self.ts.exporter_colonnes(self.chemin, employee_ids={1}, taille_groupe=1)
+        colonnes = lire_colonnaire(self.chemin, ["cout", "description"], decoder=False)
+        self.assertEqual(list(colonnes), ["cout", "description"])
+        self.assertEqual(list(colonnes["cout"]), [280.0, 240.0])
+        indices, dictionnaire = colonnes["description"]
+        self.assertEqual((list(indices), dictionnaire), ([0, 0], ["Developpement"]))
+        with self.assertRaises(KeyError):
+            lire_colonnaire(self.chemin, ["inconnue"])
+
+    def test_erreurs(self):
+        with self.assertRaises(ValueError):
+            self.ts.exporter_colonnes(self.chemin, format="parquet")
+        with open(self.chemin, "wb") as fichier:
+            fichier.write(b"pas un export" * 4)
+        with self.assertRaises(ValueError):
+            lire_colonnaire(self.chemin)
+
+    @unittest.skipIf(PYARROW, "pyarrow installe")
+    def test_arrow_sans_pyarrow(self):
+        with self.assertRaises(ImportError):
+            self.ts.exporter_colonnes(self.chemin, format="arrow")
+        self.assertFalse(os.path.exists(self.chemin))
+
+    @unittest.skipUnless(PYARROW, "pyarrow absent")
+    def test_arrow(self):
+        self.assertEqual(self.ts.exporter_colonnes(self.chemin, format="arrow", taille_groupe=3), 4)
+        table = lire_colonnaire(self.chemin, ["cout", "projet"])
+        self.assertEqual(table.column("cout").to_pylist(), [280.0, 196.0, 240.0, 42.0])
+        self.assertEqual(table.column("projet").to_pylist(),
+                         ["Site Web Corporate", "Application Mobile", "Application Mobile", None])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+# test_compaction.py - Tests unitaires de la compaction des mois clos
+
+import io
+import os
+import tempfile
+import unittest
+
+from cliche import ecrire_cliche, charger_cliche
+from colonnaire import lire_colonnaire
+from models import Employee, TypeContrat, StatutEntree
+from notifications import NotificationService, ApprobationWorkflow
+from services import TimesheetService
+from stockage import StockageSQLite
+
+
+def remplir(ts):
+    ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 30.0))
+    ts.ajouter_employe(Employee(2, "Martin", "Pierre", "0698765432", "pierre@example.com", "01/06/2022", TypeContrat.CDD, 28.0))
+    ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+    ts.ajouter_projet(2, "Application Mobile", "MOB01", 300)
+    saisies = [(1, 1, "08/01/2024", 8.0), (2, 2, "09/01/2024", 7.0), (1, 2, "29/01/2024", 4.5),
+               (1, 1, "01/02/2024", 6.0), (2, 1, "12/02/2024", 7.5), (1, 1, "20/02/2024", 8.0),
+               (1, 2, "04/03/2024", 5.0), (2, 2, "05/03/2024", 3.5), (2, 1, "03/04/2024", 2.0)]
+    for employee_id, project_id, jour, heures in saisies:
+        ts.saisir_entree(employee_id, project_id, jour, heures, "Developpement")
+    ts.changer_taux_horaire(1, 40.0, "15/02/2024")
+    for entree in list(ts.entrees)[:8]:             # avril reste en brouillon
+        ts.changer_statut(entree, StatutEntree.APPROUVE)
+    ts.changer_statut(ts.entrees[6], StatutEntree.SOUMIS)   # mars n'est pas entierement approuve
+    return ts
+
+
+class TestCompaction(unittest.TestCase):
+    """Les mois clos sont servis par les resumes et l'archive, a l'identique"""
+
+    def setUp(self):
+        self.dossier = tempfile.TemporaryDirectory()
+        self.archive = os.path.join(self.dossier.name, "archive")
+        self.reference = remplir(TimesheetService())
+        self.ts = remplir(TimesheetService())
+        self.clos = self.ts.compacter(self.archive, avant="01/04/2024")
+
+    def tearDown(self):
+        self.dossier.cleanup()
+
+    def verifier_identique(self, ts, reference):
+        for mois in (1, 2, 3, 4):
+            for employee_id in (1, 2):
+                self.assertEqual(ts.generer_rapport_mensuel(employee_id, mois, 2024),
+                                 reference.generer_rapport_mensuel(employee_id, mois, 2024))
+                self.assertEqual(ts.exporter_csv(employee_id, mois, 2024), reference.exporter_csv(employee_id, mois, 2024))
+            for project_id in (1, 2):
+                self.assertEqual(ts.calculer_cout_projet(project_id, mois, 2024),
+                                 reference.calculer_cout_projet(project_id, mois, 2024))
+            self.assertEqual(ts.matrice_couts(mois, 2024), reference.matrice_couts(mois, 2024))
+        self.assertEqual(ts.matrice_heures(), reference.matrice_heures())
+        self.assertEqual(ts.matrice_couts(), reference.matrice_couts())
+        for debut, fin in (("01/01/2024", "31/12/2024"), ("09/01/2024", "19/02/2024"), ("01/02/2024", "29/02/2024")):
+            self.assertEqual(ts.heures_employe_periode(1, debut, fin), reference.heures_employe_periode(1, debut, fin))
+            self.assertEqual(ts.cout_projet_periode(1, debut, fin), reference.cout_projet_periode(1, debut, fin))
+        for granularite in ("semaine", "mois", "trimestre"):
+            self.assertEqual(ts.cumuls_entreprise(granularite=granularite),
+                             reference.cumuls_entreprise(granularite=granularite))
+            self.assertEqual(ts.cumuls_employe(1, "10/01/2024", "10/03/2024", granularite),
+                             reference.cumuls_employe(1, "10/01/2024", "10/03/2024", granularite))
+
+    def test_resultats_identiques(self):
+        self.assertEqual(self.clos, [(2024, 1), (2024, 2)])
+        self.assertEqual(len(self.ts.entrees), 3)
+        self.assertEqual(len(self.ts.resumes), 5)
+        self.assertEqual(sorted(os.listdir(self.archive)), ["2024-01.tscol", "2024-02.tscol"])
+        self.assertEqual([entree.heures for entree in self.ts.resumes.lire_archive(2024, 2)], [6.0, 7.5, 8.0])
+        self.assertNotIn((1, self.reference.entrees[0].jour.toordinal()), self.ts.totaux.heures_par_jour)
+        self.verifier_identique(self.ts, self.reference)
+        self.assertEqual(self.ts.compacter(self.archive, avant="01/04/2024"), [])
+
+    def test_mois_clos_en_lecture_seule(self):
+        self.assertEqual(self.ts.valider_entree(1, 1, "10/01/2024", 2.0, "Oubli"), ["Mois clos: 01/2024"])
+        with self.assertRaises(ValueError):
+            self.ts.saisir_entree(1, 1, "10/01/2024", 2.0, "Oubli")
+        self.assertEqual(self.ts.saisir_entrees_batch([(1, 1, "10/02/2024", 2.0, "Oubli"),
+                                                       (1, 1, "11/03/2024", 2.0, "Recette")]),
+                         {0: ["Mois clos: 02/2024"]})
+        self.assertEqual(len(self.ts.entrees), 4)
+
+    def test_revalorisation_retroactive(self):
+        for ts in (self.ts, self.reference):
+            ts.changer_taux_horaire(1, 35.0, "01/02/2024")
+            ts.changer_taux_horaire(2, 20.0)
+        self.verifier_identique(self.ts, self.reference)
+
+    def test_exports_couvrent_les_mois_clos(self):
+        """Selections et exports relisent les entrees des mois clos dans leur archive"""
+        filtres = ({}, {"debut": "01/01/2024", "fin": "31/03/2024"}, {"employee_ids": {1}},
+                   {"project_ids": {2}, "debut": "15/01/2024"}, {"fin": "20/02/2024"})
+        for filtre in filtres:
+            selection = self.ts.selectionner_entrees(**filtre)
+            attendu = self.reference.selectionner_entrees(**filtre)
+            self.assertEqual([(e.id, e.date, e.heures, e.statut) for e in selection],
+                             [(e.id, e.date, e.heures, e.statut) for e in attendu])
+            flux, flux_reference = io.StringIO(), io.StringIO()
+            self.assertEqual(self.ts.exporter_csv_flux(flux, **filtre), self.reference.exporter_csv_flux(flux_reference, **filtre))
+            self.assertEqual(flux.getvalue(), flux_reference.getvalue())
+            chemins = [os.path.join(self.dossier.name, nom) for nom in ("export.tscol", "reference.tscol")]
+            self.assertEqual(self.ts.exporter_colonnes(chemins[0], **filtre),
+                             self.reference.exporter_colonnes(chemins[1], **filtre))
+            self.assertEqual(lire_colonnaire(chemins[0]), lire_colonnaire(chemins[1]))
+        self.assertEqual(len(self.ts.selectionner_entrees(debut="01/01/2024", fin="31/03/2024")), 8)
+        self.assertEqual(self.ts.selectionner_entrees(statuts={StatutEntree.BROUILLON}), [self.ts.entrees[2]])
+        archivee = self.ts.selectionner_entrees(fin="31/01/2024")[0]
+        with self.assertRaises(ValueError):
+            self.ts.changer_statut(archivee, StatutEntree.REJETE)
+
+    def test_identifiants_stables(self):
+        """La compaction ne renumerote ni les entrees ni le journal des modifications"""
+        reference = self.reference.modifications_depuis(0)
+        changements = self.ts.modifications_depuis(0)
+        self.assertEqual([(c["sequence"], c["objet"], c["operation"], c["id"]) for c in changements],
+                         [(c["sequence"], c["objet"], c["operation"], c["id"]) for c in reference])
+        archivees = [c for c in changements if c["objet"] == "entree" and "date" not in c]
+        self.assertEqual(len(archivees), 6 + 6)     # insertions et approbations de janvier et fevrier
+        self.assertEqual({c["id"] for c in archivees}, set(range(6)))
+        self.assertEqual([c for c in changements if c["objet"] == "entree" and "date" in c],
+                         [c for c in reference if c["objet"] == "entree" and c["id"] >= 6])
+        self.assertEqual([entree.id for entree in self.ts.entrees], [6, 7, 8])
+        self.assertEqual([entree.id for entree in self.ts.resumes.lire_archive(2024, 2)], [3, 4, 5])
+        self.assertEqual(self.ts.entrees.par_id(7).heures, 3.5)
+        self.assertIsNone(self.ts.entrees.par_id(4))
+
+    def test_vues_obtenues_avant_compaction(self):
+        """Les ecritures retrouvent une vue anterieure a la compaction par son identifiant"""
+        ts = remplir(TimesheetService())
+        janvier, avril = ts.entrees[0], ts.entrees[8]
+        ts.compacter(os.path.join(self.dossier.name, "archive-vues"), avant="01/04/2024")
+        workflow = ApprobationWorkflow(ts, NotificationService())
+        self.assertEqual(workflow.soumettre_lot([janvier]), ["Entree du 08/01/2024: mois clos"])
+        with self.assertRaises(ValueError):
+            ts.changer_statut(janvier, StatutEntree.REJETE)
+        self.assertEqual(workflow.soumettre_lot([avril]), [])
+        self.assertEqual([entree.id for entree in ts.selectionner_entrees(statuts={StatutEntree.SOUMIS})], [6, 8])
+        ts.modifier_entree(avril, heures=3.0)
+        avril.description = "Recette"
+        self.assertEqual(ts.calculer_heures_employe(2, 4, 2024), 3.0)
+        self.assertEqual((ts.entrees.par_id(8).heures, ts.entrees.par_id(8).description), (3.0, "Recette"))
+
+    def test_identifiants_apres_rechargement(self):
+        """L'identifiant d'une derniere entree archivee n'est pas reattribue"""
+        chemin = os.path.join(self.dossier.name, "identifiants.db")
+        ts = remplir(TimesheetService(StockageSQLite(chemin)))
+        ts.changer_statut(ts.saisir_entree(2, 2, "26/02/2024", 1.0, "Oubli"), StatutEntree.APPROUVE)
+        ts.compacter(os.path.join(self.dossier.name, "archive-identifiants"), avant="01/04/2024")
+        ts.fermer()
+        ts = TimesheetService(StockageSQLite(chemin))
+        self.assertEqual([entree.id for entree in ts.entrees], [6, 7, 8])
+        self.assertEqual(ts.saisir_entree(1, 1, "05/04/2024", 1.0, "Recette").id, 10)
+        self.assertEqual(ts.modifications_depuis(0)[-1]["id"], 10)
+        ts.fermer()
+
+    def test_persistance(self):
+        chemin = os.path.join(self.dossier.name, "timesheet.db")
+        ts = remplir(TimesheetService(StockageSQLite(chemin)))
+        ts.compacter(self.archive, avant="01/04/2024")
+        ts.saisir_entree(1, 2, "06/03/2024", 1.0, "Recette")
+        self.reference.saisir_entree(1, 2, "06/03/2024", 1.0, "Recette")
+        ts.fermer()
+        ts = TimesheetService(StockageSQLite(chemin))
+        self.assertEqual(len(ts.entrees), 4)
+        self.assertEqual(ts.totaux.heures_semaine(2, self.reference.entrees[4].jour.toordinal()), 7.5)
+        self.verifier_identique(ts, self.reference)
+        ts.fermer()
+
+        chemin = os.path.join(self.dossier.name, "timesheet.cliche")
+        ecrire_cliche(self.ts, chemin)
+        charge = charger_cliche(chemin)
+        self.assertEqual(charge.resumes.resumes, self.ts.resumes.resumes)
+        self.assertEqual(charge.generer_rapport_mensuel(1, 2, 2024), self.ts.generer_rapport_mensuel(1, 2, 2024))
+        self.assertEqual(charge.exporter_csv(2, 1, 2024), self.ts.exporter_csv(2, 1, 2024))
+        self.assertEqual(charge.saisir_entree(1, 2, "07/03/2024", 1.0, "Recette").id, 9)
+
+
+if __name__ == "__main__":
+    unittest.main()
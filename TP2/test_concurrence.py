@@ -0,0 +1,151 @@
+# test_concurrence.py - Test de charge multi-threads du mode concurrent
+
+import re
+import sys
+import threading
+import unittest
+
+from concurrence import VerrousEmployes, VERROUS_INACTIFS
+from models import Employee, TypeContrat, StatutEntree
+from notifications import NotificationService, ApprobationWorkflow
+from services import TimesheetService, Config
+
+NB_EMPLOYES = 6
+NB_ENTREES = 1500           # par employe
+NB_LECTEURS = 3
+
+
+class NotificationsMuettes(NotificationService):
+    def _envoyer(self, destinataire, message):
+        self.notifications_envoyees.append(message)
+
+    def _alerter(self, destinataire, message):
+        pass
+
+
+def date_entree(i):
+    return f"{i % 28 + 1:02d}/{i // 28 % 12 + 1:02d}/2024"
+
+
+class TestVerrous(unittest.TestCase):
+
+    def test_version_impaire_pendant_ecriture(self):
+        verrous = VerrousEmployes(nb_shards=4)
+        with verrous.ecriture(1):
+            with verrous.ecriture(1):
+                self.assertEqual(verrous.version(1) % 2, 1)
+            self.assertEqual(verrous.version(1) % 2, 1)
+        self.assertEqual(verrous.version(1), 2)
+
+    def test_inactif_par_defaut(self):
+        self.assertIs(TimesheetService().verrous, VERROUS_INACTIFS)
+
+    def test_projet_ajoute_apres_saisie(self):
+        """Le projet ajoute apres des saisies remplace "Inconnu" dans les sorties memorisees"""
+        ts = TimesheetService(config=Config(concurrence=True))
+        ts.ajouter_employe(Employee(1, "Nom1", "Prenom", "0600000000", "e@example.com", "01/01/2023", TypeContrat.CDI, 10.0))
+        ts.saisir_entree(1, 7, "04/03/2024", 3.0, "Travail")
+        self.assertIn("Inconnu", ts.generer_rapport_mensuel(1, 3, 2024))
+        ts.ajouter_projet(7, "Projet G", "G", 100)
+        self.assertIn("Projet G", ts.generer_rapport_mensuel(1, 3, 2024))
+        ts.ajouter_projet(8, "Projet H", "H", 100)
+        self.assertEqual(len(ts.projets), 2)
+
+
+class TestChargeConcurrente(unittest.TestCase):
+    """Saisies, modifications, approbations et lectures simultanees: aucune mise a
+    jour perdue, aucun rapport incoherent, aucune sortie perimee dans le cache"""
+
+    def setUp(self):
+        self.intervalle = sys.getswitchinterval()
+        sys.setswitchinterval(1e-5)     # multiplie les entrelacements
+        self.ts = TimesheetService(config=Config(concurrence=True))
+        for emp_id in range(1, NB_EMPLOYES + 1):
+            self.ts.ajouter_employe(Employee(emp_id, f"Nom{emp_id}", "Prenom", "0600000000", "e@example.com",
+                                             "01/01/2023", TypeContrat.CDI, 10.0 * emp_id))
+        self.ts.ajouter_projet(1, "Projet A", "A", 100000)
+        self.ts.ajouter_projet(2, "Projet B", "B", 100000)
+        self.erreurs = []
+
+    def tearDown(self):
+        sys.setswitchinterval(self.intervalle)
+
+    def _executer(self, cibles):
+        threads = [threading.Thread(target=self._proteger, args=(cible,)) for cible in cibles]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.erreurs, [])
+
+    def _proteger(self, cible):
+        try:
+            cible()
+        except Exception as erreur:     # remonte les erreurs des threads au test
+            self.erreurs.append(repr(erreur))
+
+    def _saisir(self, emp_id):
+        for i in range(NB_ENTREES):
+            entree = self.ts.saisir_entree(emp_id, i % 2 + 1, date_entree(i), 2.0, f"Tache {i}")
+            if i % 10 == 0:
+                self.ts.modifier_entree(entree, heures=1.0)     # lecture-modification des totaux
+
+    def _approuver(self, fin):
+        workflow = ApprobationWorkflow(self.ts, NotificationsMuettes())
+        while not fin.is_set():
+            brouillons = self.ts.selectionner_entrees(statuts={StatutEntree.BROUILLON})[:50]
+            if brouillons and workflow.soumettre_lot(brouillons) == []:
+                workflow.approuver_lot(brouillons, "Manager")
+
+    def _lire(self, fin):
+        while not fin.is_set():
+            for emp_id in range(1, NB_EMPLOYES + 1):
+                rapport = self.ts.generer_rapport_mensuel(emp_id, 1, 2024)
+                lignes = [float(h) for h in re.findall(r"^  .*: ([\d.]+)h", rapport, re.M)]
+                total = float(re.search(r"^Total: ([\d.]+)h", rapport, re.M).group(1))
+                if abs(sum(lignes) - total) > 1e-6:
+                    self.erreurs.append(f"rapport incoherent: {rapport}")
+                csv = self.ts.exporter_csv(emp_id, 1, 2024).splitlines()[1:]
+                if len({ligne.split(";")[3] for ligne in csv}) != len(csv):
+                    self.erreurs.append("ligne CSV dupliquee")
+            self.ts.matrice_couts(1, 2024)
+            self.ts.cout_projet_periode(1, "01/01/2024", "31/12/2024")
+            self.ts.cumuls_entreprise("01/01/2024", "31/12/2024")
+            self.ts.selectionner_entrees(debut="01/03/2024", fin="31/03/2024")
+
+    def test_charge(self):
+        fin = threading.Event()
+        lecteurs = [threading.Thread(target=self._proteger, args=(lambda: self._lire(fin),))
+                    for _ in range(NB_LECTEURS)]
+        approbateur = threading.Thread(target=self._proteger, args=(lambda: self._approuver(fin),))
+        for thread in lecteurs + [approbateur]:
+            thread.start()
+        self._executer([lambda emp_id=emp_id: self._saisir(emp_id) for emp_id in range(1, NB_EMPLOYES + 1)])
+        fin.set()
+        for thread in lecteurs + [approbateur]:
+            thread.join()
+        self.assertEqual(self.erreurs, [])
+
+        ts = self.ts
+        self.assertEqual(len(ts.entrees), NB_EMPLOYES * NB_ENTREES)
+        heures_attendues = NB_ENTREES * 2.0 - NB_ENTREES // 10
+        for emp_id in range(1, NB_EMPLOYES + 1):
+            self.assertEqual(sum(ts.calculer_heures_employe(emp_id, mois, 2024) for mois in range(1, 13)),
+                             heures_attendues)
+            self.assertEqual(ts.heures_employe_periode(emp_id, "01/01/2024", "31/12/2024"), heures_attendues)
+            for mois in range(1, 13):
+                # une sortie memorisee doit egaler un recalcul complet
+                self.assertEqual(ts.generer_rapport_mensuel(emp_id, mois, 2024),
+                                 ts._generer_rapport_mensuel(emp_id, mois, 2024))
+                self.assertEqual(ts.exporter_csv(emp_id, mois, 2024), ts._exporter_csv(emp_id, mois, 2024))
+        couts = ts.matrice_couts()
+        for proj_id in (1, 2):
+            for mois in range(1, 13):
+                attendu = sum(c for (emp, proj, annee, m), c in couts.items() if proj == proj_id and m == mois)
+                self.assertAlmostEqual(ts.calculer_cout_projet(proj_id, mois, 2024), attendu)
+        non_rejetees = sum(ts.entrees.table.heures)
+        self.assertAlmostEqual(sum(ts.totaux.heures_consommees.values()), non_rejetees)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+# test_dates.py - Tests unitaires de l'analyse et du formatage des dates
+
+import unittest
+from datetime import date
+
+from dates import parser_date, formater_date
+from models import Employee, TimeEntry, StatutEntree, TypeContrat
+from services import Config, TimesheetService, ValidationService
+
+
+class TestDates(unittest.TestCase):
+    """Verifie que la date est analysee une fois et formatee en sortie"""
+
+    def test_parser_formats(self):
+        self.assertEqual(parser_date("15/03/2024"), date(2024, 3, 15))
+        self.assertEqual(parser_date("03/15/2024", "US"), date(2024, 3, 15))
+        self.assertEqual(parser_date("2024-03-15", "ISO"), date(2024, 3, 15))
+
+    def test_parser_invalide(self):
+        with self.assertRaises(ValueError):
+            parser_date("2024-03-15")
+        with self.assertRaises(ValueError):
+            parser_date("31/02/2024")
+
+    def test_formater(self):
+        jour = date(2024, 3, 5)
+        self.assertEqual(formater_date(jour), "05/03/2024")
+        self.assertEqual(formater_date(jour, "US"), "03/05/2024")
+        self.assertEqual(formater_date(jour, "ISO"), "2024-03-05")
+
+    def test_entree_garde_date_texte(self):
+        entree = TimeEntry(1, 1, "05/03/2024", 8.0, "Dev", StatutEntree.BROUILLON)
+        self.assertEqual(entree.jour, date(2024, 3, 5))
+        self.assertEqual(entree.date, "05/03/2024")
+
+    def test_validation_service(self):
+        validation = ValidationService(Config(format_date="ISO"))
+        self.assertEqual(validation.formater_date("05/03/2024"), "2024-03-05")
+        self.assertEqual(validation.formater_date(date(2024, 3, 5)), "2024-03-05")
+        self.assertEqual(validation.valider_date("2024-03-05", []), [])
+        self.assertEqual(validation.valider_date("05/03/2024", []),
+                         ["Format de date invalide (attendu: AAAA-MM-JJ)"])
+
+    def test_saisie_et_lot_stockent_la_meme_date(self):
+        ts = TimesheetService(config=Config(format_date="US"))
+        ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 100)
+        ts.saisir_entree(1, 1, "03/04/2024", 2.0, "Unitaire")
+        self.assertEqual(ts.saisir_entrees_batch([(1, 1, "03/04/2024", 2.0, "Lot")]), {})
+        self.assertEqual([entree.jour for entree in ts.entrees], [date(2024, 4, 3), date(2024, 4, 3)])
+        self.assertEqual(ts.saisir_entrees_batch([(1, 1, "03/25/2024", 2.0, "Lot")]),
+                         {0: ["Format de date invalide (attendu: JJ/MM/AAAA)"]})
+
+
+if __name__ == "__main__":
+    unittest.main()
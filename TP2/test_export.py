@@ -0,0 +1,62 @@
+# test_export.py - Tests unitaires de l'export CSV en continu
+
+import io
+import unittest
+
+from models import Employee, TypeContrat
+from services import TimesheetService
+
+
+class TestExportFlux(unittest.TestCase):
+    """Verifie l'export CSV ecrit directement dans un objet fichier"""
+
+    def setUp(self):
+        self.ts = TimesheetService()
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_employe(Employee(2, "Martin", "Pierre", "0698765432", "pierre@example.com", "01/06/2022", TypeContrat.CDD, 28.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        self.ts.ajouter_projet(2, "Application Mobile", "MOB01", 300)
+        self.ts.saisir_entree(1, 1, "01/03/2024", 8.0, "Developpement")
+        self.ts.saisir_entree(2, 2, "02/03/2024", 7.0, "Maquettes")
+        self.ts.saisir_entree(1, 2, "03/04/2024", 6.0, "Revue")
+
+    def exporter(self, **filtres):
+        fichier = io.StringIO()
+        nb_lignes = self.ts.exporter_csv_flux(fichier, **filtres)
+        lignes = fichier.getvalue().splitlines()
+        self.assertEqual(nb_lignes, len(lignes))
+        return lignes
+
+    def test_export_complet(self):
+        self.assertEqual(self.exporter(), [
+            "Date;Projet;Heures;Description;Cout (EUR)",
+            "01/03/2024;Site Web Corporate;8.0;Developpement;280.00 EUR",
+            "02/03/2024;Application Mobile;7.0;Maquettes;196.00 EUR",
+            "03/04/2024;Application Mobile;6.0;Revue;210.00 EUR",
+        ])
+
+    def test_filtres(self):
+        self.assertEqual(len(self.exporter(employee_ids={1})), 3)
+        self.assertEqual(len(self.exporter(employee_ids={1}, project_ids={2})), 2)
+        self.assertEqual(len(self.exporter(project_ids={2}, debut="01/03/2024", fin="31/03/2024")), 2)
+
+    def test_tampon_borne(self):
+        fichier = io.StringIO()
+        ecritures = []
+        fichier.write = lambda texte: ecritures.append(texte)
+        self.ts.exporter_csv_flux(fichier, taille_tampon=60)
+        self.assertGreater(len(ecritures), 1)
+
+    def test_config_separateur_et_date(self):
+        self.ts.config.separateur_csv = ","
+        self.ts.config.format_date = "ISO"
+        self.assertEqual(self.exporter(employee_ids=[2])[1], "2024-03-02,Application Mobile,7.0,Maquettes,196.00 EUR")
+
+    def test_export_mensuel_inchange(self):
+        self.assertEqual(self.ts.exporter_csv(1, 3, 2024),
+                         "Date;Projet;Heures;Description;Cout (EUR)\n"
+                         "01/03/2024;Site Web Corporate;8.0;Developpement;280.00 EUR")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+# test_instrumentation.py - Tests unitaires des metriques des services
+
+import io
+import json
+import pickle
+import time
+import unittest
+
+from instrumentation import Histogramme, Metriques, METRIQUES_INACTIVES
+from models import Employee, TypeContrat
+from notifications import NotificationService, ApprobationWorkflow
+from services import TimesheetService, Config, raison_erreur
+
+
+class NotificationsMuettes(NotificationService):
+    def _envoyer(self, destinataire, message):
+        self.notifications_envoyees.append(message)
+
+    def _alerter(self, destinataire, message):
+        pass
+
+
+class TestHistogramme(unittest.TestCase):
+
+    def test_quantiles(self):
+        histogramme = Histogramme()
+        for _ in range(99):
+            histogramme.observer(3e-6)
+        histogramme.observer(0.5)
+        instantane = histogramme.instantane()
+        self.assertEqual(instantane["nombre"], 100)
+        self.assertEqual(instantane["p50_s"], 4e-6)
+        self.assertEqual(instantane["max_s"], 0.5)
+        self.assertGreaterEqual(histogramme.quantile(1.0), 0.5)
+
+
+class TestMetriquesService(unittest.TestCase):
+    """Verifie les compteurs et latences releves quand l'instrumentation est active"""
+
+    def setUp(self):
+        self.ts = TimesheetService(config=Config(instrumentation=True))
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 100)
+        self.ts.saisir_entree(1, 1, "01/03/2024", 8.0, "Developpement")
+        self.ts.saisir_entree(1, 1, "04/03/2024", 6.0, "Tests")
+
+    def test_desactive_par_defaut(self):
+        self.assertIs(TimesheetService().metriques, METRIQUES_INACTIVES)
+        self.assertIsInstance(self.ts.metriques, Metriques)
+
+    def test_latences_et_entrees_parcourues(self):
+        self.ts.exporter_csv(1, 3, 2024)
+        self.ts.selectionner_entrees(employee_ids={1})
+        instantane = self.ts.instantane_metriques()
+        self.assertEqual(instantane["latences"]["saisir_entree"]["nombre"], 2)
+        self.assertEqual(instantane["compteurs"]["entrees_parcourues.exporter_csv"], 2)
+        self.assertEqual(instantane["compteurs"]["entrees_parcourues.selection"], 2)
+        self.assertGreater(instantane["compteurs"]["export.octets"], 0)
+        self.assertEqual(instantane["cache"]["echecs"], 1)
+
+    def test_echecs_de_validation_par_raison(self):
+        self.ts.valider_entree(1, 1, "99/99/2024", 12.0, "x")
+        self.ts.saisir_entrees_batch([(2, 1, "01/03/2024", 1.0, "x"), (1, 1, "01/03/2024", -1.0, "x")])
+        compteurs = self.ts.instantane_metriques()["compteurs"]
+        self.assertEqual(compteurs["validation.echecs.depassement"], 1)
+        self.assertEqual(compteurs["validation.echecs.date_invalide"], 1)
+        self.assertEqual(compteurs["validation.echecs.employe_inexistant"], 1)
+        self.assertEqual(compteurs["validation.echecs.heures_negatives"], 1)
+
+    def test_raison_portee_par_l_erreur(self):
+        erreurs = self.ts.valider_entree(1, 1, "99/99/2024", 12.0, "x")
+        self.assertEqual([erreur.raison for erreur in erreurs], ["depassement", "date_invalide"])
+        self.assertEqual(pickle.loads(pickle.dumps(erreurs)), erreurs)
+        self.assertEqual(pickle.loads(pickle.dumps(erreurs))[0].raison, "depassement")
+        self.assertEqual(raison_erreur("Depassement: texte libre"), "autre")
+
+    def test_workflow_et_json(self):
+        workflow = ApprobationWorkflow(self.ts, NotificationsMuettes())
+        entrees = self.ts.selectionner_entrees()
+        workflow.approuver_lot(entrees, "Manager")
+        workflow.soumettre_lot(entrees)
+        donnees = json.loads(self.ts.metriques_json())
+        self.assertEqual(donnees["compteurs"]["workflow.transitions_refusees"], 2)
+        self.assertEqual(donnees["latences"]["workflow.lot"]["nombre"], 2)
+
+    def test_export_flux_compte_les_octets(self):
+        sortie = io.StringIO()
+        self.ts.exporter_csv_flux(sortie)
+        compteurs = self.ts.instantane_metriques()["compteurs"]
+        self.assertEqual(compteurs["export.octets"], len(sortie.getvalue()))
+        self.assertEqual(compteurs["export.lignes"], 3)
+
+    def test_profileur_echantillonne(self):
+        metriques = Metriques()
+        metriques.demarrer_profilage(intervalle=0.001)
+        fin = time.perf_counter() + 0.05
+        while time.perf_counter() < fin:
+            sum(range(1000))
+        metriques.arreter_profilage()
+        self.assertTrue(metriques.instantane()["profil"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+# test_modifications.py - Tests unitaires du journal des modifications et de l'export delta
+
+import io
+import json
+import os
+import tempfile
+import unittest
+
+from cliche import ecrire_cliche, charger_cliche
+from models import Employee, TypeContrat, StatutEntree
+from modifications import PointDeRepriseExpire
+from services import TimesheetService
+from stockage import StockageSQLite
+
+
+class TestModifications(unittest.TestCase):
+    """Verifie la sequence des modifications et l'export depuis un point de reprise"""
+
+    def setUp(self):
+        self.dossier = tempfile.TemporaryDirectory()
+        self.ts = TimesheetService()
+        self.remplir(self.ts)
+
+    def tearDown(self):
+        self.dossier.cleanup()
+
+    def remplir(self, ts):
+        ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        ts.saisir_entree(1, 1, "01/03/2024", 8.0, "Developpement")
+        ts.saisir_entree(1, 1, "04/03/2024", 3.0, "Tests")
+
+    def exporter(self, depuis, **options):
+        fichier = io.StringIO()
+        point = self.ts.exporter_modifications(fichier, depuis, **options)
+        return point, fichier.getvalue().splitlines()
+
+    def test_sequence(self):
+        self.assertEqual(self.ts.point_de_reprise(), 4)
+        self.assertEqual([(m["sequence"], m["objet"], m["operation"], m["id"]) for m in self.ts.modifications_depuis()],
+                         [(1, "employe", "insertion", 1), (2, "projet", "insertion", 1),
+                          (3, "entree", "insertion", 0), (4, "entree", "insertion", 1)])
+
+    def test_delta_csv(self):
+        point, lignes = self.exporter(0)
+        self.assertEqual(point, 4)
+        self.assertEqual(len(lignes), 5)
+        entree = self.ts.entrees[0]
+        self.ts.modifier_entree(entree, heures=7.0)
+        self.ts.changer_statut(entree, StatutEntree.SOUMIS)
+
+        point, lignes = self.exporter(point)
+        self.assertEqual(point, 6)
+        self.assertEqual(lignes[0].split(";")[:4], ["sequence", "objet", "operation", "id"])
+        self.assertEqual(lignes[1], "5;entree;modification;0;1;1;01/03/2024;7.0;soumis;Developpement;245.0;;;;;;")
+        self.assertEqual(lignes[2], "6;entree;statut;0;1;1;01/03/2024;7.0;soumis;Developpement;245.0;;;;;;")
+        self.assertEqual(self.exporter(point), (6, lignes[:1]))
+
+    def test_affectation_directe(self):
+        self.assertIn("Total: 11.0h", self.ts.generer_rapport_mensuel(1, 3, 2024))
+        entree = self.ts.entrees[0]
+        entree.heures = 4.0
+        entree.description = "Revue"
+        entree.statut = StatutEntree.REJETE
+        self.assertEqual(self.ts.calculer_heures_employe(1, 3, 2024), 7.0)
+        self.assertEqual(self.ts.totaux.heures_consommees_projet(1), 3.0)
+        self.assertIn("Total: 7.0h", self.ts.generer_rapport_mensuel(1, 3, 2024))
+        self.assertEqual([(m["operation"], m["id"], m["heures"], m["description"], m["statut"])
+                          for m in self.ts.modifications_depuis(4)],
+                         [("modification", 0, 4.0, "Revue", "rejete"), ("modification", 0, 4.0, "Revue", "rejete"),
+                          ("statut", 0, 4.0, "Revue", "rejete")])
+
+    def test_delta_jsonl_fusionne(self):
+        entree = self.ts.entrees[1]
+        for statut in (StatutEntree.SOUMIS, StatutEntree.APPROUVE):
+            self.ts.changer_statut(entree, statut)
+        self.ts.changer_taux_horaire(1, 40.0)
+        point, lignes = self.exporter(4, format="jsonl", fusionner=True)
+        self.assertEqual(point, 7)
+        self.assertEqual([json.loads(ligne) for ligne in lignes], [
+            {"sequence": 6, "objet": "entree", "operation": "statut", "id": 1, "employee_id": 1, "project_id": 1,
+             "date": "04/03/2024", "heures": 3.0, "statut": "approuve", "description": "Tests", "cout": 120.0},
+            {"sequence": 7, "objet": "employe", "operation": "taux_horaire", "id": 1, "nom": "Dupont",
+             "prenom": "Marie", "type_contrat": "CDI", "taux_horaire": 40.0}])
+        with self.assertRaises(ValueError):
+            self.exporter(0, format="xml")
+
+    def test_troncature(self):
+        self.ts.tronquer_modifications(3)
+        self.assertEqual(len(self.ts.modifications), 1)
+        self.assertEqual(self.ts.point_de_reprise(), 4)
+        self.assertEqual([m["sequence"] for m in self.ts.modifications_depuis(3)], [4])
+        with self.assertRaises(PointDeRepriseExpire):
+            self.ts.modifications_depuis(2)
+        self.ts.saisir_entree(1, 1, "05/03/2024", 2.0, "Revue")
+        self.assertEqual(self.ts.point_de_reprise(), 5)
+
+    def test_persistance_sqlite(self):
+        chemin = os.path.join(self.dossier.name, "timesheet.db")
+        ts = TimesheetService(StockageSQLite(chemin))
+        self.remplir(ts)
+        ts.changer_statut(ts.entrees[0], StatutEntree.SOUMIS)
+        ts.tronquer_modifications(2)
+        ts.fermer()
+
+        ts = TimesheetService(StockageSQLite(chemin))
+        self.assertEqual(ts.point_de_reprise(), 5)
+        self.assertEqual([(m["sequence"], m["operation"], m["statut"]) for m in ts.modifications_depuis(2)],
+                         [(3, "insertion", "soumis"), (4, "insertion", "brouillon"), (5, "statut", "soumis")])
+        ts.saisir_entree(1, 1, "05/03/2024", 2.0, "Revue")
+        self.assertEqual(ts.point_de_reprise(), 6)
+        ts.tronquer_modifications(6)
+        ts.fermer()
+        self.assertEqual(TimesheetService(StockageSQLite(chemin)).point_de_reprise(), 6)
+
+    def test_cliche(self):
+        chemin = os.path.join(self.dossier.name, "timesheet.cliche")
+        ecrire_cliche(self.ts, chemin)
+        charge = charger_cliche(chemin)
+        self.assertEqual(charge.modifications_depuis(), self.ts.modifications_depuis())
+        charge.saisir_entree(1, 1, "05/03/2024", 2.0, "Revue")
+        self.assertEqual(charge.point_de_reprise(), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
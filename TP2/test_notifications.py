@@ -0,0 +1,101 @@
+# test_notifications.py - Tests du pipeline de notifications asynchrone
+
+import io
+import unittest
+
+from models import Employee, TypeContrat, StatutEntree
+from services import TimesheetService
+from notifications import (NotificationService, NotificationServiceAsync, ApprobationWorkflow,
+                           TransportMemoire, TransportFichier)
+
+
+class TestNotificationsAsync(unittest.TestCase):
+    """Verifie le regroupement par destinataire et la file bornee"""
+
+    def setUp(self):
+        self.ts = TimesheetService()
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_employe(Employee(2, "Martin", "Pierre", "0698765432", "pierre@example.com", "01/06/2022", TypeContrat.CDD, 28.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        for jour in range(1, 21):
+            self.ts.saisir_entree(1 + jour % 2, 1, f"{jour:02d}/03/2024", 7.0, "Developpement")
+
+    def test_digest_par_destinataire(self):
+        transport = TransportMemoire()
+        with NotificationServiceAsync(transport, taille_file=4, delai_lot=0.01) as ns:
+            workflow = ApprobationWorkflow(self.ts, ns)
+            for entree in self.ts.entrees:
+                workflow.approuver(entree, "Lefevre")
+        messages = [m for _, lot in transport.envois for m in lot]
+        self.assertEqual(len(messages), 20)
+        self.assertEqual({dest for dest, _ in transport.envois}, {"Dupont", "Martin"})
+        self.assertLess(len(transport.envois), 20)
+        self.assertTrue(all(e.statut is StatutEntree.APPROUVE for e in self.ts.entrees))
+
+    def test_historique_borne(self):
+        ns = NotificationServiceAsync(TransportMemoire(), taille_historique=5)
+        workflow = ApprobationWorkflow(self.ts, ns)
+        for entree in self.ts.entrees:
+            workflow.soumettre(entree)
+        ns.arreter()
+        self.assertEqual(len(ns.notifications_envoyees), 5)
+        self.assertEqual(len(NotificationService(taille_historique=3).notifications_envoyees), 0)
+
+    def test_transport_fichier(self):
+        fichier = io.StringIO()
+        with NotificationServiceAsync(TransportFichier(fichier), delai_lot=0.05) as ns:
+            ns.notifier_rejet("Durand", "Lefevre", "Migration", 5.0, "01/03/2024", "01/03/2024", "Contrat")
+            ns.notifier_rejet("Durand", "Lefevre", "Migration", 6.0, "02/03/2024", "02/03/2024", "Contrat")
+        sortie = fichier.getvalue()
+        self.assertIn("Digest pour Durand (2 notifications):", sortie)
+        self.assertIn("  - Rejet par Lefevre pour Durand sur Migration: 6.0h - Raison: Contrat", sortie)
+
+
+class TestWorkflowParLot(unittest.TestCase):
+    """Verifie les traitements par lot du workflow d'approbation"""
+
+    def setUp(self):
+        self.ts = TimesheetService()
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_employe(Employee(2, "Martin", "Pierre", "0698765432", "pierre@example.com", "01/06/2022", TypeContrat.CDD, 28.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        self.ts.ajouter_projet(2, "Application Mobile", "MOB01", 300)
+        for jour in range(4, 9):
+            self.ts.saisir_entree(1, 1 + jour % 2, f"{jour:02d}/03/2024", 7.0, "Developpement")
+            self.ts.saisir_entree(2, 2, f"{jour:02d}/03/2024", 6.0, "Maquettes")
+        self.ns = NotificationService()
+        self.workflow = ApprobationWorkflow(self.ts, self.ns)
+
+    def test_soumission_et_approbation_agregees(self):
+        self.assertEqual(self.workflow.soumettre_lot(self.ts.selectionner_entrees()), [])
+        semaine = self.ts.selectionner_entrees(employee_ids={1}, statuts={StatutEntree.SOUMIS})
+        self.assertEqual(self.workflow.approuver_lot(semaine, "Lefevre"), [])
+        self.assertEqual(list(self.ns.notifications_envoyees)[-1],
+                         "Approbation par Lefevre pour Dupont sur Site Web Corporate, Application Mobile: "
+                         "35.0h (04/03/2024 - 08/03/2024)")
+        self.assertEqual(len(self.ns.notifications_envoyees), 3)
+        self.assertEqual(len(self.ts.selectionner_entrees(statuts={StatutEntree.APPROUVE})), 5)
+
+    def test_tout_ou_rien(self):
+        self.workflow.soumettre_lot(self.ts.selectionner_entrees(employee_ids={2}))
+        erreurs = self.workflow.approuver_lot(self.ts.selectionner_entrees(), "Lefevre")
+        self.assertEqual(len(erreurs), 5)
+        self.assertIn("transition brouillon -> approuve interdite", erreurs[0])
+        self.assertEqual(len(self.ts.selectionner_entrees(statuts={StatutEntree.APPROUVE})), 0)
+
+    def test_entree_citee_deux_fois(self):
+        entree = self.ts.selectionner_entrees(employee_ids={1})[0]
+        point = self.ts.point_de_reprise()
+        self.assertEqual(self.workflow.soumettre_lot([entree, self.ts.entrees.par_id(entree.id)]), [])
+        self.assertIn("sur Site Web Corporate: 7.0h", list(self.ns.notifications_envoyees)[-1])
+        self.assertEqual([m["operation"] for m in self.ts.modifications_depuis(point)], ["statut"])
+
+    def test_rejet_par_filtre(self):
+        mobile = self.ts.selectionner_entrees(project_ids={2}, debut="05/03/2024", fin="06/03/2024")
+        self.assertEqual(self.workflow.rejeter_lot(mobile, "Lefevre", "Hors contrat"), [])
+        self.assertEqual(len(self.ts.selectionner_entrees(statuts={StatutEntree.REJETE})), 3)
+        self.assertEqual(len(self.ns.notifications_envoyees), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
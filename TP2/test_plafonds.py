@@ -0,0 +1,58 @@
+# test_plafonds.py - Tests unitaires des plafonds d'heures cumules par jour et par semaine
+
+import unittest
+
+from models import Employee, TypeContrat, StatutEntree
+from services import TimesheetService, Config
+
+
+class TestPlafondsCumules(unittest.TestCase):
+    """Verifie les plafonds journaliers et hebdomadaires de chaque contrat"""
+
+    def setUp(self):
+        self.ts = TimesheetService(config=Config(plafonds_cumules=True, instrumentation=True))
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_employe(Employee(2, "Petit", "Leo", "0600000000", "leo@example.com", "01/02/2024", TypeContrat.STAGE, 5.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+
+    def test_plafond_journalier(self):
+        self.assertEqual(self.ts.valider_entree(2, 1, "04/03/2024", 6.0, "Tests"), [])
+        entree = self.ts.saisir_entree(2, 1, "04/03/2024", 6.0, "Tests")
+        self.assertEqual(self.ts.valider_entree(2, 1, "04/03/2024", 6.0, "Tests"),
+                         ["Depassement journalier le 04/03/2024: 12.0h > 6.0h max pour Stage"])
+        self.assertEqual(self.ts.valider_entree(2, 1, "05/03/2024", 6.0, "Tests"), [])
+        self.ts.modifier_entree(entree, heures=4.0)
+        self.assertEqual(self.ts.valider_entree(2, 1, "04/03/2024", 2.0, "Tests"), [])
+        self.ts.changer_statut(entree, StatutEntree.REJETE)
+        self.assertEqual(self.ts.valider_entree(2, 1, "04/03/2024", 6.0, "Tests"), [])
+        self.assertEqual(self.ts.instantane_metriques()["compteurs"]["validation.echecs.depassement_journalier"], 1)
+
+    def test_plafond_hebdomadaire(self):
+        for jour in range(4, 9):    # du lundi 4 au vendredi 8 mars 2024
+            self.ts.saisir_entree(1, 1, f"{jour:02d}/03/2024", 8.0, "Developpement")
+        self.assertEqual(self.ts.valider_entree(1, 1, "09/03/2024", 1.0, "Astreinte"),
+                         ["Depassement hebdomadaire le 09/03/2024: 41.0h > 40.0h max pour CDI"])
+        self.assertEqual(self.ts.valider_entree(1, 1, "11/03/2024", 8.0, "Developpement"), [])
+        self.assertEqual(self.ts.totaux.heures_semaine(1, self.ts.entrees[0].jour.toordinal()), 40.0)
+
+    def test_lot(self):
+        erreurs = self.ts.saisir_entrees_batch([(2, 1, "04/03/2024", 3.0, "Matin"),
+                                                (2, 1, "04/03/2024", 3.0, "Apres-midi"),
+                                                (2, 1, "04/03/2024", 3.0, "Soir"),
+                                                (2, 1, "05/03/2024", 3.0, "Matin")])
+        self.assertEqual(erreurs, {2: ["Depassement journalier le 04/03/2024: 9.0h > 6.0h max pour Stage"]})
+        self.assertEqual(len(self.ts.entrees), 3)
+        self.assertEqual(self.ts.saisir_entrees_batch([(2, 1, "05/03/2024", 4.0, "Soir")]),
+                         {0: ["Depassement journalier le 05/03/2024: 7.0h > 6.0h max pour Stage"]})
+
+    def test_mode_inactif(self):
+        ts = TimesheetService()
+        ts.ajouter_employe(Employee(2, "Petit", "Leo", "0600000000", "leo@example.com", "01/02/2024", TypeContrat.STAGE, 5.0))
+        ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        ts.saisir_entree(2, 1, "04/03/2024", 6.0, "Tests")
+        self.assertEqual(ts.valider_entree(2, 1, "04/03/2024", 6.0, "Tests"), [])
+        self.assertEqual(ts.saisir_entrees_batch([(2, 1, "04/03/2024", 6.0, "Tests")]), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
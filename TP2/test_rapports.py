@@ -0,0 +1,54 @@
+# test_rapports.py - Tests de la generation parallele des rapports mensuels
+
+import threading
+import unittest
+from unittest import mock
+
+import services
+from models import Employee, TypeContrat
+from services import Config, TimesheetService
+
+
+class TestRapportsMensuels(unittest.TestCase):
+    """Verifie que le chemin parallele produit exactement les rapports du chemin serie"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.ts = TimesheetService()
+        contrats = [TypeContrat.CDI, TypeContrat.CDD, TypeContrat.STAGE]
+        for emp_id in range(1, 31):
+            cls.ts.ajouter_employe(Employee(emp_id, f"Nom{emp_id}", "Prenom", "0600000000", "e@example.com",
+                                            "01/01/2023", contrats[emp_id % 3], 20.0 + emp_id))
+        cls.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        cls.ts.ajouter_projet(2, "Application Mobile", "MOB01", 300)
+        for emp_id in range(1, 31):
+            for jour in range(1, 1 + emp_id % 7):
+                cls.ts.saisir_entree(emp_id, 1 + jour % 2, f"{jour:02d}/03/2024", 5.5, "Travail")
+        cls.ids = list(range(1, 31)) + [99]
+
+    def test_serie(self):
+        rapports = list(self.ts.generer_rapports_mensuels(self.ids, 3, 2024))
+        self.assertEqual(rapports, [self.ts.generer_rapport_mensuel(i, 3, 2024) for i in self.ids])
+
+    def test_parallele_identique(self):
+        serie = list(self.ts.generer_rapports_mensuels(self.ids, 3, 2024))
+        parallele = list(self.ts.generer_rapports_mensuels(self.ids, 3, 2024, workers=3, taille_lot=4))
+        self.assertEqual(parallele, serie)
+
+    def test_pas_de_fork_avec_threads(self):
+        """Un processus multithread n'est pas duplique: les rapports passent par le pool de threads"""
+        attente = threading.Event()
+        thread = threading.Thread(target=attente.wait)
+        thread.start()
+        try:
+            with mock.patch.object(services, "ProcessPoolExecutor", side_effect=AssertionError("fork")):
+                parallele = list(self.ts.generer_rapports_mensuels(self.ids, 3, 2024, workers=3, taille_lot=4))
+        finally:
+            attente.set()
+            thread.join()
+        self.assertEqual(parallele, list(self.ts.generer_rapports_mensuels(self.ids, 3, 2024)))
+        self.assertFalse(TimesheetService(config=Config(concurrence=True))._fork_sur())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+# test_registre.py - Tests unitaires du registre indexe des entrees de temps
+
+import unittest
+
+from models import Employee, TypeContrat, StatutEntree
+from colonnes import CODE_STATUT
+from services import TimesheetService
+
+
+class TestRegistreEntrees(unittest.TestCase):
+    """Verifie que les index du registre suivent les saisies"""
+
+    def setUp(self):
+        self.ts = TimesheetService()
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_employe(Employee(2, "Martin", "Pierre", "0698765432", "pierre@example.com", "01/06/2022", TypeContrat.CDD, 28.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        self.ts.ajouter_projet(2, "Application Mobile", "MOB01", 300)
+        self.ts.saisir_entree(1, 1, "01/03/2024", 8.0, "Developpement")
+        self.ts.saisir_entree(1, 2, "02/03/2024", 6.0, "Revue")
+        self.ts.saisir_entree(1, 1, "01/04/2024", 7.0, "Recette")
+        self.ts.saisir_entree(2, 1, "01/03/2024", 5.0, "Maquettes")
+
+    def test_filtre_employe_mois(self):
+        entrees = self.ts._filtrer_entrees_mois(1, 3, 2024)
+        self.assertEqual([e.heures for e in entrees], [8.0, 6.0])
+
+    def test_filtre_projet_mois(self):
+        entrees = self.ts._filtrer_entrees_par_projet(1, 3, 2024)
+        self.assertEqual([e.employee_id for e in entrees], [1, 2])
+
+    def test_mois_vide(self):
+        self.assertEqual(self.ts._filtrer_entrees_mois(1, 5, 2024), [])
+
+    def test_index_par_mois(self):
+        self.assertEqual(len(self.ts.entrees.par_mois(3, 2024)), 3)
+        self.assertEqual(len(self.ts.entrees), 4)
+
+    def test_recherche_employe_et_projet(self):
+        self.assertEqual(self.ts._trouver_employe(2).nom, "Martin")
+        self.assertEqual(self.ts._trouver_projet(2).code, "MOB01")
+        self.assertIsNone(self.ts._trouver_employe(99))
+
+    def test_calculs_mensuels(self):
+        self.assertEqual(self.ts.calculer_heures_employe(1, 3, 2024), 14.0)
+        self.assertEqual(self.ts.calculer_cout_projet(1, 3, 2024), 8.0 * 35.0 + 5.0 * 28.0)
+
+    def test_matrice_heures(self):
+        self.assertEqual(self.ts.matrice_heures(), {
+            (1, 1, 2024, 3): 8.0,
+            (1, 2, 2024, 3): 6.0,
+            (1, 1, 2024, 4): 7.0,
+            (2, 1, 2024, 3): 5.0,
+        })
+        self.assertEqual(set(self.ts.matrice_heures(4, 2024)), {(1, 1, 2024, 4)})
+
+    def test_matrice_couts(self):
+        couts = self.ts.matrice_couts(3, 2024)
+        self.assertEqual(couts[(1, 2, 2024, 3)], 6.0 * 35.0)
+        self.assertEqual(couts[(2, 1, 2024, 3)], 5.0 * 28.0)
+
+    def test_changer_statut_synchronise_table(self):
+        entree = self.ts.entrees[1]
+        self.ts.changer_statut(entree, StatutEntree.APPROUVE)
+        self.assertEqual(entree.statut, StatutEntree.APPROUVE)
+        self.assertEqual(self.ts.entrees.table.statut[entree.ligne], CODE_STATUT[StatutEntree.APPROUVE])
+
+    def test_saisie_lot(self):
+        erreurs = self.ts.saisir_entrees_batch([
+            (1, 1, "04/03/2024", 4.0, "Ok"),
+            (99, 1, "04/03/2024", 4.0, "Employe inconnu"),
+            (1, 99, "04/03/2024", 4.0, "Projet inconnu"),
+            (2, 1, "04/03/2024", 9.0, "Trop d'heures CDD"),
+            (2, 2, "2024-03-04", 0, "Date et heures invalides"),
+        ])
+        self.assertEqual(erreurs, {
+            1: ["Employe inexistant"],
+            2: ["Projet inexistant"],
+            3: ["Depassement: 9.0h > 7.5h max pour CDD"],
+            4: ["Les heures doivent etre positives", "Format de date invalide (attendu: JJ/MM/AAAA)"],
+        })
+        self.assertEqual(len(self.ts.entrees), 5)
+        self.assertEqual(self.ts.calculer_heures_employe(1, 3, 2024), 18.0)
+
+    def test_saisie_lot_colonnes(self):
+        erreurs = self.ts.saisir_entrees_batch({
+            "employee_id": [1, 2],
+            "project_id": [2, 2],
+            "date": ["05/03/2024", "05/03/2024"],
+            "heures": [2.0, 3.0],
+            "description": ["A", "B"],
+        })
+        self.assertEqual(erreurs, {})
+        self.assertEqual([e.description for e in self.ts.entrees.par_projet(2)], ["Revue", "A", "B"])
+
+    def test_vue_entree_ecrit_dans_la_table(self):
+        entree = self.ts.entrees[0]
+        entree.statut = StatutEntree.SOUMIS
+        self.assertEqual(self.ts.entrees[0].statut, StatutEntree.SOUMIS)
+        self.assertEqual(entree, self.ts.entrees[0])
+        self.assertEqual(entree.date, "01/03/2024")
+
+    def test_representation_compacte(self):
+        self.assertFalse(hasattr(self.ts.entrees[0], "__dict__"))
+        self.assertFalse(hasattr(self.ts._trouver_employe(1), "__dict__"))
+        self.ts.saisir_entree(2, 1, "02/03/2024", 5.0, "".join(["Maque", "ttes"]))
+        descriptions = self.ts.entrees.table.description
+        self.assertIs(descriptions[3], descriptions[4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# test_serveur.py - Tests du frontal asyncio avec un client local
+
+import asyncio
+import time
+import unittest
+
+from models import Employee, TypeContrat
+from serveur import ServeurTimesheet, ClientTimesheet, RequeteInvalide
+from services import TimesheetService
+
+
+class TestServeur(unittest.IsolatedAsyncioTestCase):
+    """Verifie protocole, fusion des requetes identiques et statistiques"""
+
+    async def asyncSetUp(self):
+        self.ts = TimesheetService()
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 100)
+        self.ts.saisir_entree(1, 1, "01/03/2024", 8.0, "Developpement")
+        self.ts.saisir_entree(1, 1, "04/03/2024", 3.0, "Tests")
+        self.serveur = ServeurTimesheet(self.ts, workers=2)
+        port = await self.serveur.demarrer()
+        self.client = await ClientTimesheet.connecter(port=port)
+
+    async def asyncTearDown(self):
+        await self.client.fermer()
+        await self.serveur.arreter()
+
+    async def test_requetes(self):
+        self.assertEqual(await self.client.appeler("calculer_cout_projet", project_id=1, mois=3, annee=2024), 385.0)
+        self.assertEqual(await self.client.appeler("calculer_heures_employe", employee_id=1, mois=3, annee=2024), 11.0)
+        rapport = await self.client.appeler("generer_rapport_mensuel", employee_id=1, mois=3, annee=2024)
+        self.assertEqual(rapport, self.ts.generer_rapport_mensuel(1, 3, 2024))
+        cumuls = await self.client.appeler("cumuls_projet", project_id=1, granularite="trimestre")
+        self.assertEqual(cumuls, {"[2024, 1]": [11.0, 385.0]})
+
+    async def test_erreurs(self):
+        with self.assertRaisesRegex(RuntimeError, "Methode inconnue"):
+            await self.client.appeler("supprimer_tout")
+        with self.assertRaisesRegex(RuntimeError, "Parametres inconnus"):
+            await self.client.appeler("calculer_cout_projet", projet=1)
+        self.assertEqual(await self.client.appeler("calculer_cout_projet", project_id=1, mois=3, annee=2024), 385.0)
+        statistiques = await self.client.appeler("statistiques")
+        self.assertEqual(statistiques["erreurs"], 2)
+
+    async def test_fusion_des_requetes_identiques(self):
+        appels = []
+        rapport = self.ts.generer_rapport_mensuel
+
+        def rapport_lent(*arguments):
+            appels.append(arguments)
+            time.sleep(0.05)
+            return rapport(*arguments)
+
+        self.ts.generer_rapport_mensuel = rapport_lent
+        resultats = await asyncio.gather(
+            *(self.client.appeler("generer_rapport_mensuel", employee_id=1, mois=3, annee=2024) for _ in range(10)),
+            self.client.appeler("generer_rapport_mensuel", employee_id=1, mois=4, annee=2024))
+        self.assertEqual(len(appels), 2)
+        self.assertEqual(len(set(resultats[:10])), 1)
+        statistiques = self.serveur.statistiques()
+        self.assertEqual(statistiques["fusionnees"], 9)
+        self.assertEqual(statistiques["profondeur_max"], 2)
+        self.assertEqual(statistiques["en_cours"], 0)
+        self.assertEqual(statistiques["latences"]["generer_rapport_mensuel"]["nombre"], 11)
+
+    async def test_traiter_sans_socket(self):
+        with self.assertRaises(RequeteInvalide):
+            await self.serveur.traiter("inconnue")
+        self.assertEqual(await self.serveur.traiter("calculer_heures_employe",
+                                                    {"employee_id": 1, "mois": 3, "annee": 2024}), 11.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
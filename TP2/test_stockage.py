@@ -0,0 +1,74 @@
+# test_stockage.py - Tests unitaires des backends de persistance
+
+import os
+import tempfile
+import unittest
+
+from models import Employee, TypeContrat, StatutEntree
+from services import TimesheetService
+from stockage import StockageSQLite
+
+
+class TestStockageSQLite(unittest.TestCase):
+    """Verifie la persistance SQLite et le journal sur disque"""
+
+    def setUp(self):
+        self.dossier = tempfile.TemporaryDirectory()
+        self.chemin = os.path.join(self.dossier.name, "timesheet.db")
+
+    def tearDown(self):
+        self.dossier.cleanup()
+
+    def ouvrir(self):
+        return TimesheetService(StockageSQLite(self.chemin))
+
+    def test_rechargement(self):
+        ts = self.ouvrir()
+        ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        entree = ts.saisir_entree(1, 1, "01/03/2024", 8.0, "Developpement")
+        ts.saisir_entrees_batch([(1, 1, "02/03/2024", 7.5, "Tests")])
+        ts.changer_statut(entree, StatutEntree.APPROUVE)
+        ts.modifier_entree(entree, description="Developpement accueil")
+        ts.fermer()
+
+        ts = self.ouvrir()
+        self.assertEqual(ts._trouver_employe(1).type_contrat, TypeContrat.CDI)
+        self.assertEqual(ts._trouver_projet(1).budget_heures, 500)
+        self.assertEqual(len(ts.entrees), 2)
+        self.assertEqual(ts.calculer_cout_projet(1, 3, 2024), 15.5 * 35.0)
+        self.assertEqual(ts.entrees[0].statut, StatutEntree.APPROUVE)
+        self.assertEqual(ts.entrees[0].description, "Developpement accueil")
+        self.assertEqual(ts.entrees[1].date, "02/03/2024")
+        ts.saisir_entree(1, 1, "03/03/2024", 6.0, "Recette")
+        ts.fermer()
+
+        ts = self.ouvrir()
+        self.assertEqual(ts.calculer_heures_employe(1, 3, 2024), 21.5)
+        ts.fermer()
+
+    def test_chargement_paresseux(self):
+        ts = self.ouvrir()
+        ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        ts.saisir_entree(1, 1, "01/03/2024", 8.0, "Developpement")
+        ts.fermer()
+
+        ts = self.ouvrir()
+        self.assertEqual(len(ts.entrees.table), 1)
+        self.assertEqual(ts.calculer_heures_employe(1, 3, 2024), 8.0)
+        self.assertEqual(ts.entrees[0].description, "Developpement")
+        ts.fermer()
+
+    def test_journal_sur_disque(self):
+        ts = self.ouvrir()
+        ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        ts.fermer()
+        ts = self.ouvrir()
+        ts.ajouter_projet(2, "Application Mobile", "MOB01", 300)
+        self.assertEqual(list(ts.log), ["Projet ajoute: Site Web Corporate", "Projet ajoute: Application Mobile"])
+        ts.fermer()
+
+
+if __name__ == "__main__":
+    unittest.main()
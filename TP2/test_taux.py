@@ -0,0 +1,144 @@
+# test_taux.py - Tests unitaires des taux horaires dates
+
+import os
+import random
+import tempfile
+import unittest
+from datetime import date
+
+from cliche import ecrire_cliche, charger_cliche
+from models import Employee, TypeContrat
+from services import TimesheetService
+from stockage import StockageSQLite
+from taux import HistoriqueTaux, TOUJOURS
+
+
+def jour(texte):
+    j, m, a = map(int, texte.split("/"))
+    return date(a, m, j).toordinal()
+
+
+class TestHistoriqueTaux(unittest.TestCase):
+
+    def test_recherche(self):
+        historique = HistoriqueTaux()
+        historique.initialiser(1, 30.0)
+        historique.definir(1, 40.0, jour("01/06/2024"))
+        historique.definir(1, 35.0, jour("01/03/2024"))
+        historique.definir(1, 36.0, jour("01/03/2024"))
+        self.assertEqual(historique.periodes(1), [(TOUJOURS, 30.0), (jour("01/03/2024"), 36.0), (jour("01/06/2024"), 40.0)])
+        self.assertEqual(historique.taux_au(1, jour("29/02/2024")), 30.0)
+        self.assertEqual(historique.taux_au(1, jour("01/03/2024")), 36.0)
+        self.assertEqual(historique.taux_au(1, jour("31/12/2030")), 40.0)
+        self.assertEqual(historique.taux_au(2, jour("01/03/2024")), 0)
+        self.assertEqual(historique.taux_constant(1, jour("01/04/2024"), jour("30/04/2024")), 36.0)
+        self.assertIsNone(historique.taux_constant(1, jour("15/05/2024"), jour("15/06/2024")))
+        self.assertEqual(historique.dernier(1), 40.0)
+        historique.definir(1, 50.0)
+        self.assertEqual(historique.periodes(1), [(TOUJOURS, 50.0)])
+
+    def test_fusion_egale_recherche(self):
+        service = TimesheetService()
+        for emp_id in (1, 2, 3):
+            service.ajouter_employe(Employee(emp_id, f"Nom{emp_id}", "Prenom", "0600000000", "e@example.com",
+                                             "01/01/2023", TypeContrat.CDI, 10.0 * emp_id))
+        service.ajouter_projet(1, "Projet", "P", 10000)
+        aleatoire = random.Random(4)
+        for _ in range(300):
+            service.saisir_entree(aleatoire.randint(1, 3), 1, f"{aleatoire.randint(1, 28):02d}/{aleatoire.randint(1, 12):02d}/2024",
+                                  aleatoire.choice((1.0, 2.5, 4.0)), "Tache")
+        historique = service.taux
+        historique.definir(1, 15.0, jour("01/04/2024"))
+        historique.definir(1, 17.0, jour("10/09/2024"))
+        historique.definir(2, 25.0, jour("15/07/2024"))
+        table = service.entrees.table
+        lignes = list(range(len(table)))
+        attendus = [table.heures[i] * historique.taux_au(table.employee_id[i], table.jour[i]) for i in lignes]
+        self.assertEqual(historique.couts(table, lignes), attendus)
+
+
+class TestTauxDates(unittest.TestCase):
+    """Une augmentation datee ne modifie pas les couts passes"""
+
+    def setUp(self):
+        self.dossier = tempfile.TemporaryDirectory()
+        self.ts = self.remplir(TimesheetService())
+
+    def tearDown(self):
+        self.dossier.cleanup()
+
+    def remplir(self, ts):
+        ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 30.0))
+        ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 500)
+        ts.ajouter_projet(2, "Application Mobile", "MOB01", 300)
+        ts.saisir_entree(1, 1, "04/03/2024", 8.0, "Developpement")
+        ts.saisir_entree(1, 1, "10/04/2024", 4.0, "Developpement")
+        ts.saisir_entree(1, 2, "20/04/2024", 2.0, "Maquettes")
+        ts.changer_taux_horaire(1, 40.0, "15/04/2024")
+        ts.saisir_entree(1, 1, "02/05/2024", 1.0, "Recette")
+        return ts
+
+    def test_couts_historiques(self):
+        ts = self.ts
+        self.assertEqual(ts._trouver_employe(1).taux_horaire, 40.0)
+        self.assertEqual(ts.calculer_cout_projet(1, 3, 2024), 240.0)
+        self.assertEqual(ts.calculer_cout_projet(1, 4, 2024), 120.0)
+        self.assertEqual(ts.calculer_cout_projet(2, 4, 2024), 80.0)
+        self.assertEqual(ts.calculer_cout_projet(1, 5, 2024), 40.0)
+        self.assertEqual(ts.matrice_couts(), {(1, 1, 2024, 3): 240.0, (1, 1, 2024, 4): 120.0,
+                                              (1, 2, 2024, 4): 80.0, (1, 1, 2024, 5): 40.0})
+        self.assertEqual(ts.cout_projet_periode(1, "01/01/2024", "31/12/2024"), 400.0)
+
+        rapport = ts.generer_rapport_mensuel(1, 4, 2024)
+        self.assertIn("Taux horaire: 40.00 EUR", rapport)
+        self.assertIn("Site Web Corporate: 4.0h - 120.00 EUR", rapport)
+        self.assertIn("Application Mobile: 2.0h - 80.00 EUR", rapport)
+        self.assertIn("Total: 6.0h - 200.00 EUR", rapport)
+        self.assertIn("Taux horaire: 30.00 EUR", ts.generer_rapport_mensuel(1, 3, 2024))
+        self.assertEqual([ligne.split(";")[-1] for ligne in ts.exporter_csv(1, 4, 2024).splitlines()[1:]],
+                         ["120.00 EUR", "80.00 EUR"])
+
+    def test_revalorisation_retroactive(self):
+        ts = self.ts
+        ts.changer_taux_horaire(1, 35.0, "01/04/2024")
+        self.assertEqual(ts.calculer_cout_projet(1, 3, 2024), 240.0)
+        self.assertEqual(ts.calculer_cout_projet(1, 4, 2024), 140.0)
+        self.assertEqual(ts.calculer_cout_projet(2, 4, 2024), 80.0)
+        ts.changer_taux_horaire(1, 50.0)
+        self.assertEqual(ts.calculer_cout_projet(1, 3, 2024), 400.0)
+        self.assertEqual(ts.taux.periodes(1), [(TOUJOURS, 50.0)])
+
+    def test_affectation_directe(self):
+        """employe.taux_horaire = ... vaut changer_taux_horaire sans date d'effet"""
+        employe = self.ts._trouver_employe(1)
+        employe.taux_horaire = 50.0
+        self.assertEqual(employe.taux_horaire, 50.0)
+        self.assertEqual(self.ts.taux.periodes(1), [(TOUJOURS, 50.0)])
+        self.assertEqual(self.ts.calculer_cout_projet(1, 3, 2024), 400.0)
+        self.assertIn("Site Web Corporate: 4.0h - 200.00 EUR", self.ts.generer_rapport_mensuel(1, 4, 2024))
+
+    def test_employe_inexistant(self):
+        sequence = self.ts.point_de_reprise()
+        with self.assertRaisesRegex(ValueError, "Employe inexistant"):
+            self.ts.changer_taux_horaire(99, 40.0, "01/04/2024")
+        self.assertEqual(self.ts.taux.periodes(99), [])
+        self.assertEqual(self.ts.point_de_reprise(), sequence)
+
+    def test_persistance(self):
+        chemin = os.path.join(self.dossier.name, "timesheet.db")
+        ts = self.remplir(TimesheetService(StockageSQLite(chemin)))
+        ts.fermer()
+        ts = TimesheetService(StockageSQLite(chemin))
+        self.assertEqual(ts.taux.periodes(1), self.ts.taux.periodes(1))
+        self.assertEqual(ts.matrice_couts(), self.ts.matrice_couts())
+        ts.fermer()
+
+        chemin = os.path.join(self.dossier.name, "timesheet.cliche")
+        ecrire_cliche(self.ts, chemin)
+        charge = charger_cliche(chemin)
+        self.assertEqual(charge.taux.periodes(1), self.ts.taux.periodes(1))
+        self.assertEqual(charge.generer_rapport_mensuel(1, 4, 2024), self.ts.generer_rapport_mensuel(1, 4, 2024))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+# test_totaux.py - Tests unitaires des totaux courants
+
+import unittest
+
+from models import Employee, TypeContrat, StatutEntree
+from services import TimesheetService
+
+
+class TestTotauxCourants(unittest.TestCase):
+    """Verifie que les totaux suivent saisies, modifications et statuts"""
+
+    def setUp(self):
+        self.ts = TimesheetService()
+        self.ts.ajouter_employe(Employee(1, "Dupont", "Marie", "0612345678", "marie@example.com", "15/01/2023", TypeContrat.CDI, 35.0))
+        self.ts.ajouter_employe(Employee(3, "Durand", "Sophie", "0655443322", "sophie@example.com", "01/09/2023", TypeContrat.STAGE, 15.0))
+        self.ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 10)
+        self.e1 = self.ts.saisir_entree(1, 1, "01/03/2024", 8.0, "Developpement")
+        self.e2 = self.ts.saisir_entree(3, 1, "01/03/2024", 5.0, "Analyse")
+
+    def test_lectures_apres_saisie(self):
+        self.assertEqual(self.ts.calculer_heures_employe(1, 3, 2024), 8.0)
+        self.assertEqual(self.ts.calculer_cout_projet(1, 3, 2024), 8.0 * 35.0 + 5.0 * 15.0)
+        self.assertEqual(self.ts.totaux.heures_projet(1, 3, 2024), 13.0)
+
+    def test_modification(self):
+        self.ts.modifier_entree(self.e1, heures=4.0)
+        self.assertEqual(self.ts.calculer_heures_employe(1, 3, 2024), 4.0)
+        self.assertEqual(self.ts.calculer_cout_projet(1, 3, 2024), 4.0 * 35.0 + 5.0 * 15.0)
+        self.assertEqual(self.ts.entrees.table.heures[self.e1.ligne], 4.0)
+
+    def test_budget_et_rejet(self):
+        self.assertTrue(self.ts.depasse_budget(1))
+        self.ts.changer_statut(self.e2, StatutEntree.REJETE)
+        self.assertFalse(self.ts.depasse_budget(1))
+        self.ts.changer_statut(self.e2, StatutEntree.SOUMIS)
+        self.assertTrue(self.ts.depasse_budget(1))
+
+    def test_entree_saisie_avant_employe(self):
+        ts = TimesheetService()
+        ts.ajouter_projet(1, "Site Web Corporate", "WEB01", 10)
+        ts.saisir_entree(2, 1, "04/03/2024", 8.0, "Developpement")
+        self.assertEqual(ts.calculer_cout_projet(1, 3, 2024), 0)
+        ts.ajouter_employe(Employee(2, "Martin", "Pierre", "0698765432", "pierre@example.com", "01/06/2022", TypeContrat.CDD, 35.0))
+        self.assertEqual(ts.calculer_cout_projet(1, 3, 2024), 280.0)
+        self.assertEqual(ts.cout_projet_periode(1, "01/03/2024", "31/03/2024"), 280.0)
+
+    def test_forfait_mensuel(self):
+        self.assertFalse(self.ts.depasse_forfait(3, 3, 2024))
+        for jour in range(2, 27):
+            self.ts.saisir_entree(3, 1, f"{jour:02d}/03/2024", 5.0, "Stage")
+        self.assertTrue(self.ts.depasse_forfait(3, 3, 2024))
+        self.assertIn("ATTENTION", self.ts.generer_rapport_mensuel(3, 3, 2024))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+# totaux.py - Agregats courants mis a jour a chaque ecriture
+
+from models import StatutEntree
+
+
+class TotauxCourants:
+    """Totaux d'heures et de couts tenus a jour a chaque saisie, modification
+    ou changement de statut, pour des lectures en temps constant.
+    Le cout d'une entree est valorise au taux horaire fourni a l'ecriture
+    (celui en vigueur a la date de l'entree).
+    Les entrees rejetees ne consomment pas le budget de leur projet et ne
+    comptent pas dans les heures par jour et par semaine (plafonds cumules).
+    Une semaine est numerotee (ordinal du jour - 1) // 7: l'ordinal 1 est un
+    lundi, ce sont donc les semaines ISO, sans calcul de calendrier."""
+
+    def __init__(self):
+        self.heures_employe_mois = {}       # (employee_id, annee, mois) -> heures
+        self.heures_par_projet = {}         # (employee_id, annee, mois) -> {project_id: heures}
+        self.heures_projet_mois = {}        # (project_id, annee, mois) -> heures
+        self.cout_projet_mois = {}          # (project_id, annee, mois) -> cout
+        self.heures_consommees = {}         # project_id -> heures non rejetees
+        self.heures_par_jour = {}           # (employee_id, ordinal du jour) -> heures non rejetees
+        self.heures_par_semaine = {}        # (employee_id, numero de semaine) -> heures non rejetees
+
+    def changer_statut_employe(self, entree, ancien, nouveau):
+        """Reporte un changement de statut sur les heures par jour et par semaine"""
+        heures = self._variation_statut(entree, ancien, nouveau)
+        if heures:
+            self.cumuler_jour(entree.employee_id, entree.jour.toordinal(), heures)
+
+    def changer_statut_projet(self, entree, ancien, nouveau):
+        """Reporte un changement de statut sur la consommation du budget"""
+        heures = self._variation_statut(entree, ancien, nouveau)
+        if heures:
+            self._cumuler(self.heures_consommees, entree.project_id, heures)
+
+    @staticmethod
+    def _variation_statut(entree, ancien, nouveau):
+        rejete = StatutEntree.REJETE
+        if ancien is rejete and nouveau is not rejete:
+            return entree.heures
+        if ancien is not rejete and nouveau is rejete:
+            return -entree.heures
+        return 0
+
+    def revaloriser(self, project_id, annee, mois, ancien_cout, nouveau_cout):
+        """Reporte un changement de taux horaire sur le cout d'une entree"""
+        cle = (project_id, annee, mois)
+        self.cout_projet_mois[cle] = self.cout_projet_mois.get(cle, 0) - ancien_cout + nouveau_cout
+
+    def heures_employe(self, employee_id, mois, annee):
+        return self.heures_employe_mois.get((employee_id, annee, mois), 0)
+
+    def heures_employe_par_projet(self, employee_id, mois, annee):
+        return self.heures_par_projet.get((employee_id, annee, mois), {})
+
+    def heures_projet(self, project_id, mois, annee):
+        return self.heures_projet_mois.get((project_id, annee, mois), 0)
+
+    def cout_projet(self, project_id, mois, annee):
+        return self.cout_projet_mois.get((project_id, annee, mois), 0)
+
+    def heures_consommees_projet(self, project_id):
+        return self.heures_consommees.get(project_id, 0)
+
+    def heures_jour(self, employee_id, jour):
+        """Heures non rejetees de l'employe le jour donne (ordinal)"""
+        return self.heures_par_jour.get((employee_id, jour), 0)
+
+    def heures_semaine(self, employee_id, jour):
+        """Heures non rejetees de l'employe sur la semaine du jour donne (ordinal)"""
+        return self.heures_par_semaine.get((employee_id, (jour - 1) // 7), 0)
+
+    def cumuler_jour(self, employee_id, jour, heures):
+        self._cumuler(self.heures_par_jour, (employee_id, jour), heures)
+        self._cumuler(self.heures_par_semaine, (employee_id, (jour - 1) // 7), heures)
+
+    def oublier_jour(self, employee_id, jour):
+        """Retire les heures d'un jour d'un mois clos (les totaux par semaine sont gardes)"""
+        self.heures_par_jour.pop((employee_id, jour), None)
+
+    def ajouter_resume(self, employee_id, project_id, annee, mois, heures, cout):
+        """Cumule le resume d'un mois clos: entrees approuvees, sans detail par jour"""
+        cle_employe = (employee_id, annee, mois)
+        cle_projet = (project_id, annee, mois)
+        self._cumuler(self.heures_employe_mois, cle_employe, heures)
+        self._cumuler(self.heures_par_projet.setdefault(cle_employe, {}), project_id, heures)
+        self._cumuler(self.heures_projet_mois, cle_projet, heures)
+        self._cumuler(self.cout_projet_mois, cle_projet, cout)
+        self._cumuler(self.heures_consommees, project_id, heures)
+
+    def ajouter_valeurs(self, employee_id, project_id, annee, mois, heures, taux, statut, jour):
+        """Cumule une entree donnee champ par champ (heures negatives pour la retirer);
+        jour est l'ordinal de sa date"""
+        self.cumuler_employe(employee_id, project_id, annee, mois, heures, statut, jour)
+        self.cumuler_projet(project_id, annee, mois, heures, taux, statut)
+
+    def cumuler_employe(self, employee_id, project_id, annee, mois, heures, statut, jour):
+        """Part d'ajouter_valeurs propre a l'employe (cles prefixees par son id)"""
+        cle_employe = (employee_id, annee, mois)
+        self._cumuler(self.heures_employe_mois, cle_employe, heures)
+        self._cumuler(self.heures_par_projet.setdefault(cle_employe, {}), project_id, heures)
+        if statut is not StatutEntree.REJETE:
+            self.cumuler_jour(employee_id, jour, heures)
+
+    def cumuler_projet(self, project_id, annee, mois, heures, taux, statut):
+        """Part d'ajouter_valeurs partagee entre les employes d'un meme projet"""
+        cle_projet = (project_id, annee, mois)
+        self._cumuler(self.heures_projet_mois, cle_projet, heures)
+        self._cumuler(self.cout_projet_mois, cle_projet, heures * taux)
+        if statut is not StatutEntree.REJETE:
+            self._cumuler(self.heures_consommees, project_id, heures)
+
+    @staticmethod
+    def _cumuler(totaux, cle, valeur):
+        totaux[cle] = totaux.get(cle, 0) + valeur